@@ -0,0 +1,12 @@
+from core.models import Job
+
+from django.contrib import admin
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("pk", "task", "status", "attempts", "run_after")
+    list_filter = ("status", "task")
+    readonly_fields = ("task", "payload", "created")
+
+
+admin.site.register(Job, JobAdmin)
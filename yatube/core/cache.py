@@ -0,0 +1,530 @@
+import copy
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+EPOCH_KEY = "tiered-cache:epoch"
+INVALIDATED_KEY = "tiered-cache:invalidated:{}"
+MISSING = object()
+COUNTERS = ("l1_hits", "l1_misses", "l2_hits", "l2_misses")
+# Бэкенды, которые хранят pickle в каталоге на диске (core.checks).
+DIRECTORY_BACKENDS = {
+    "django.core.cache.backends.filebased.FileBasedCache": lambda path: path,
+    "core.cache.SQLiteCache": os.path.dirname,
+}
+
+
+def cache_directory(options):
+    """Каталог, где бэкенд хранит данные, или None, если он не на диске."""
+    directory = DIRECTORY_BACKENDS.get(options["BACKEND"])
+    return directory(options["LOCATION"]) if directory else None
+
+
+def isolated_caches(directory):
+    """Копия CACHES, у которой дисковые кэши лежат в directory.
+
+    Для тестов и замеров: они чистят кэш и пишут в него страницы, которые
+    не должны попасть к запущенному сайту. L1 у TieredCache тоже получает
+    отдельное хранилище процесса.
+    """
+    isolated = copy.deepcopy(settings.CACHES)
+    for options in isolated.values():
+        if options["BACKEND"] == "core.cache.TieredCache":
+            options["LOCATION"] = f"{directory}:{options.get('LOCATION', '')}"
+            continue
+        if cache_directory(options) is None:
+            continue
+        name = os.path.basename(options["LOCATION"].rstrip(os.sep))
+        options["LOCATION"] = os.path.join(directory, name)
+    return isolated
+
+
+class SQLiteCache(BaseCache):
+    """Общий кэш процессов хоста в файле SQLite (LOCATION — путь к нему).
+
+    В отличие от FileBasedCache, incr и add атомарны — это одна команда
+    SQL, а не чтение с последующей записью, — и запись не перебирает все
+    ключи: лишнее вычищается раз в CULL_EVERY записей. Целые числа
+    хранятся как INTEGER, остальное — pickle. compare_and_set позволяет
+    менять значение, только если его не успел изменить другой процесс.
+    Каталог файла создаётся с правами 0700.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = os.path.abspath(location)
+        self.cull_every = params.get("OPTIONS", {}).get("CULL_EVERY", 100)
+        self._local = threading.local()
+
+    def _connection(self):
+        # Соединение своё у каждого потока и у процесса после fork().
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            old_umask = os.umask(0o077)
+            try:
+                os.makedirs(os.path.dirname(self.path), 0o700, exist_ok=True)
+                connection = sqlite3.connect(
+                    self.path, timeout=5, isolation_level=None
+                )
+            finally:
+                os.umask(old_umask)
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL"
+                ") WITHOUT ROWID"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)"
+            )
+            local.pid = os.getpid()
+            local.connection = connection
+            local.writes = 0
+        return local.connection
+
+    def _execute(self, sql, params=()):
+        return self._connection().execute(sql, params)
+
+    @staticmethod
+    def _encode(value):
+        if type(value) is int:
+            return value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _decode(value):
+        return value if type(value) is int else pickle.loads(value)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version)
+        self.validate_key(key)
+        return key
+
+    def _wrote(self):
+        self._local.writes += 1
+        if self._local.writes % self.cull_every == 0:
+            self._cull()
+
+    def _cull(self):
+        self._execute("DELETE FROM cache WHERE expires <= ?", (time.time(),))
+        (count,) = self._execute("SELECT count(*) FROM cache").fetchone()
+        if count <= self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            self._execute("DELETE FROM cache")
+            return
+        # Первыми уходят ключи, которые скоро истекут; вечные — последними.
+        self._execute(
+            "DELETE FROM cache WHERE key IN (SELECT key FROM cache "
+            "ORDER BY expires IS NULL, expires LIMIT ?)",
+            (count // self._cull_frequency,),
+        )
+
+    def get(self, key, default=None, version=None):
+        row = self._execute(
+            "SELECT value FROM cache "
+            "WHERE key = ? AND (expires IS NULL OR expires > ?)",
+            (self._key(key, version), time.time()),
+        ).fetchone()
+        return default if row is None else self._decode(row[0])
+
+    def get_many(self, keys, version=None):
+        by_key = {self._key(key, version): key for key in keys}
+        found = {}
+        names = list(by_key)
+        # Не больше 999 параметров в запросе у старых сборок SQLite.
+        for start in range(0, len(names), 900):
+            chunk = names[slice(start, start + 900)]
+            rows = self._execute(
+                "SELECT key, value FROM cache WHERE key IN ({}) "
+                "AND (expires IS NULL OR expires > ?)".format(
+                    ", ".join("?" * len(chunk))
+                ),
+                (*chunk, time.time()),
+            )
+            for name, value in rows:
+                found[by_key[name]] = self._decode(value)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._execute(
+            "INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE "
+            "SET value = excluded.value, expires = excluded.expires",
+            (
+                self._key(key, version),
+                self._encode(value),
+                self.get_backend_timeout(timeout),
+            ),
+        )
+        self._wrote()
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        cursor = self._execute(
+            "INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE "
+            "SET value = excluded.value, expires = excluded.expires "
+            "WHERE cache.expires <= ?",
+            (
+                self._key(key, version),
+                self._encode(value),
+                self.get_backend_timeout(timeout),
+                time.time(),
+            ),
+        )
+        if cursor.rowcount != 1:
+            return False
+        self._wrote()
+        return True
+
+    def compare_and_set(
+        self, key, expected, value, timeout=DEFAULT_TIMEOUT, version=None
+    ):
+        """Записывает value, только если в ключе всё ещё лежит expected.
+
+        Значения сравниваются в сериализованном виде. Возвращает, удалась
+        ли запись; для отсутствующего ключа используйте add().
+        """
+        cursor = self._execute(
+            "UPDATE cache SET value = ?, expires = ? WHERE key = ? "
+            "AND value = ? AND (expires IS NULL OR expires > ?)",
+            (
+                self._encode(value),
+                self.get_backend_timeout(timeout),
+                self._key(key, version),
+                self._encode(expected),
+                time.time(),
+            ),
+        )
+        return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        # fetchall() доводит команду до конца — иначе она держала бы
+        # блокировку записи открытой.
+        rows = self._execute(
+            "UPDATE cache SET value = value + ? WHERE key = ? "
+            "AND typeof(value) = 'integer' "
+            "AND (expires IS NULL OR expires > ?) RETURNING value",
+            (delta, self._key(key, version), time.time()),
+        ).fetchall()
+        if not rows:
+            raise ValueError("Key '%s' not found" % key)
+        return rows[0][0]
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        cursor = self._execute(
+            "UPDATE cache SET expires = ? "
+            "WHERE key = ? AND (expires IS NULL OR expires > ?)",
+            (
+                self.get_backend_timeout(timeout),
+                self._key(key, version),
+                time.time(),
+            ),
+        )
+        return cursor.rowcount == 1
+
+    def has_key(self, key, version=None):
+        return self.get(key, MISSING, version=version) is not MISSING
+
+    def delete(self, key, version=None):
+        self._execute(
+            "DELETE FROM cache WHERE key = ?", (self._key(key, version),)
+        )
+
+    def delete_many(self, keys, version=None):
+        self._connection().executemany(
+            "DELETE FROM cache WHERE key = ?",
+            ((self._key(key, version),) for key in keys),
+        )
+
+    def clear(self):
+        self._execute("DELETE FROM cache")
+
+    def close(self, **kwargs):
+        # Соединение живёт до конца потока: открывать файл и выполнять
+        # прагмы на каждый запрос дороже самих обращений к кэшу.
+        pass
+
+
+class L1Store:
+    """L1 процесса: общий для всех потоков, как данные LocMemCache."""
+
+    def __init__(self):
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+        self.sync_lock = threading.Lock()
+        self.epoch = None
+        self.epoch_checked_at = 0
+        self.counters = dict.fromkeys(COUNTERS, 0)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def l1_store(name):
+    with _stores_lock:
+        return _stores.setdefault(name, L1Store())
+
+
+class TieredCache(BaseCache):
+    """Двухуровневый кэш: L1 в памяти процесса перед общим L2.
+
+    L1 — ограниченный LRU с коротким TTL, общий для всех потоков процесса
+    (хранилище по LOCATION, как у LocMemCache: Django создаёт бэкенд на
+    каждый поток). L2 — любой алиас из CACHES, который видят все воркеры
+    и у которого атомарен incr (SQLiteCache, Redis). delete и incr
+    сдвигают общую «эпоху» в L2 и записывают свой ключ в журнал — кольцо
+    из INVALIDATION_LOG_SIZE ячеек. Каждый процесс сверяет эпоху не чаще
+    раза в EPOCH_CHECK_INTERVAL и выкидывает из L1 только ключи из
+    журнала; весь L1 сбрасывается лишь после clear() или если журнал успел
+    перезаписаться. Перезапись через set() доходит до чужих L1 не позже
+    чем через L1_TIMEOUT секунд.
+
+    counters — обращения текущего потока: по их разнице middleware
+    относит попадания к своему запросу; stats() — по всему процессу.
+
+    Настройки OPTIONS: L2, L1_MAX_ENTRIES, L1_TIMEOUT, EPOCH_CHECK_INTERVAL,
+    INVALIDATION_LOG_SIZE.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self.l2_alias = options.get("L2", "shared")
+        self.l1_max_entries = options.get("L1_MAX_ENTRIES", 1000)
+        self.l1_timeout = options.get("L1_TIMEOUT", 5)
+        self.epoch_check_interval = options.get("EPOCH_CHECK_INTERVAL", 1)
+        self.log_size = options.get("INVALIDATION_LOG_SIZE", 1000)
+        self._store = l1_store(location or "")
+        self.counters = dict.fromkeys(COUNTERS, 0)
+
+    @property
+    def l2(self):
+        return caches[self.l2_alias]
+
+    def stats(self):
+        """Попадания и промахи процесса по уровням и доля попаданий."""
+        with self._store.lock:
+            stats = dict(self._store.counters)
+        for tier in ("l1", "l2"):
+            total = stats[f"{tier}_hits"] + stats[f"{tier}_misses"]
+            stats[f"{tier}_hit_ratio"] = (
+                stats[f"{tier}_hits"] / total if total else 0.0
+            )
+        return stats
+
+    def _count(self, counter, amount=1):
+        if not amount:
+            return
+        self.counters[counter] += amount
+        with self._store.lock:
+            self._store.counters[counter] += amount
+
+    def _l1_get(self, key):
+        store = self._store
+        with store.lock:
+            entry = store.data.get(key)
+            if entry is None:
+                return MISSING
+            expires_at, payload = entry
+            if expires_at < time.monotonic():
+                del store.data[key]
+                return MISSING
+            store.data.move_to_end(key)
+        # Храним pickle, как LocMemCache: иначе вызывающий код менял бы
+        # общий объект (например, заголовки закэшированного ответа).
+        return pickle.loads(payload)
+
+    def _l1_set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        timeout = self.get_backend_timeout(timeout)
+        ttl = (
+            self.l1_timeout
+            if timeout is None
+            else min(self.l1_timeout, timeout - time.time())
+        )
+        if ttl <= 0:
+            self._l1_delete(key)
+            return
+        payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        store = self._store
+        with store.lock:
+            store.data[key] = (time.monotonic() + ttl, payload)
+            store.data.move_to_end(key)
+            while len(store.data) > self.l1_max_entries:
+                store.data.popitem(last=False)
+
+    def _l1_delete(self, key):
+        with self._store.lock:
+            self._store.data.pop(key, None)
+
+    def _l1_clear(self):
+        with self._store.lock:
+            self._store.data.clear()
+
+    def _sync_epoch(self):
+        store = self._store
+        now = time.monotonic()
+        if now - store.epoch_checked_at < self.epoch_check_interval:
+            return
+        # Сверку ведёт один поток; остальные не ждут его и читают L1.
+        if not store.sync_lock.acquire(blocking=False):
+            return
+        try:
+            # Если сверки не было дольше L1_TIMEOUT, в L1 всё уже истекло.
+            idle = now - store.epoch_checked_at >= self.l1_timeout
+            store.epoch_checked_at = now
+            epoch = self.l2.get(EPOCH_KEY)
+            if epoch is None:
+                self.l2.add(EPOCH_KEY, time.time_ns(), None)
+                epoch = self.l2.get(EPOCH_KEY)
+            self._catch_up(epoch, idle)
+        finally:
+            store.sync_lock.release()
+
+    def _catch_up(self, epoch, idle=False):
+        """Применяет к L1 записи журнала после нашей эпохи до epoch."""
+        store = self._store
+        # До первой сверки в L1 только наши собственные записи.
+        if store.epoch is not None and epoch != store.epoch:
+            if idle or not 0 < epoch - store.epoch <= self.log_size:
+                self._l1_clear()
+            else:
+                self._drop_logged(range(store.epoch + 1, epoch + 1))
+        store.epoch = epoch
+
+    def _drop_logged(self, epochs):
+        slots = {
+            INVALIDATED_KEY.format(epoch % self.log_size): epoch
+            for epoch in epochs
+        }
+        entries = self.l2.get_many(list(slots))
+        keys = []
+        for slot, epoch in slots.items():
+            entry = entries.get(slot)
+            if entry is None or entry[0] != epoch or entry[1] is None:
+                # Запись ещё не дописана, затёрта или это clear().
+                self._l1_clear()
+                return
+            keys.extend(entry[1])
+        with self._store.lock:
+            for key in keys:
+                self._store.data.pop(key, None)
+
+    def _invalidate(self, keys):
+        """Сдвигает эпоху и записывает в журнал ключи L1 (None — все)."""
+        try:
+            epoch = self.l2.incr(EPOCH_KEY)
+        except ValueError:
+            epoch = time.time_ns()
+            self.l2.set(EPOCH_KEY, epoch, None)
+        self.l2.set(
+            INVALIDATED_KEY.format(epoch % self.log_size),
+            (epoch, keys),
+            None,
+        )
+        store = self._store
+        with store.sync_lock:
+            # Свою запись применять незачем, а чужие до неё — сразу.
+            if store.epoch is not None and epoch - 1 != store.epoch:
+                self._catch_up(epoch - 1)
+            if store.epoch is None or epoch > store.epoch:
+                store.epoch = epoch
+
+    def get(self, key, default=None, version=None):
+        l1_key = self.make_key(key, version)
+        self._sync_epoch()
+        value = self._l1_get(l1_key)
+        if value is not MISSING:
+            self._count("l1_hits")
+            return value
+        self._count("l1_misses")
+        value = self.l2.get(key, MISSING, version=version)
+        if value is MISSING:
+            self._count("l2_misses")
+            return default
+        self._count("l2_hits")
+        self._l1_set(l1_key, value)
+        return value
+
+    def get_many(self, keys, version=None):
+        self._sync_epoch()
+        found, missing = {}, []
+        for key in keys:
+            value = self._l1_get(self.make_key(key, version))
+            if value is MISSING:
+                missing.append(key)
+            else:
+                found[key] = value
+        self._count("l1_hits", len(found))
+        self._count("l1_misses", len(missing))
+        if missing:
+            from_l2 = self.l2.get_many(missing, version=version)
+            self._count("l2_hits", len(from_l2))
+            self._count("l2_misses", len(missing) - len(from_l2))
+            for key, value in from_l2.items():
+                self._l1_set(self.make_key(key, version), value)
+            found.update(from_l2)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.l2.set(key, value, timeout, version=version)
+        self._l1_set(self.make_key(key, version), value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.l2.set_many(data, timeout, version=version)
+        for key, value in data.items():
+            if key not in failed:
+                self._l1_set(self.make_key(key, version), value, timeout)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        l1_key = self.make_key(key, version)
+        if self.l2.add(key, value, timeout, version=version):
+            self._l1_set(l1_key, value, timeout)
+            return True
+        self._l1_delete(l1_key)
+        return False
+
+    def incr(self, key, delta=1, version=None):
+        value = self.l2.incr(key, delta, version=version)
+        l1_key = self.make_key(key, version)
+        self._l1_set(l1_key, value)
+        self._invalidate([l1_key])
+        return value
+
+    def delete(self, key, version=None):
+        l1_key = self.make_key(key, version)
+        self.l2.delete(key, version=version)
+        self._l1_delete(l1_key)
+        self._invalidate([l1_key])
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self.l2.delete_many(keys, version=version)
+        l1_keys = [self.make_key(key, version) for key in keys]
+        for l1_key in l1_keys:
+            self._l1_delete(l1_key)
+        self._invalidate(l1_keys)
+
+    def has_key(self, key, version=None):
+        self._sync_epoch()
+        if self._l1_get(self.make_key(key, version)) is not MISSING:
+            return True
+        return self.l2.has_key(key, version=version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.l2.touch(key, timeout, version=version)
+
+    def clear(self):
+        self.l2.clear()
+        self._l1_clear()
+        self._invalidate(None)
@@ -0,0 +1,51 @@
+import os
+
+from core.cache import cache_directory
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.checks import Error, register
+
+
+@register()
+def file_cache_is_private(app_configs, **kwargs):
+    """Каталог дискового кэша должен быть нашим и закрытым (0700).
+
+    FileBasedCache и SQLiteCache распаковывают pickle из того, что лежит
+    в каталоге: чужой или открытый на запись каталог — это выполнение кода.
+    """
+    errors = []
+    for alias, options in settings.CACHES.items():
+        location = cache_directory(options)
+        if location is None:
+            continue
+        try:
+            stat = os.stat(location)
+        except FileNotFoundError:
+            # Кэш создаст каталог сам, с правами 0700.
+            continue
+        if stat.st_uid != os.getuid() or stat.st_mode & 0o077:
+            errors.append(
+                Error(
+                    f"Каталог кэша {alias!r} ({location}) принадлежит "
+                    "другому пользователю или доступен группе и остальным.",
+                    hint="Удалите каталог или выполните chmod 700.",
+                    id="core.E001",
+                )
+            )
+    return errors
+
+
+@register()
+def rate_limit_cache_supports_cas(app_configs, **kwargs):
+    """Ограничителю (core.ratelimit) нужен кэш с compare_and_set."""
+    if hasattr(caches[settings.RATE_LIMIT_CACHE], "compare_and_set"):
+        return []
+    return [
+        Error(
+            f"Кэш RATE_LIMIT_CACHE ({settings.RATE_LIMIT_CACHE!r}) не "
+            "поддерживает compare_and_set.",
+            hint="Укажите алиас кэша с бэкендом core.cache.SQLiteCache.",
+            id="core.E002",
+        )
+    ]
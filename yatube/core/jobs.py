@@ -0,0 +1,180 @@
+import json
+import logging
+import signal
+import threading
+import traceback
+from datetime import timedelta
+
+from core.models import Job
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+CLAIM_CANDIDATES = 10
+
+
+def task(func):
+    """Регистрирует функцию как задачу: func.enqueue(*args, **kwargs).
+
+    Аргументы сохраняются в JSON, поэтому передавайте id и строки, а не
+    модели. Задача может выполниться повторно (истекла аренда, упал
+    воркер после выполнения) — она должна быть идемпотентной.
+    """
+    func.is_task = True
+    func.task_name = f"{func.__module__}.{func.__qualname__}"
+    func.enqueue = lambda *args, **kwargs: enqueue(func, args, kwargs)
+    return func
+
+
+def enqueue(func, args=(), kwargs=None, delay=0, max_attempts=None):
+    """Кладёт задачу в таблицу — в той же транзакции, что и вызывающий."""
+    return Job.objects.create(
+        task=func.task_name,
+        payload=json.dumps({"args": list(args), "kwargs": kwargs or {}}),
+        max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS,
+        run_after=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def backoff(attempt):
+    """Пауза перед повтором: экспонента от JOBS_BACKOFF_BASE до _MAX."""
+    return min(
+        settings.JOBS_BACKOFF_MAX,
+        settings.JOBS_BACKOFF_BASE * 2 ** (attempt - 1),
+    )
+
+
+def claim(lease=None):
+    """Забирает готовую задачу, продлевая её невидимость на lease секунд.
+
+    UPDATE с условием на прежние attempts и run_after — сравнение с
+    обменом: из воркеров, выбравших одну строку, её получит один.
+
+    RUNNING с истёкшей арендой — воркер умер посреди задачи, и до _fail
+    дело не дошло. Если попытки кончились, такая задача помечается
+    failed здесь, иначе роняющая воркер задача повторялась бы вечно.
+    """
+    lease = lease or settings.JOBS_LEASE_SECONDS
+    now = timezone.now()
+    ready = Job.objects.filter(
+        status__in=(Job.QUEUED, Job.RUNNING), run_after__lte=now
+    ).order_by("run_after", "pk")
+    for job in ready[:CLAIM_CANDIDATES]:
+        same = Job.objects.filter(
+            pk=job.pk, attempts=job.attempts, run_after=job.run_after
+        )
+        if job.status == Job.RUNNING and job.attempts >= job.max_attempts:
+            if same.update(
+                status=Job.FAILED,
+                last_error="Аренда истекла: воркер не завершил задачу",
+            ):
+                logger.error("Задача %s провалена: аренда истекла", job)
+            continue
+        claimed = same.update(
+            status=Job.RUNNING,
+            attempts=F("attempts") + 1,
+            run_after=now + timedelta(seconds=lease),
+        )
+        if claimed:
+            job.status = Job.RUNNING
+            job.attempts += 1
+            return job
+    return None
+
+
+def _fail(job, error):
+    changes = {
+        "last_error": "".join(
+            traceback.format_exception_only(type(error), error)
+        ).strip()
+    }
+    if job.attempts >= job.max_attempts:
+        changes["status"] = Job.FAILED
+        logger.error("Задача %s провалена окончательно", job, exc_info=error)
+    else:
+        changes["status"] = Job.QUEUED
+        changes["run_after"] = timezone.now() + timedelta(
+            seconds=backoff(job.attempts)
+        )
+        logger.warning("Задача %s упала, повтор позже", job, exc_info=error)
+    # Условие на attempts: если аренда истекла и задачу уже перехватили,
+    # чужую попытку не трогаем.
+    Job.objects.filter(pk=job.pk, attempts=job.attempts).update(**changes)
+
+
+def execute(job):
+    try:
+        func = import_string(job.task)
+        if not getattr(func, "is_task", False):
+            raise TypeError(f"{job.task} не помечена как задача")
+        payload = json.loads(job.payload)
+        func(*payload["args"], **payload["kwargs"])
+    except Exception as error:
+        _fail(job, error)
+        return False
+    Job.objects.filter(pk=job.pk).delete()
+    return True
+
+
+def run_pending(limit=None):
+    """Выполняет готовые задачи в текущем потоке; возвращает их число."""
+    done = 0
+    while limit is None or done < limit:
+        job = claim()
+        if job is None:
+            break
+        execute(job)
+        done += 1
+    return done
+
+
+class Worker:
+    """Пул потоков, разбирающих очередь до сигнала остановки.
+
+    SIGTERM и SIGINT не прерывают задачи: потоки доделывают текущую и
+    выходят. burst=True — выйти, как только очередь опустеет.
+    """
+
+    def __init__(self, threads=1, lease=None, poll_interval=None, burst=False):
+        self.threads = threads
+        self.lease = lease or settings.JOBS_LEASE_SECONDS
+        self.poll_interval = poll_interval or settings.JOBS_POLL_INTERVAL
+        self.burst = burst
+        self.stopping = threading.Event()
+
+    def stop(self, *args):
+        self.stopping.set()
+
+    def loop(self):
+        try:
+            while not self.stopping.is_set():
+                job = claim(self.lease)
+                if job is None:
+                    if self.burst:
+                        return
+                    self.stopping.wait(self.poll_interval)
+                    continue
+                execute(job)
+                close_old_connections()
+        finally:
+            connections.close_all()
+
+    def run(self):
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self.stop)
+            signal.signal(signal.SIGINT, self.stop)
+        workers = [
+            threading.Thread(target=self.loop, name=f"jobs-{number}")
+            for number in range(self.threads)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            # join с таймаутом, чтобы главный поток успевал ловить сигналы.
+            while worker.is_alive():
+                worker.join(timeout=0.5)
@@ -0,0 +1,54 @@
+import multiprocessing
+
+from core.jobs import Worker
+from core.worker import serve
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Разбирает очередь фоновых задач: --processes процессов по "
+        "--threads потоков в каждом."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=1)
+        parser.add_argument("--threads", type=int, default=4)
+        parser.add_argument(
+            "--lease",
+            type=int,
+            help="Аренда задачи, секунд; по умолчанию JOBS_LEASE_SECONDS.",
+        )
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="Выйти, когда очередь опустеет.",
+        )
+
+    def handle(self, *args, **options):
+        if options["processes"] < 1 or options["threads"] < 1:
+            raise CommandError("--processes и --threads должны быть больше 0")
+        worker_options = {
+            "threads": options["threads"],
+            "lease": options["lease"],
+            "burst": options["burst"],
+        }
+        if options["processes"] == 1:
+            Worker(**worker_options).run()
+            return
+        context = multiprocessing.get_context("spawn")
+        processes = [
+            context.Process(target=serve, args=(worker_options,))
+            for _ in range(options["processes"])
+        ]
+        for process in processes:
+            process.start()
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            # SIGINT получила вся группа: дочерние процессы доделывают
+            # текущие задачи и выходят сами.
+            for process in processes:
+                process.join()
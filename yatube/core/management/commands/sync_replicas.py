@@ -0,0 +1,43 @@
+import sqlite3
+from contextlib import closing
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Копирует основную базу SQLite в файлы реплик через backup API. "
+        "Заменяет репликацию при локальной проверке чтения с реплик."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "aliases",
+            nargs="*",
+            help="Алиасы реплик; по умолчанию — DATABASE_REPLICAS.",
+        )
+
+    def handle(self, *args, **options):
+        aliases = options["aliases"] or settings.DATABASE_REPLICAS
+        if not aliases:
+            raise CommandError(
+                "Укажите алиасы реплик или заполните DATABASE_REPLICAS"
+            )
+        primary = connections[DEFAULT_DB_ALIAS]
+        for alias in aliases:
+            if alias not in connections.databases or alias == primary.alias:
+                raise CommandError(f"{alias!r} не является репликой")
+            if {primary.vendor, connections[alias].vendor} != {"sqlite"}:
+                raise CommandError("Копировать файлом можно только SQLite")
+        primary.ensure_connection()
+        for alias in aliases:
+            replica = connections[alias]
+            # Своё соединение с репликой держит файл — закрываем перед копией.
+            replica.close()
+            with closing(
+                sqlite3.connect(replica.settings_dict["NAME"])
+            ) as dst:
+                primary.connection.backup(dst)
+            self.stdout.write(f"{alias}: {replica.settings_dict['NAME']}")
@@ -0,0 +1,319 @@
+import atexit
+import fcntl
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import namedtuple
+from contextlib import contextmanager
+
+from django.conf import settings
+
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+Metric = namedtuple("Metric", "kind help buckets")
+
+METRICS = {
+    "yatube_http_request_duration_seconds": Metric(
+        "histogram", "Время обработки запроса.", LATENCY_BUCKETS
+    ),
+    "yatube_db_queries_per_request": Metric(
+        "histogram", "Число SQL-запросов на HTTP-запрос.", QUERY_BUCKETS
+    ),
+    "yatube_db_duration_seconds": Metric(
+        "histogram", "Суммарное время SQL на HTTP-запрос.", LATENCY_BUCKETS
+    ),
+    "yatube_template_render_seconds": Metric(
+        "histogram", "Время рендеринга шаблонов на запрос.", LATENCY_BUCKETS
+    ),
+    "yatube_cache_requests_total": Metric(
+        "counter", "Обращения к кэшу по уровням и результату.", None
+    ),
+    "yatube_ratelimit_rejections_total": Metric(
+        "counter", "Запросы, отклонённые ограничителем (429).", None
+    ),
+}
+
+
+AGGREGATE = "aggregate.json"
+LOCK = "aggregate.lock"
+
+
+@contextmanager
+def _directory_lock():
+    """Замок на METRICS_DIR: перенос в агрегат и запись снимков по очереди."""
+    directory = settings.METRICS_DIR
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, LOCK), "a") as file:
+        fcntl.flock(file, fcntl.LOCK_EX)
+        try:
+            yield directory
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
+
+
+def _read(path):
+    try:
+        with open(path, encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def _write(path, values):
+    temporary = f"{path}.tmp"
+    with open(temporary, "w", encoding="utf-8") as file:
+        json.dump(values, file)
+    os.replace(temporary, path)
+
+
+def _merge(target, values, sign=1):
+    """Прибавляет к target значения снимка (sign=-1 — вычитает)."""
+    for name, series in values.items():
+        into = target.setdefault(name, {})
+        for key, state in series.items():
+            current = into.get(key, [0] * len(state))
+            into[key] = [a + sign * b for a, b in zip(current, state)]
+    return target
+
+
+def _fold(directory, filename):
+    """Переносит снимок в агрегат и удаляет его; только под замком."""
+    path = os.path.join(directory, filename)
+    snapshot = _read(path)
+    if snapshot is not None:
+        aggregate = os.path.join(directory, AGGREGATE)
+        _write(aggregate, _merge(_read(aggregate) or {}, snapshot))
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class Registry:
+    """Метрики процесса и их снимки для сборки по всем воркерам.
+
+    Каждый воркер копит значения в памяти и не чаще раза в
+    METRICS_FLUSH_INTERVAL секунд атомарно (os.replace) переписывает свой
+    файл в METRICS_DIR. /metrics складывает файлы всех процессов, поэтому
+    счётчики не теряются между воркерами. Снимки завершившихся процессов
+    не удаляются, а переносятся в общий файл-агрегат, как в
+    multiprocess-режиме prometheus_client, — счётчики не убывают. Если в
+    агрегат перенесли снимок живого, но долго молчавшего воркера, тот при
+    следующей записи оставит в файле только прирост после переноса.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pid = None
+        self.values = {}
+        self.flushed = None
+        self.flushed_at = 0
+
+    def _check_pid(self):
+        # После fork() у ребёнка свои значения и свой файл снимка.
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.name = f"{self.pid}-{uuid.uuid4().hex}.json"
+            self.values = {}
+            self.flushed = None
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name].buckets
+        key = json.dumps(labels, ensure_ascii=False)
+        with self.lock:
+            self._check_pid()
+            series = self.values.setdefault(name, {})
+            state = series.get(key)
+            if state is None:
+                # Счётчики по корзинам (последняя — +Inf) и сумма.
+                state = series[key] = [0] * (len(buckets) + 2)
+            state[bisect_left(buckets, value)] += 1
+            state[-1] += value
+
+    def inc(self, name, labels, amount=1):
+        key = json.dumps(labels, ensure_ascii=False)
+        with self.lock:
+            self._check_pid()
+            series = self.values.setdefault(name, {})
+            series[key] = [series.get(key, [0])[0] + amount]
+
+    def flush(self):
+        with _directory_lock() as directory:
+            self._flush(directory)
+
+    def _flush(self, directory):
+        with self.lock:
+            self._check_pid()
+            path = os.path.join(directory, self.name)
+            if self.flushed is not None and not os.path.exists(path):
+                # Прошлый снимок уже в агрегате — повторно его не считаем.
+                _merge(self.values, self.flushed, -1)
+            payload = json.dumps(self.values)
+            self.flushed = json.loads(payload)
+            self.flushed_at = time.monotonic()
+        _write(path, self.flushed)
+
+    def maybe_flush(self):
+        interval = settings.METRICS_FLUSH_INTERVAL
+        if time.monotonic() - self.flushed_at >= interval:
+            self.flush()
+
+    def retire(self):
+        """При выходе процесса переносит его значения в агрегат."""
+        # Ребёнок после fork() без своих значений не трогает файл родителя.
+        if self.pid != os.getpid():
+            return
+        with _directory_lock() as directory:
+            self._flush(directory)
+            _fold(directory, self.name)
+
+
+registry = Registry()
+atexit.register(registry.retire)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Процесс есть, но принадлежит другому пользователю.
+        return True
+    return True
+
+
+def _stale(path, filename):
+    """Снимок умершего процесса или давно не обновлявшийся файл."""
+    pid = filename.split("-", 1)[0]
+    if pid.isdigit() and not _alive(int(pid)):
+        return True
+    try:
+        age = time.time() - os.path.getmtime(path)
+    except FileNotFoundError:
+        return False
+    return age > settings.METRICS_SNAPSHOT_MAX_AGE
+
+
+def _snapshots(directory):
+    return [
+        filename
+        for filename in os.listdir(directory)
+        if filename.endswith(".json") and filename != AGGREGATE
+    ]
+
+
+def collect():
+    """Складывает агрегат и снимки живых процессов из METRICS_DIR.
+
+    Снимки умерших и давно молчащих процессов сперва переносятся в агрегат.
+    """
+    registry.flush()
+    with _directory_lock() as directory:
+        for filename in _snapshots(directory):
+            if _stale(os.path.join(directory, filename), filename):
+                _fold(directory, filename)
+        merged = _read(os.path.join(directory, AGGREGATE)) or {}
+        for filename in _snapshots(directory):
+            _merge(merged, _read(os.path.join(directory, filename)) or {})
+    return merged
+
+
+def _format_labels(pairs):
+    escaped = (
+        '{}="{}"'.format(
+            name,
+            str(value)
+            .replace("\\", "\\\\")
+            .replace('"', '\\"')
+            .replace("\n", "\\n"),
+        )
+        for name, value in pairs
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(values):
+    """Текстовый формат экспозиции Prometheus (version 0.0.4)."""
+    lines = []
+    for name, metric in METRICS.items():
+        lines.append(f"# HELP {name} {metric.help}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        for key, state in sorted(values.get(name, {}).items()):
+            labels = json.loads(key)
+            if metric.kind == "counter":
+                lines.append(f"{name}{_format_labels(labels)} {state[0]}")
+                continue
+            cumulative = 0
+            bounds = [*map(repr, map(float, metric.buckets)), "+Inf"]
+            for bound, count in zip(bounds, state[:-1]):
+                cumulative += count
+                le = _format_labels([*labels, ["le", bound]])
+                lines.append(f"{name}_bucket{le} {cumulative}")
+            lines.append(
+                f"{name}_sum{_format_labels(labels)} "
+                f"{_format_number(state[-1])}"
+            )
+            lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+class RequestStats(threading.local):
+    """Накопители текущего запроса: SQL и шаблоны."""
+
+    active = False
+
+    def reset(self):
+        self.active = True
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.template_depth = 0
+
+
+current = RequestStats()
+
+
+def record_query(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        current.queries += 1
+        current.db_seconds += time.perf_counter() - started
+
+
+@contextmanager
+def template_timer():
+    """Меряет только внешний рендер: вложенные шаблоны уже внутри него."""
+    if not current.active:
+        yield
+        return
+    current.template_depth += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        current.template_depth -= 1
+        if not current.template_depth:
+            current.template_seconds += time.perf_counter() - started
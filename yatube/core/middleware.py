@@ -0,0 +1,147 @@
+import math
+import time
+from contextlib import ExitStack
+
+from core import metrics, ratelimit, routers
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.shortcuts import render
+
+
+class MetricsMiddleware:
+    """Снимает метрики каждого запроса с меткой по имени URL.
+
+    Ставится первой в MIDDLEWARE, чтобы в задержку попадала вся цепочка.
+    Запросы без совпавшего маршрута получают метку "unmatched", иначе
+    каждый случайный 404-путь стал бы отдельным рядом в Prometheus.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        cache_before = self.cache_counters()
+        metrics.current.reset()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(metrics.record_query)
+                    )
+                response = self.get_response(request)
+            duration = time.perf_counter() - started
+            self.record(request, response, duration, cache_before)
+        finally:
+            metrics.current.active = False
+        metrics.registry.maybe_flush()
+        return response
+
+    @staticmethod
+    def cache_counters():
+        return dict(getattr(caches["default"], "counters", {}))
+
+    def record(self, request, response, duration, cache_before):
+        match = request.resolver_match
+        view = match.view_name if match else "unmatched"
+        registry, current = metrics.registry, metrics.current
+        registry.observe(
+            "yatube_http_request_duration_seconds",
+            [
+                ["view", view],
+                ["method", request.method],
+                ["status", response.status_code],
+            ],
+            duration,
+        )
+        labels = [["view", view]]
+        registry.observe(
+            "yatube_db_queries_per_request", labels, current.queries
+        )
+        registry.observe(
+            "yatube_db_duration_seconds", labels, current.db_seconds
+        )
+        if current.template_seconds:
+            registry.observe(
+                "yatube_template_render_seconds",
+                labels,
+                current.template_seconds,
+            )
+        for counter, value in self.cache_counters().items():
+            delta = value - cache_before.get(counter, 0)
+            if delta:
+                tier, result = counter.split("_")
+                registry.inc(
+                    "yatube_cache_requests_total",
+                    [*labels, ["tier", tier], ["result", result]],
+                    delta,
+                )
+
+
+class ReplicaPinMiddleware:
+    """Чтения идут на реплики, но писавшая сессия какое-то время их минует.
+
+    После запроса, который что-то записал, клиент получает короткоживущую
+    куку: пока она жива, его запросы читают с основной базы и видят свой
+    пост или комментарий, даже если реплика ещё не догнала основную.
+    Небезопасные методы всегда обслуживает основная база.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        routers.state.begin(
+            pinned=request.method not in ("GET", "HEAD", "OPTIONS")
+            or settings.REPLICA_PIN_COOKIE in request.COOKIES
+        )
+        try:
+            response = self.get_response(request)
+            wrote = routers.state.wrote
+        finally:
+            routers.state.end()
+        if wrote:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE,
+                "1",
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+
+class RateLimitMiddleware:
+    """Токен-бакеты на маршрутах из RATE_LIMITS (core.ratelimit).
+
+    Стоит после AuthenticationMiddleware: ведро авторизованного клиента
+    привязано к пользователю, анонимного — к IP. Сверх лимита отвечает
+    429 с Retry-After, не доходя до вью и до базы.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view = request.resolver_match.view_name
+        limit = ratelimit.limit_for(view, request.method)
+        if limit is None:
+            return None
+        retry_after = ratelimit.take(
+            f"{view}:{ratelimit.identity(request)}",
+            limit["capacity"],
+            limit["period"],
+        )
+        if not retry_after:
+            return None
+        metrics.registry.inc(
+            "yatube_ratelimit_rejections_total", [["view", view]]
+        )
+        response = render(request, "core/429.html", status=429)
+        response["Retry-After"] = str(math.ceil(retry_after))
+        return response
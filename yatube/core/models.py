@@ -0,0 +1,42 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """Задача фоновой очереди (core.jobs).
+
+    Пока задача выполняется, run_after сдвинут вперёд на время аренды:
+    если воркер умер, по истечении аренды задачу заберёт другой.
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    FAILED = "failed"
+    STATUSES = (
+        (QUEUED, "В очереди"),
+        (RUNNING, "Выполняется"),
+        (FAILED, "Провалена"),
+    )
+
+    task = models.CharField("Задача", max_length=200)
+    payload = models.TextField("Аргументы (JSON)")
+    status = models.CharField(
+        "Статус", max_length=10, choices=STATUSES, default=QUEUED
+    )
+    attempts = models.PositiveIntegerField("Попыток", default=0)
+    max_attempts = models.PositiveIntegerField("Предел попыток")
+    run_after = models.DateTimeField("Не раньше", default=timezone.now)
+    last_error = models.TextField("Последняя ошибка", blank=True)
+    created = models.DateTimeField("Создана", auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["status", "run_after"], name="core_job_ready_idx"
+            ),
+        ]
+        verbose_name = "Задача"
+        verbose_name_plural = "Очередь задач"
+
+    def __str__(self):
+        return f"{self.task} #{self.pk}"
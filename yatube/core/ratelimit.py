@@ -0,0 +1,55 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+BUCKET_KEY = "ratelimit:{}"
+CAS_ATTEMPTS = 3
+
+
+def limit_for(view_name, method):
+    """Настройки ведра для маршрута или None, если он не ограничен."""
+    limit = settings.RATE_LIMITS.get(view_name)
+    if limit is None or method not in limit.get("methods", ("POST",)):
+        return None
+    return limit
+
+
+def identity(request):
+    """Чьё ведро: пользователя, а для анонимов — адреса клиента."""
+    if request.user.is_authenticated:
+        return f"user:{request.user.pk}"
+    return f"ip:{request.META.get('REMOTE_ADDR', '')}"
+
+
+def take(bucket, capacity, period):
+    """Берёт токен из ведра; 0 — можно, иначе через сколько секунд.
+
+    Ведро вмещает capacity токенов и наполняется со скоростью capacity
+    за period секунд. Состояние — пара (токены, время) в общем кэше
+    RATE_LIMIT_CACHE; новое состояние записывается compare-and-set по
+    прочитанному (add — для нового ведра), так что параллельные запросы
+    одного клиента не тратят один токен дважды и замков не нужно.
+    Проигравший гонку CAS_ATTEMPTS раз подряд получает отказ: такая
+    конкуренция бывает только при залпе запросов, и пропускать его без
+    лимита нельзя.
+    """
+    cache = caches[settings.RATE_LIMIT_CACHE]
+    key = BUCKET_KEY.format(bucket)
+    rate = capacity / period
+    for _ in range(CAS_ATTEMPTS):
+        now = time.time()
+        state = cache.get(key)
+        tokens, updated = state or (capacity, now)
+        tokens = min(capacity, tokens + (now - updated) * rate)
+        if tokens < 1:
+            return (1 - tokens) / rate
+        if state is None:
+            stored = cache.add(key, (tokens - 1, now), int(period) + 1)
+        else:
+            stored = cache.compare_and_set(
+                key, state, (tokens - 1, now), int(period) + 1
+            )
+        if stored:
+            return 0
+    return 1 / rate
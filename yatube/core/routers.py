@@ -0,0 +1,74 @@
+import random
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class RoutingState(threading.local):
+    """Состояние текущего запроса: идёт ли он и закреплён ли за основной.
+
+    active ставит ReplicaPinMiddleware: вне HTTP-запросов (команды,
+    воркеры, shell) всё читается с основной базы — там сразу после
+    записи обычно читают то, что записали.
+    """
+
+    active = False
+    pinned = False
+    wrote = False
+    replica_reads = False
+
+    def begin(self, pinned):
+        self.active = True
+        self.pinned = pinned
+        self.wrote = self.replica_reads = False
+
+    def end(self):
+        self.active = self.pinned = False
+
+
+state = RoutingState()
+
+
+def lag_bounded_timeout(timeout):
+    """Срок кэша для данных, собранных в текущем запросе.
+
+    Если запрос читал с реплики, она могла ещё не получить последнюю
+    запись, и такие данные храним не дольше окна REPLICA_PIN_SECONDS.
+    """
+    if state.replica_reads:
+        return min(timeout, settings.REPLICA_PIN_SECONDS)
+    return timeout
+
+
+class ReplicaRouter:
+    """Пишет в default, а чтения в HTTP-запросах раздаёт по репликам.
+
+    Реплики перечислены в DATABASE_REPLICAS. Первая же запись закрепляет
+    остаток запроса за основной базой, как и открытая транзакция: читать
+    внутри неё с реплики — значит не видеть собственных изменений.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if (
+            not replicas
+            or not state.active
+            or state.pinned
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        state.replica_reads = True
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        if state.active:
+            state.pinned = state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии основной базы: связи между ними допустимы.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,37 @@
+import hashlib
+import os
+import re
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+# Имена, содержимое под которыми никогда не меняется: загрузки
+# ContentHashedStorage (хэш, при совпадении — суффикс get_available_name)
+# и миниатюры sorl (md5 от имени исходника и параметров).
+IMMUTABLE_NAME = re.compile(
+    r"(?:.+/)?[0-9a-f]{20}(?:_[0-9A-Za-z]{7})?\.\w+"
+    r"|cache/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{32}\.\w+"
+)
+
+
+@deconstructible
+class ContentHashedStorage(FileSystemStorage):
+    """Называет файлы по хэшу содержимого: posts/<sha256[:20]>.jpg.
+
+    Новое содержимое всегда получает новое имя, а файл под старым именем
+    не меняется, поэтому его можно отдавать с Cache-Control: immutable.
+    Совпадение хэшей у разных загрузок разводит get_available_name.
+    """
+
+    digest_length = 20
+
+    def save(self, name, content, max_length=None):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        name = os.path.join(
+            directory, digest.hexdigest()[: self.digest_length] + extension
+        )
+        return super().save(name, content, max_length)
@@ -0,0 +1,28 @@
+import shutil
+import tempfile
+
+from core.cache import isolated_caches
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """Тесты работают со своим временным каталогом дискового кэша.
+
+    Иначе cache.clear() в тестах стирал бы кэш запущенного dev-сервера.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        # mkdtemp создаёт каталог с правами 0700.
+        self.cache_dir = tempfile.mkdtemp(prefix="yatube-test-cache-")
+        self.cache_settings = override_settings(
+            CACHES=isolated_caches(self.cache_dir)
+        )
+        self.cache_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_settings.disable()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
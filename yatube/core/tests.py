@@ -0,0 +1,531 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from core import checks, jobs, metrics, ratelimit, routers
+from core.cache import TieredCache, cache_directory
+from core.models import Job
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import Client, TestCase, override_settings
+from django.utils import timezone
+
+
+def make_cache(name=None):
+    """Бэкенд воркера; у каждого процесса своё хранилище L1."""
+    return TieredCache(
+        name or f"worker-{time.monotonic_ns()}",
+        {"OPTIONS": {"L2": "shared", "EPOCH_CHECK_INTERVAL": 0}},
+    )
+
+
+class TieredCacheTests(TestCase):
+    def setUp(self):
+        caches["shared"].clear()
+        self.cache = make_cache()
+        self.other_worker = make_cache()
+
+    def test_second_read_comes_from_l1(self):
+        """Повторное чтение обслуживает L1, а не общий L2."""
+        self.cache.set("key", "value")
+        caches["shared"].delete("key")
+        self.assertEqual(self.cache.get("key"), "value")
+        self.assertEqual(self.cache.stats()["l1_hits"], 1)
+
+    def test_other_worker_reads_through_l2(self):
+        """Значение одного воркера видно другому через L2."""
+        self.cache.set("key", "value")
+        self.assertEqual(self.other_worker.get("key"), "value")
+        self.assertEqual(self.other_worker.get("key"), "value")
+        stats = self.other_worker.stats()
+        self.assertEqual((stats["l2_hits"], stats["l1_hits"]), (1, 1))
+        self.assertEqual(stats["l1_hit_ratio"], 0.5)
+
+    def test_invalidation_reaches_other_workers(self):
+        """delete и incr сбрасывают L1 в других воркерах."""
+        self.cache.set("generation", 1)
+        self.cache.set("key", "value")
+        self.assertEqual(self.other_worker.get("key"), "value")
+        self.assertEqual(self.other_worker.get("generation"), 1)
+        self.cache.delete("key")
+        self.assertIsNone(self.other_worker.get("key"))
+        self.cache.incr("generation")
+        self.assertEqual(self.other_worker.get("generation"), 2)
+
+    def test_invalidation_keeps_other_keys_in_l1(self):
+        """delete выкидывает из чужого L1 только свой ключ."""
+        self.cache.set("key", "value")
+        self.cache.set("other", "value")
+        self.other_worker.get("key")
+        self.other_worker.get("other")
+        self.cache.delete("key")
+        self.assertIsNone(self.other_worker.get("key"))
+        self.assertEqual(self.other_worker.get("other"), "value")
+        self.assertEqual(self.other_worker.stats()["l1_hits"], 1)
+
+    def test_overwritten_log_clears_l1(self):
+        """Если журнал успел перезаписаться, L1 сбрасывается целиком."""
+        self.cache.log_size = 2
+        self.other_worker.log_size = 2
+        self.cache.set("key", "value")
+        self.other_worker.get("key")
+        for name in ("a", "b", "c"):
+            self.cache.delete(name)
+        self.assertEqual(self.other_worker.get("key"), "value")
+        self.assertEqual(self.other_worker.stats()["l1_hits"], 0)
+
+    def test_l1_is_bounded(self):
+        """L1 вытесняет давно не читанные ключи."""
+        self.cache.l1_max_entries = 2
+        for key in ("a", "b", "c"):
+            self.cache.set(key, key)
+        self.assertEqual(len(self.cache._store.data), 2)
+        self.assertNotIn(self.cache.make_key("a"), self.cache._store.data)
+
+    def test_threads_of_one_process_share_l1(self):
+        """Бэкенды разных потоков одного процесса делят L1 и счётчики."""
+        name = f"process-{time.monotonic_ns()}"
+        first_thread, second_thread = make_cache(name), make_cache(name)
+        first_thread.set("key", "value")
+        caches["shared"].delete("key")
+        self.assertEqual(second_thread.get("key"), "value")
+        self.assertEqual(first_thread.stats()["l1_hits"], 1)
+        self.assertEqual(first_thread.counters["l1_hits"], 0)
+
+    def test_cached_objects_are_copies(self):
+        """Из L1 возвращается копия, а не общий изменяемый объект."""
+        self.cache.set("key", {"a": 1})
+        self.cache.get("key")["a"] = 2
+        self.assertEqual(self.cache.get("key"), {"a": 1})
+
+
+class SQLiteCacheTests(TestCase):
+    def setUp(self):
+        self.cache = caches["shared"]
+        self.cache.clear()
+
+    def test_incr_is_atomic(self):
+        """Одновременные incr из разных потоков не теряют приращений."""
+        self.cache.set("counter", 0)
+
+        def bump():
+            for _ in range(100):
+                caches["shared"].incr("counter")
+
+        threads = [threading.Thread(target=bump) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.cache.get("counter"), 400)
+
+    def test_incr_of_missing_key_fails(self):
+        """incr отсутствующего ключа — ValueError, как в Django."""
+        with self.assertRaises(ValueError):
+            self.cache.incr("missing")
+
+    def test_add_only_when_missing_or_expired(self):
+        """add не перезаписывает живой ключ, но занимает истёкший."""
+        self.assertTrue(self.cache.add("key", "first"))
+        self.assertFalse(self.cache.add("key", "second"))
+        self.cache.set("expired", "old", -1)
+        self.assertTrue(self.cache.add("expired", "new"))
+        self.assertEqual(
+            self.cache.get_many(["key", "expired", "missing"]),
+            {"key": "first", "expired": "new"},
+        )
+
+    def test_compare_and_set(self):
+        """compare_and_set пишет, только если значение не успели сменить."""
+        self.cache.set("key", (1, 2.5))
+        self.assertFalse(self.cache.compare_and_set("key", (1, 3.0), "x"))
+        self.assertTrue(self.cache.compare_and_set("key", (1, 2.5), "y"))
+        self.assertEqual(self.cache.get("key"), "y")
+        self.assertFalse(self.cache.compare_and_set("missing", None, "z"))
+
+    def test_cull_keeps_max_entries(self):
+        """Лишние записи вычищаются раз в CULL_EVERY записей."""
+        self.cache._max_entries = 10
+        self.cache.cull_every = 5
+        self.addCleanup(setattr, self.cache, "_max_entries", 10000)
+        self.addCleanup(setattr, self.cache, "cull_every", 100)
+        self.cache._local.writes = 0
+        for number in range(20):
+            self.cache.set(f"key-{number}", number)
+        self.assertLessEqual(
+            len(
+                self.cache.get_many([f"key-{number}" for number in range(20)])
+            ),
+            10,
+        )
+
+
+class FileCacheCheckTests(TestCase):
+    def test_tests_use_private_cache_dir(self):
+        """Тесты пишут не в рабочий каталог кэша, а в закрытый временный."""
+        location = cache_directory(settings.CACHES["shared"])
+        self.assertFalse(location.startswith(settings.CACHE_DIR))
+        self.assertEqual(os.stat(location).st_mode & 0o777, 0o700)
+        self.assertEqual(checks.file_cache_is_private(None), [])
+
+    def test_open_cache_dir_is_an_error(self):
+        """Каталог кэша, открытый группе и остальным, не проходит проверку."""
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        os.chmod(location, 0o777)
+        shared = dict(
+            settings.CACHES["shared"],
+            LOCATION=os.path.join(location, "shared.sqlite3"),
+        )
+        with override_settings(CACHES={"shared": shared}):
+            errors = checks.file_cache_is_private(None)
+        self.assertEqual([error.id for error in errors], ["core.E001"])
+
+
+METRICS_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(METRICS_DIR=METRICS_DIR)
+class MetricsTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(METRICS_DIR, ignore_errors=True)
+
+    def setUp(self):
+        for filename in os.listdir(METRICS_DIR):
+            os.remove(os.path.join(METRICS_DIR, filename))
+        metrics.registry.values.clear()
+        metrics.registry.flushed = None
+        caches["default"].clear()
+        self.client = Client()
+
+    def scrape(self):
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def write_snapshot(self, filename):
+        path = os.path.join(METRICS_DIR, filename)
+        key = json.dumps([["view", "posts:index"]])
+        state = [0] * (len(metrics.QUERY_BUCKETS) + 2)
+        state[2], state[-1] = 3, 6.0
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump({"yatube_db_queries_per_request": {key: state}}, file)
+        return path
+
+    def test_request_is_labeled_by_url_name(self):
+        """Задержка, SQL и шаблоны попадают в ряды с именем URL."""
+        self.client.get("/")
+        text = self.scrape()
+        self.assertIn(
+            "yatube_http_request_duration_seconds_count"
+            '{view="posts:index",method="GET",status="200"} 1',
+            text,
+        )
+        self.assertIn(
+            'yatube_db_queries_per_request_count{view="posts:index"} 1',
+            text,
+        )
+        self.assertIn(
+            'yatube_template_render_seconds_count{view="posts:index"} 1',
+            text,
+        )
+        self.assertIn(
+            'yatube_cache_requests_total{view="posts:index",'
+            'tier="l1",result="misses"}',
+            text,
+        )
+
+    def test_unknown_paths_share_one_series(self):
+        """Случайные 404-пути не плодят ряды."""
+        self.client.get("/no-such-page/")
+        self.client.get("/another-missing-page/")
+        self.assertIn(
+            "yatube_http_request_duration_seconds_count"
+            '{view="unmatched",method="GET",status="404"} 2',
+            self.scrape(),
+        )
+
+    def test_snapshots_of_all_workers_are_summed(self):
+        """/metrics складывает снимки других процессов со своими."""
+        self.client.get("/")
+        self.write_snapshot("other-worker.json")
+        self.assertIn(
+            'yatube_db_queries_per_request_count{view="posts:index"} 4',
+            self.scrape(),
+        )
+
+    def test_snapshots_of_dead_workers_are_folded(self):
+        """Снимки завершившихся и давно молчащих процессов идут в агрегат."""
+        finished = subprocess.Popen([sys.executable, "-c", ""])
+        finished.wait()
+        dead = self.write_snapshot(f"{finished.pid}-dead.json")
+        old = self.write_snapshot("old-worker.json")
+        past = time.time() - settings.METRICS_SNAPSHOT_MAX_AGE - 1
+        os.utime(old, (past, past))
+        self.client.get("/")
+        for _ in range(2):
+            self.assertIn(
+                'yatube_db_queries_per_request_count{view="posts:index"} 7',
+                self.scrape(),
+            )
+        self.assertFalse(os.path.exists(dead))
+        self.assertFalse(os.path.exists(old))
+
+    def test_values_survive_exit(self):
+        """При выходе значения процесса остаются в агрегате."""
+        self.client.get("/")
+        metrics.registry.flush()
+        path = os.path.join(METRICS_DIR, metrics.registry.name)
+        metrics.registry.retire()
+        self.assertFalse(os.path.exists(path))
+        self.assertIn(
+            'yatube_db_queries_per_request_count{view="posts:index"} 1',
+            self.scrape(),
+        )
+
+    def test_folded_live_snapshot_is_not_counted_twice(self):
+        """Воркер, чей снимок уже в агрегате, дописывает только прирост."""
+        self.client.get("/")
+        metrics.registry.flush()
+        with metrics._directory_lock() as directory:
+            metrics._fold(directory, metrics.registry.name)
+        self.client.get("/")
+        self.assertIn(
+            'yatube_db_queries_per_request_count{view="posts:index"} 2',
+            self.scrape(),
+        )
+
+    def test_endpoint_is_closed_for_other_addresses(self):
+        response = Client(REMOTE_ADDR="192.0.2.1").get("/metrics")
+        self.assertEqual(response.status_code, 404)
+
+
+class SqlitePragmaTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def connect(self):
+        wrapper = DatabaseWrapper(
+            {
+                **connection.settings_dict,
+                "NAME": os.path.join(self.directory, "db.sqlite3"),
+            },
+            alias="pragma-check",
+        )
+        wrapper.ensure_connection()
+        self.addCleanup(wrapper.close)
+        return wrapper.connection
+
+    def pragma(self, raw, name):
+        return raw.execute(f"PRAGMA {name}").fetchone()[0]
+
+    def test_new_connection_gets_production_profile(self):
+        """Новое соединение с файлом базы получает WAL и прочие прагмы."""
+        raw = self.connect()
+        self.assertEqual(self.pragma(raw, "journal_mode"), "wal")
+        self.assertEqual(
+            self.pragma(raw, "busy_timeout"),
+            settings.SQLITE_PRAGMAS["busy_timeout"],
+        )
+        # synchronous=NORMAL хранится как 1.
+        self.assertEqual(self.pragma(raw, "synchronous"), 1)
+
+    @override_settings(SQLITE_PRAGMAS={"busy_timeout": 1234})
+    def test_pragmas_come_from_settings(self):
+        """Набор прагм задаётся настройкой SQLITE_PRAGMAS."""
+        raw = self.connect()
+        self.assertEqual(self.pragma(raw, "busy_timeout"), 1234)
+        self.assertEqual(self.pragma(raw, "journal_mode"), "delete")
+
+
+@override_settings(DATABASE_REPLICAS=["replica"])
+class ReplicaRouterTests(TestCase):
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+        self.addCleanup(routers.state.end)
+
+    def test_reads_outside_requests_use_primary(self):
+        """Команды и воркеры читают с основной базы."""
+        self.assertEqual(self.router.db_for_read(None), "default")
+
+    def test_request_reads_go_to_replica_until_first_write(self):
+        """После записи остаток запроса читает с основной базы."""
+        routers.state.begin(pinned=False)
+        # TestCase держит транзакцию — как будто её нет.
+        with mock.patch.object(connection, "in_atomic_block", False):
+            self.assertEqual(self.router.db_for_read(None), "replica")
+            self.assertEqual(self.router.db_for_write(None), "default")
+            self.assertEqual(self.router.db_for_read(None), "default")
+        self.assertTrue(routers.state.wrote)
+
+    def test_reads_inside_transaction_use_primary(self):
+        routers.state.begin(pinned=False)
+        with transaction.atomic():
+            self.assertEqual(self.router.db_for_read(None), "default")
+
+    def test_writing_session_is_pinned_by_cookie(self):
+        """Вход пишет в базу — клиент получает куку и читает с основной."""
+        get_user_model().objects.create_user("reader", password="secret")
+        client = Client()
+        response = client.post(
+            "/auth/login/", {"username": "reader", "password": "secret"}
+        )
+        cookie = response.cookies[settings.REPLICA_PIN_COOKIE]
+        self.assertEqual(cookie["max-age"], settings.REPLICA_PIN_SECONDS)
+        response = client.get("/about/author/")
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+
+SIGNUP_LIMIT = {"users:signup": {"capacity": 2, "period": 60}}
+
+
+@override_settings(RATE_LIMITS=SIGNUP_LIMIT)
+class RateLimitTests(TestCase):
+    def setUp(self):
+        caches[settings.RATE_LIMIT_CACHE].clear()
+
+    def signup(self, address="192.0.2.10"):
+        return Client(REMOTE_ADDR=address).post("/auth/signup/", {})
+
+    def test_client_over_limit_gets_429(self):
+        """Сверх ёмкости ведра — 429 с Retry-After, вью не вызывается."""
+        for _ in range(2):
+            self.assertEqual(self.signup().status_code, 200)
+        response = self.signup()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "30")
+
+    def test_buckets_are_per_client(self):
+        for _ in range(3):
+            self.signup()
+        self.assertEqual(self.signup("192.0.2.11").status_code, 200)
+
+    def test_safe_methods_are_not_limited_by_default(self):
+        for _ in range(3):
+            self.signup()
+        self.assertEqual(
+            Client(REMOTE_ADDR="192.0.2.10").get("/auth/signup/").status_code,
+            200,
+        )
+
+    def test_bucket_refills_over_time(self):
+        with mock.patch("core.ratelimit.time.time", return_value=1000.0):
+            self.assertEqual(ratelimit.take("refill", 1, 10), 0)
+            self.assertEqual(ratelimit.take("refill", 1, 10), 10)
+        with mock.patch("core.ratelimit.time.time", return_value=1010.0):
+            self.assertEqual(ratelimit.take("refill", 1, 10), 0)
+
+    def test_concurrent_takes_do_not_exceed_capacity(self):
+        """Параллельные запросы не получают больше capacity токенов."""
+        granted = []
+
+        def burst():
+            for _ in range(10):
+                if not ratelimit.take("burst", 20, 3600):
+                    granted.append(1)
+
+        threads = [threading.Thread(target=burst) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertLessEqual(len(granted), 20)
+        self.assertGreater(len(granted), 0)
+
+    def test_lost_races_fail_closed(self):
+        """Кто раз за разом проигрывает гонку, получает отказ."""
+        cache = caches[settings.RATE_LIMIT_CACHE]
+        ratelimit.take("contended", 5, 10)
+        with mock.patch.object(
+            type(cache), "compare_and_set", return_value=False
+        ) as compare_and_set:
+            self.assertEqual(ratelimit.take("contended", 5, 10), 2)
+        self.assertEqual(compare_and_set.call_count, ratelimit.CAS_ATTEMPTS)
+        self.assertAlmostEqual(
+            cache.get(ratelimit.BUCKET_KEY.format("contended"))[0], 4, 2
+        )
+
+    def test_rate_limit_cache_must_support_cas(self):
+        local = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+        with override_settings(CACHES=dict(settings.CACHES, shared=local)):
+            errors = checks.rate_limit_cache_supports_cas(None)
+        self.assertEqual([error.id for error in errors], ["core.E002"])
+
+
+CALLS = []
+
+
+@jobs.task
+def remember(value):
+    CALLS.append(value)
+
+
+@jobs.task
+def explode():
+    raise RuntimeError("сломалось")
+
+
+@override_settings(JOBS_MAX_ATTEMPTS=2, JOBS_BACKOFF_BASE=10)
+class JobQueueTests(TestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_enqueued_job_runs_once(self):
+        remember.enqueue("привет")
+        self.assertEqual(jobs.run_pending(), 1)
+        self.assertEqual(CALLS, ["привет"])
+        self.assertFalse(Job.objects.exists())
+
+    def test_delayed_job_waits(self):
+        jobs.enqueue(remember, ["позже"], delay=60)
+        self.assertEqual(jobs.run_pending(), 0)
+
+    def test_failures_back_off_then_give_up(self):
+        """Упавшая задача откладывается, после предела — failed."""
+        explode.enqueue()
+        jobs.run_pending()
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertIn("сломалось", job.last_error)
+        self.assertGreater(
+            job.run_after, timezone.now() + timezone.timedelta(seconds=5)
+        )
+        Job.objects.update(run_after=timezone.now())
+        jobs.run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertEqual(jobs.run_pending(), 0)
+
+    def test_claimed_job_is_invisible_until_lease_expires(self):
+        remember.enqueue(1)
+        first = jobs.claim(lease=30)
+        self.assertIsNotNone(first)
+        self.assertIsNone(jobs.claim(lease=30))
+        # Воркер умер, не доделав: аренда истекла — задачу берёт другой.
+        Job.objects.update(run_after=timezone.now())
+        second = jobs.claim(lease=30)
+        self.assertEqual((second.pk, second.attempts), (first.pk, 2))
+
+    def test_lease_expired_on_last_attempt_fails_job(self):
+        """Задача, роняющая воркер, не перезапускается бесконечно."""
+        remember.enqueue(1)
+        for _ in range(2):
+            self.assertIsNotNone(jobs.claim(lease=30))
+            Job.objects.update(run_after=timezone.now())
+        self.assertIsNone(jobs.claim(lease=30))
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertIn("Аренда", job.last_error)
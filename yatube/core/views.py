@@ -1,4 +1,12 @@
+from core import metrics
+from core.storage import IMMUTABLE_NAME
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
+from django.views.static import serve
+
+IMMUTABLE = "public, max-age=31536000, immutable"
 
 
 def page_not_found(request, exception):
@@ -11,3 +19,25 @@ def csrf_failure(request, reason=""):
 
 def permission_denied(request):
     return render(request, "core/403.html", status=403)
+
+
+def metrics_export(request):
+    """Метрики всех воркеров в текстовом формате Prometheus."""
+    if request.META.get("REMOTE_ADDR") not in settings.METRICS_ALLOWED_IPS:
+        raise Http404
+    return HttpResponse(
+        metrics.render(metrics.collect()),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+def media(request, path):
+    """Медиафайлы для DEBUG; названным по хэшу — вечный кэш браузера.
+
+    В продакшене MEDIA_URL раздаёт веб-сервер, и заголовок для тех же
+    имён (IMMUTABLE_NAME) выставляется в его конфигурации.
+    """
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    if IMMUTABLE_NAME.fullmatch(path):
+        response["Cache-Control"] = IMMUTABLE
+    return response
@@ -0,0 +1,13 @@
+import django
+
+
+def serve(options):
+    """Точка входа процесса пула run_worker.
+
+    Процессы стартуют через spawn, поэтому модели импортируются только
+    после django.setup().
+    """
+    django.setup()
+    from core.jobs import Worker
+
+    Worker(**options).run()
@@ -1,4 +1,5 @@
-from posts.models import Comment, Follow, Group, Post
+from posts import search
+from posts.models import ArchivedPost, Comment, Follow, Group, Post
 
 from django.contrib import admin
 
@@ -12,8 +13,22 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ("pub_date",)
     empty_value_display = "-пусто-"
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term or not search.is_supported():
+            return super().get_search_results(request, queryset, search_term)
+        if not search.match_expression(search_term):
+            return queryset.none(), False
+        return queryset.filter(pk__in=search.matching_ids(search_term)), False
+
+
+class ArchivedPostAdmin(admin.ModelAdmin):
+    list_display = ("pk", "text", "pub_date", "author", "group")
+    list_filter = ("pub_date",)
+    empty_value_display = "-пусто-"
+
 
 admin.site.register(Post, PostAdmin)
+admin.site.register(ArchivedPost, ArchivedPostAdmin)
 admin.site.register(Group)
 admin.site.register(Comment)
 admin.site.register(Follow)
@@ -0,0 +1,277 @@
+import json
+from functools import wraps
+
+from posts import querysets
+from posts.caching import etag_by_generation
+from posts.counters import author_stats, post_stats
+from posts.models import ArchivedPost, Group, Post, User
+from posts.pagination import ArchiveCursorPaginator, CursorPaginator
+from posts.views import COMMENTS_IN_PAGE, POST_IN_PAGE
+
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_GET
+
+MAX_PAGE_SIZE = 100
+MAX_BATCH_SIZE = 100
+
+
+def _image_url(post):
+    return post.image.url if post.image else None
+
+
+def _comments_count(post):
+    # У архивного поста число комментариев застыло при переносе.
+    if isinstance(post, ArchivedPost):
+        return post.comments_count
+    return post_stats(post).comments_count
+
+
+POST_FIELDS = {
+    "id": lambda post: post.pk,
+    "text": lambda post: post.text,
+    "pub_date": lambda post: post.pub_date.isoformat(),
+    "author": lambda post: post.author.username,
+    "group": lambda post: post.group.slug if post.group else None,
+    "image": _image_url,
+    "comments_count": _comments_count,
+}
+
+# Счётчик комментариев есть только у отдельного поста: ETag лент зависит
+# от постов, а не от комментариев, и 304 отдавал бы устаревшее число.
+LIST_POST_FIELDS = {
+    field: value
+    for field, value in POST_FIELDS.items()
+    if field != "comments_count"
+}
+
+COMMENT_FIELDS = {
+    "id": lambda comment: comment.pk,
+    "post": lambda comment: comment.post_id,
+    "author": lambda comment: comment.author.username,
+    "text": lambda comment: comment.text,
+    "created": lambda comment: comment.created.isoformat(),
+}
+
+GROUP_FIELDS = {
+    "slug": lambda group: group.slug,
+    "title": lambda group: group.title,
+    "description": lambda group: group.description,
+}
+
+PROFILE_FIELDS = {
+    "username": lambda user: user.username,
+    "full_name": lambda user: user.get_full_name(),
+    "posts_count": lambda user: author_stats(user).posts_count,
+    "followers_count": lambda user: author_stats(user).followers_count,
+    "following_count": lambda user: author_stats(user).following_count,
+}
+
+
+def json_response(data, status=200):
+    return JsonResponse(
+        data, status=status, json_dumps_params={"ensure_ascii": False}
+    )
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def api_view(view):
+    """Только GET; ошибки отдаются JSON, а не HTML-страницей."""
+
+    @require_GET
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except Http404:
+            return json_response({"error": "not found"}, status=404)
+        except ApiError as error:
+            return json_response({"error": str(error)}, status=error.status)
+
+    return wrapper
+
+
+def selected_fields(request, available):
+    """Разбирает ?fields=a,b; без параметра отдаются все поля."""
+    requested = request.GET.get("fields")
+    if not requested:
+        return list(available)
+    fields = [field for field in requested.split(",") if field]
+    unknown = set(fields) - set(available)
+    if unknown:
+        raise ApiError(f"unknown fields: {', '.join(sorted(unknown))}")
+    return fields
+
+
+def page_size(request, default):
+    try:
+        size = int(request.GET.get("limit", default))
+    except ValueError:
+        raise ApiError("limit must be an integer")
+    if not 1 <= size <= MAX_PAGE_SIZE:
+        raise ApiError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    return size
+
+
+def serialize(obj, available, fields):
+    return {field: available[field](obj) for field in fields}
+
+
+def stream(objects, available, fields, **meta):
+    """Отдаёт {"results": [...], **meta} по объекту, не собирая ответ."""
+    yield '{"results": ['
+    for i, obj in enumerate(objects):
+        if i:
+            yield ","
+        yield json.dumps(serialize(obj, available, fields), ensure_ascii=False)
+    yield "]"
+    for key, value in meta.items():
+        yield f", {json.dumps(key)}: {json.dumps(value)}"
+    yield "}"
+
+
+def streaming_json(chunks):
+    return StreamingHttpResponse(chunks, content_type="application/json")
+
+
+def paginated(
+    request,
+    queryset,
+    available,
+    default_size,
+    keys=("pub_date", "pk"),
+    archive=None,
+):
+    """Страница по курсору; archive — продолжение за хвостом queryset."""
+    fields = selected_fields(request, available)
+    size = page_size(request, default_size)
+    if archive is None:
+        paginator = CursorPaginator(queryset, size, keys)
+    else:
+        paginator = ArchiveCursorPaginator(queryset, archive, size, keys)
+    page = paginator.get_page(request.GET.get("cursor"))
+    return streaming_json(
+        stream(
+            page.object_list,
+            available,
+            fields,
+            next=page.next_cursor,
+            previous=page.previous_cursor,
+        )
+    )
+
+
+def post_queryset():
+    return querysets.feed().select_related("stats")
+
+
+@api_view
+@etag_by_generation("index", "authors")
+def posts(request):
+    return paginated(
+        request,
+        querysets.feed(),
+        LIST_POST_FIELDS,
+        POST_IN_PAGE,
+        archive=querysets.archive_feed(),
+    )
+
+
+@api_view
+def posts_batch(request):
+    """Несколько постов по ?ids=1,2,3, в порядке id, включая архивные."""
+    try:
+        ids = {int(pk) for pk in request.GET.get("ids", "").split(",") if pk}
+    except ValueError:
+        raise ApiError("ids must be a comma separated list of integers")
+    if not ids:
+        raise ApiError("ids is required")
+    if len(ids) > MAX_BATCH_SIZE:
+        raise ApiError(f"at most {MAX_BATCH_SIZE} ids per request")
+    fields = selected_fields(request, POST_FIELDS)
+    found = list(post_queryset().filter(pk__in=ids))
+    missing = ids - {post.pk for post in found}
+    if missing:
+        found.extend(querysets.archive_feed().filter(pk__in=missing))
+    found.sort(key=lambda post: post.pk)
+    return streaming_json(stream(found, POST_FIELDS, fields))
+
+
+@api_view
+@etag_by_generation("post:{post_id}", "authors", "groups")
+def post(request, post_id):
+    fields = selected_fields(request, POST_FIELDS)
+    found = (
+        post_queryset().filter(pk=post_id).first()
+        or querysets.archive_feed().filter(pk=post_id).first()
+    )
+    if found is None:
+        raise Http404
+    return json_response(serialize(found, POST_FIELDS, fields))
+
+
+@api_view
+@etag_by_generation("post:{post_id}", "authors")
+def comments(request, post_id):
+    if Post.objects.filter(pk=post_id).exists():
+        found = querysets.comments_of(post_id)
+    elif ArchivedPost.objects.filter(pk=post_id).exists():
+        found = querysets.archived_comments_of(post_id)
+    else:
+        raise Http404
+    return paginated(
+        request,
+        found,
+        COMMENT_FIELDS,
+        COMMENTS_IN_PAGE,
+        keys=("created", "pk"),
+    )
+
+
+@api_view
+@etag_by_generation("group:{slug}")
+def group(request, slug):
+    fields = selected_fields(request, GROUP_FIELDS)
+    found = get_object_or_404(Group, slug=slug)
+    return json_response(serialize(found, GROUP_FIELDS, fields))
+
+
+@api_view
+@etag_by_generation("group:{slug}", "authors")
+def group_posts(request, slug):
+    found = get_object_or_404(Group, slug=slug)
+    return paginated(
+        request,
+        querysets.group_feed(found),
+        LIST_POST_FIELDS,
+        POST_IN_PAGE,
+        archive=querysets.archived_group_feed(found),
+    )
+
+
+@api_view
+@etag_by_generation("profile:{username}", "authors")
+def profile(request, username):
+    fields = selected_fields(request, PROFILE_FIELDS)
+    found = get_object_or_404(
+        User.objects.select_related("stats"), username=username
+    )
+    return json_response(serialize(found, PROFILE_FIELDS, fields))
+
+
+@api_view
+@etag_by_generation("profile:{username}", "authors")
+def profile_posts(request, username):
+    found = get_object_or_404(User, username=username)
+    return paginated(
+        request,
+        querysets.author_feed(found),
+        LIST_POST_FIELDS,
+        POST_IN_PAGE,
+        archive=querysets.archived_author_feed(found),
+    )
@@ -0,0 +1,110 @@
+import time
+
+from posts import caching
+from posts.models import ArchivedComment, ArchivedPost, Comment, Post
+
+from django.db import connection, models, transaction
+
+
+def _placeholders(values):
+    return ", ".join(["%s"] * len(values))
+
+
+def move(cursor, ids):
+    """Переносит посты и их комментарии в архив и удаляет горячие строки.
+
+    Обычный delete() прошёл бы через коллектор и сигналы: вычел бы посты
+    из счётчиков автора, хотя в архиве они по-прежнему его. Поэтому здесь
+    прямые INSERT ... SELECT и DELETE; строки FTS-индекса убирает триггер.
+
+    Ленты (главная, группы, профили, подписки, в том числе по старым
+    ?page=N), страница поста и API читают архив сами. Поиск — нет:
+    архивные посты из него пропадают намеренно (posts.views.post_search).
+    """
+    marks = _placeholders(ids)
+    cursor.execute(
+        f"""INSERT INTO {ArchivedPost._meta.db_table}
+            (id, text, pub_date, author_id, group_id, image, comments_count)
+        SELECT p.id, p.text, p.pub_date, p.author_id, p.group_id, p.image,
+            (SELECT COUNT(*) FROM {Comment._meta.db_table} c
+             WHERE c.post_id = p.id)
+        FROM {Post._meta.db_table} p WHERE p.id IN ({marks})""",
+        ids,
+    )
+    cursor.execute(
+        f"""INSERT INTO {ArchivedComment._meta.db_table}
+            (id, post_id, author_id, text, created)
+        SELECT id, post_id, author_id, text, created
+        FROM {Comment._meta.db_table} WHERE post_id IN ({marks})""",
+        ids,
+    )
+    # Остальные зависимые строки (счётчики, ленты подписок) нужны только
+    # горячему набору — удаляем их так же, как удалил бы каскад.
+    for relation in Post._meta.related_objects:
+        if relation.on_delete is not models.CASCADE:
+            continue
+        cursor.execute(
+            f"DELETE FROM {relation.related_model._meta.db_table} "
+            f"WHERE {relation.field.column} IN ({marks})",
+            ids,
+        )
+    cursor.execute(
+        f"DELETE FROM {Post._meta.db_table} WHERE id IN ({marks})", ids
+    )
+
+
+def _generations(ids):
+    """Поколения страниц и адресов, на которых были посты пачки."""
+    pages = Post.objects.filter(pk__in=ids).values_list(
+        "author__username", "group__slug"
+    )
+    usernames, slugs = set(), set()
+    for username, slug in pages:
+        usernames.add(username)
+        slugs.add(slug)
+    paths = [
+        caching.page_path("posts:index"),
+        caching.page_path("posts:popular"),
+        *(caching.page_path("posts:post_detail", pk) for pk in ids),
+        *(caching.page_path("posts:profile", name) for name in usernames),
+        *(
+            caching.page_path("posts:group_list", slug)
+            for slug in slugs - {None}
+        ),
+    ]
+    return [
+        "index",
+        *(f"post:{pk}" for pk in ids),
+        *(f"profile:{username}" for username in usernames),
+        *(f"group:{slug}" for slug in slugs - {None}),
+        *(caching.url_generation(path) for path in paths if path),
+    ]
+
+
+def archive(cutoff, batch_size=500, pause=0, progress=None):
+    """Переносит посты старше cutoff в архив пачками по batch_size.
+
+    Каждая пачка — своя короткая транзакция, между пачками можно сделать
+    паузу, чтобы не держать блокировку записи и не душить запросы сайта.
+    Возвращает число перенесённых постов.
+    """
+    candidates = (
+        Post.objects.filter(pub_date__lt=cutoff)
+        .order_by("pub_date", "pk")
+        .values_list("pk", flat=True)
+    )
+    moved = 0
+    while True:
+        ids = list(candidates[:batch_size])
+        if not ids:
+            return moved
+        generations = _generations(ids)
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                move(cursor, ids)
+        caching.bump(*generations)
+        moved += len(ids)
+        if progress:
+            progress(moved)
+        if pause:
+            time.sleep(pause)
@@ -0,0 +1,259 @@
+import hashlib
+import time
+from functools import wraps
+from urllib.parse import unquote
+
+from core import routers
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.urls import NoReverseMatch, reverse
+from django.views.decorators.http import condition
+
+GENERATION_KEY = "generation:{}"
+ANONYMOUS_PAGE_KEY = "anonymous-page:{}:{}"
+# Параметры, которые различают страницы одного адреса; с любыми другими
+# запрос минует кэш, чтобы мусорные параметры не плодили ключи.
+PAGE_PARAMS = ("page", "cursor")
+
+
+def _key(name):
+    # Имена содержат слаги и ники пользователей, в том числе кириллицу.
+    return GENERATION_KEY.format(hashlib.md5(name.encode()).hexdigest())
+
+
+def _seed():
+    # Поколение стартует со времени, а не с 1: после вытеснения ключа
+    # из кэша новое значение не совпадёт со старыми ключами страниц.
+    return time.time_ns()
+
+
+def generations(*names):
+    """Текущие номера поколений для имён вида "group:<slug>"."""
+    keys = [_key(name) for name in names]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, _seed(), None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+
+def bump(*names):
+    """Сдвигает поколения — все страницы с ними перестают читаться.
+
+    Возвращает новые номера в порядке имён.
+    """
+    bumped = []
+    for name in names:
+        key = _key(name)
+        try:
+            bumped.append(cache.incr(key))
+        except ValueError:
+            bumped.append(_seed())
+            cache.set(key, bumped[-1], None)
+    return bumped
+
+
+def url_generation(path):
+    """Имя поколения адреса; reverse() и request.path дают один ключ."""
+    return f"url:{unquote(path)}"
+
+
+def page_path(view_name, *args):
+    """Адрес страницы для purge() или None, если значения нет в URL.
+
+    Слаг или ник, созданный в обход валидации, не проходит в шаблон
+    маршрута — такую страницу и запросить нельзя, сбрасывать нечего.
+    """
+    try:
+        return reverse(view_name, args=args)
+    except NoReverseMatch:
+        return None
+
+
+def purge(*paths):
+    """Сбрасывает анонимный кэш адресов вместе со всеми их страницами."""
+    return bump(*(url_generation(path) for path in paths if path))
+
+
+def resolve_names(names, request, kwargs):
+    """Подставляет аргументы вью в имена; вызываемые имена отдают список."""
+    resolved = []
+    for name in names:
+        if callable(name):
+            resolved.extend(name(request, **kwargs))
+        else:
+            resolved.append(name.format(**kwargs))
+    return resolved
+
+
+def etag_by_generation(*names):
+    """Условный GET: ETag из поколений, пользователя и адреса страницы.
+
+    Валидатор считается до вызова вью, из кэша, поэтому неизменившаяся
+    страница отвечает 304 без выборки постов и без рендеринга шаблона.
+    В него входит и CSRF-кука: после повторного входа токен сменился, и
+    страница с формой, сохранённая браузером, уже не годится. ETag не
+    получают страница с заглушками миниатюр и страница, прочитанная с
+    реплики: реплика могла отставать, а валидатор нового поколения
+    оставил бы браузер на устаревшей копии до следующей записи.
+    """
+
+    def etag(request, *args, **kwargs):
+        current = generations(*resolve_names(names, request, kwargs))
+        raw = "{}:{}:{}:{}".format(
+            ".".join(map(str, current)),
+            request.user.pk or "anon",
+            request.META.get("CSRF_COOKIE", ""),
+            request.get_full_path(),
+        )
+        return hashlib.md5(raw.encode()).hexdigest()
+
+    def decorator(view):
+        conditional = condition(etag_func=etag)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional(request, *args, **kwargs)
+            if (
+                getattr(request, "thumbnails_pending", False)
+                or routers.state.replica_reads
+            ):
+                del response["ETag"]
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def cache_page_by_generation(*names, timeout=None):
+    """Кэширует страницу под ключом из поколений, а не на фиксированный срок.
+
+    Имена форматируются аргументами вью: "group:{slug}". Запись в модели
+    сдвигает поколение, так что страница может жить часами и всё равно
+    обновляется сразу после изменения данных.
+    """
+    timeout = timeout or settings.PAGE_CACHE_TIMEOUT
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view(request, *args, **kwargs)
+            current = generations(*resolve_names(names, request, kwargs))
+            path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+            key = "page:{}:{}:{}:{}".format(
+                view.__name__,
+                ".".join(map(str, current)),
+                request.user.pk or "anon",
+                path,
+            )
+            response = cache.get(key)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if (
+                    response.status_code == 200
+                    and not response.streaming
+                    and not getattr(request, "thumbnails_pending", False)
+                ):
+                    cache.set(
+                        key, response, routers.lag_bounded_timeout(timeout)
+                    )
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+class AnonymousPageCacheMiddleware:
+    """Отдаёт анонимам готовые страницы из кэша, не вызывая вью.
+
+    Кэшируются GET-запросы к маршрутам из ANONYMOUS_PAGE_CACHE_VIEWS от
+    клиентов без сессии, CSRF-куки, сообщений и привязки к основной базе
+    (REPLICA_PIN_COOKIE). Ключ — поколение адреса плюс page и cursor;
+    сигналы моделей вызывают purge() ровно для изменившихся адресов.
+    Если страница показывает данные чужого адреса, вью перечисляет такие
+    адреса в request.page_depends_on — их поколения сверяются при чтении.
+    Ответ с CSRF-токеном или куками не сохраняется.
+
+    Стоит после RateLimitMiddleware: её process_view срабатывает раньше,
+    так что лимиты действуют и на ответы из кэша.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.private_cookies = {
+            settings.SESSION_COOKIE_NAME,
+            settings.CSRF_COOKIE_NAME,
+            settings.REPLICA_PIN_COOKIE,
+            CookieStorage.cookie_name,
+        }
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        key = getattr(request, "anonymous_page_key", None)
+        if key and self.storable(request, response):
+            depends_on = getattr(request, "page_depends_on", [])
+            cache.set(
+                key,
+                (depends_on, self.generations(depends_on), response),
+                routers.lag_bounded_timeout(
+                    settings.ANONYMOUS_PAGE_CACHE_TIMEOUT
+                ),
+            )
+        return response
+
+    @staticmethod
+    def generations(paths):
+        names = [url_generation(path) for path in paths if path]
+        return generations(*names) if names else []
+
+    def cacheable(self, request):
+        return (
+            request.method in ("GET", "HEAD")
+            and request.resolver_match.view_name
+            in settings.ANONYMOUS_PAGE_CACHE_VIEWS
+            and not self.private_cookies.intersection(request.COOKIES)
+            and set(request.GET).issubset(PAGE_PARAMS)
+        )
+
+    @staticmethod
+    def storable(request, response):
+        return (
+            response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and not request.META.get("CSRF_COOKIE_USED")
+            and not getattr(request, "thumbnails_pending", False)
+        )
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not self.cacheable(request):
+            return None
+        current = generations("authors", url_generation(request.path))
+        page = "&".join(
+            f"{name}={request.GET[name]}"
+            for name in PAGE_PARAMS
+            if name in request.GET
+        )
+        key = ANONYMOUS_PAGE_KEY.format(
+            ".".join(map(str, current)),
+            hashlib.md5(f"{request.path}?{page}".encode()).hexdigest(),
+        )
+        entry = cache.get(key)
+        if entry is not None:
+            depends_on, seen, response = entry
+            if self.generations(depends_on) != seen:
+                entry = None
+        if entry is None:
+            request.anonymous_page_key = key
+            return None
+        # ETag сохранён вместе с ответом: повторный запрос получит 304.
+        return get_conditional_response(
+            request, etag=response.get("ETag"), response=response
+        )
@@ -0,0 +1,102 @@
+from posts.models import (
+    ArchivedPost,
+    AuthorStats,
+    Comment,
+    Follow,
+    Post,
+    PostStats,
+    User,
+)
+
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def bump(model, pk, **deltas):
+    """Атомарно сдвигает счётчики строки через F()."""
+    changes = {field: F(field) + delta for field, delta in deltas.items()}
+    if model.objects.filter(pk=pk).update(**changes):
+        return
+    # При вычитании строку не создаём: владелец, скорее всего, удаляется
+    # каскадом, а расхождение поправит reconcile_counters.
+    if all(delta > 0 for delta in deltas.values()):
+        _, created = model.objects.get_or_create(pk=pk, defaults=deltas)
+        if not created:
+            model.objects.filter(pk=pk).update(**changes)
+
+
+def author_stats(user):
+    try:
+        return user.stats
+    except AuthorStats.DoesNotExist:
+        return AuthorStats(user=user)
+
+
+def post_stats(post):
+    try:
+        return post.stats
+    except PostStats.DoesNotExist:
+        return PostStats(post=post)
+
+
+def _count(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(total=Count("pk"))
+            .values("total")
+        ),
+        0,
+    )
+
+
+COUNTERS = (
+    # Архивные посты остаются постами автора.
+    (
+        AuthorStats,
+        "posts_count",
+        _count(Post, "author") + _count(ArchivedPost, "author"),
+    ),
+    (AuthorStats, "followers_count", _count(Follow, "author")),
+    (AuthorStats, "following_count", _count(Follow, "user")),
+    (PostStats, "comments_count", _count(Comment, "post")),
+)
+
+
+def reconcile(users=None, posts=None):
+    """Пересчитывает счётчики по данным и возвращает число правок.
+
+    users и posts — pk пользователей и горячих постов, которыми надо
+    ограничиться (например, затронутых пачкой импорта); по умолчанию
+    пересчитываются все.
+    """
+    if users is not None:
+        user_ids = users
+    else:
+        user_ids = User.objects.values_list("pk", flat=True).iterator()
+    if posts is not None:
+        post_ids = posts
+    else:
+        post_ids = Post.objects.values_list("pk", flat=True).iterator()
+    AuthorStats.objects.bulk_create(
+        (AuthorStats(user_id=pk) for pk in user_ids),
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+    PostStats.objects.bulk_create(
+        (PostStats(post_id=pk) for pk in post_ids),
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+    scope = {AuthorStats: users, PostStats: posts}
+    fixed = {}
+    for model, field, actual in COUNTERS:
+        rows = model.objects.all()
+        if scope[model] is not None:
+            rows = rows.filter(pk__in=scope[model])
+        fixed[field] = rows.exclude(**{field: actual}).update(
+            **{field: actual}
+        )
+    return fixed
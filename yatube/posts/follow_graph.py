@@ -0,0 +1,84 @@
+from array import array
+from bisect import bisect_left
+
+from core import routers
+from posts import caching
+from posts.models import Follow
+
+from django.core.cache import cache
+
+FOLLOWEES_KEY = "followees:{}:{}"
+FOLLOWEES_TIMEOUT = 60 * 60 * 24
+
+
+def _name(user_id):
+    return f"followees:{user_id}"
+
+
+def _unpack(packed):
+    ids = array("I")
+    ids.frombytes(packed)
+    return ids
+
+
+def followees(user_id):
+    """Отсортированный array("I") id авторов, на которых подписан user_id.
+
+    Хранится в кэше байтами — 4 байта на подписку — под ключом с
+    поколением, так что загрузка из базы, запоздавшая к подписке,
+    пишет в уже отжившее поколение и не затирает свежий набор.
+    """
+    (generation,) = caching.generations(_name(user_id))
+    key = FOLLOWEES_KEY.format(user_id, generation)
+    packed = cache.get(key)
+    if packed is not None:
+        return _unpack(packed)
+    ids = array(
+        "I",
+        Follow.objects.filter(user_id=user_id)
+        .order_by("author_id")
+        .values_list("author_id", flat=True),
+    )
+    cache.set(
+        key, ids.tobytes(), routers.lag_bounded_timeout(FOLLOWEES_TIMEOUT)
+    )
+    return ids
+
+
+def follows(user_id, author_id):
+    ids = followees(user_id)
+    index = bisect_left(ids, author_id)
+    return index < len(ids) and ids[index] == author_id
+
+
+def _update(user_id, author_id, followed):
+    """Переносит набор в новое поколение с одной правкой, без запроса.
+
+    Каждый писатель получает своё поколение от incr и правит набор
+    предыдущего. Если его нет — вытеснен или соседний писатель ещё не
+    успел — набор просто загрузится из базы при следующем чтении.
+    """
+    (generation,) = caching.bump(_name(user_id))
+    packed = cache.get(FOLLOWEES_KEY.format(user_id, generation - 1))
+    if packed is None:
+        return
+    ids = _unpack(packed)
+    index = bisect_left(ids, author_id)
+    present = index < len(ids) and ids[index] == author_id
+    if followed and not present:
+        ids.insert(index, author_id)
+    elif not followed and present:
+        del ids[index]
+    cache.set(
+        FOLLOWEES_KEY.format(user_id, generation),
+        ids.tobytes(),
+        FOLLOWEES_TIMEOUT,
+    )
+
+
+def add(user_id, author_id):
+    _update(user_id, author_id, followed=True)
+
+
+def remove(user_id, author_id):
+    _update(user_id, author_id, followed=False)
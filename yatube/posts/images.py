@@ -0,0 +1,52 @@
+from io import BytesIO
+
+from PIL import Image, ImageOps, features
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+
+# Форматы, которые пережимаются в себя же. GIF не трогаем: Pillow
+# потеряет анимацию.
+ENCODERS = {
+    "JPEG": lambda quality: {
+        "quality": quality,
+        "optimize": True,
+        "progressive": True,
+    },
+    "PNG": lambda quality: {"optimize": True},
+    "WEBP": lambda quality: {"quality": quality, "method": 6},
+}
+
+
+def webp_supported():
+    """Pillow может быть собран без libwebp — тогда WebP не создаём."""
+    return features.check("webp")
+
+
+def normalize(name, storage):
+    """Приводит загруженную картинку к виду, пригодному для раздачи.
+
+    Поворачивает по EXIF-ориентации, уменьшает до IMAGE_MAX_SIZE по
+    большей стороне и пережимает с качеством IMAGE_QUALITY. Метаданные
+    EXIF (в том числе координаты съёмки) при этом отбрасываются, цветовой
+    профиль сохраняется. Результат сохраняется как новый файл; исходный
+    не трогается — его удаляет вызывающий, когда посты переведены на
+    новое имя. Возвращает новое имя или None, если формат не пережимается.
+    """
+    with storage.open(name) as file:
+        image = Image.open(file)
+        image_format = image.format
+        if image_format not in ENCODERS:
+            return None
+        icc_profile = image.info.get("icc_profile")
+        image = ImageOps.exif_transpose(image)
+    limit = settings.IMAGE_MAX_SIZE
+    image.thumbnail((limit, limit), Image.LANCZOS)
+    if image_format == "JPEG" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    params = ENCODERS[image_format](settings.IMAGE_QUALITY)
+    if icc_profile:
+        params["icc_profile"] = icc_profile
+    buffer = BytesIO()
+    image.save(buffer, image_format, **params)
+    return storage.save(name, ContentFile(buffer.getvalue()))
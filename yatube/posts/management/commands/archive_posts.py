@@ -0,0 +1,40 @@
+import datetime
+
+from posts.archive import archive
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        "Переносит посты старше --days дней и их комментарии в архивные "
+        "таблицы короткими пачками, не трогая счётчики авторов."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=settings.ARCHIVE_AFTER_DAYS
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.05,
+            help="Пауза между пачками, секунд.",
+        )
+
+    def handle(self, *args, **options):
+        if options["days"] < 0 or options["batch_size"] < 1:
+            raise CommandError("--days и --batch-size должны быть больше 0")
+        cutoff = timezone.now() - datetime.timedelta(days=options["days"])
+        moved = archive(
+            cutoff,
+            batch_size=options["batch_size"],
+            pause=options["pause"],
+            progress=lambda moved: self.stdout.write(
+                f"перенесено постов: {moved}"
+            ),
+        )
+        self.stdout.write(f"В архиве новых постов: {moved}")
@@ -0,0 +1,267 @@
+import json
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from contextlib import closing
+
+from core.cache import isolated_caches
+from posts.management.commands.bench_views import CLIENT_ADDR, percentile
+from posts.models import Group, Post, User
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connections
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+PROFILES = ("baseline", "tuned")
+
+
+def profile_settings(name):
+    """baseline — умолчания SQLite и Django: журнал DELETE и новое
+    соединение на каждый запрос; tuned — профиль из settings."""
+    if name == "baseline":
+        return {"journal_mode": "delete", "synchronous": "full"}, 0
+    return (
+        settings.SQLITE_PRAGMAS,
+        settings.DATABASES["default"].get("CONN_MAX_AGE", 0),
+    )
+
+
+class Worker(threading.Thread):
+    """Поток-«клиент»: смесь чтений лент и записей комментариев/постов."""
+
+    def __init__(self, number, samples, options, deadline):
+        super().__init__(name=f"bench-{number}")
+        self.rng = random.Random(options["seed"] + number)
+        self.samples = samples
+        self.write_share = options["write_share"]
+        self.deadline = deadline
+        self.timings = {"read": [], "write": []}
+        self.errors = 0
+
+    def request(self, client):
+        samples = self.samples
+        if self.rng.random() < self.write_share:
+            if self.rng.random() < 0.5:
+                url = reverse(
+                    "posts:add_comment",
+                    args=[self.rng.choice(samples["post_ids"])],
+                )
+                return "write", lambda: client.post(url, {"text": "Замер"})
+            url = reverse("posts:post_create")
+            return "write", lambda: client.post(url, {"text": "Замер"})
+        url = self.rng.choice(
+            [
+                reverse("posts:index"),
+                reverse("posts:follow_index"),
+                reverse(
+                    "posts:group_list",
+                    args=[self.rng.choice(samples["slugs"])],
+                ),
+                reverse(
+                    "posts:profile",
+                    args=[self.rng.choice(samples["usernames"])],
+                ),
+                reverse(
+                    "posts:post_detail",
+                    args=[self.rng.choice(samples["post_ids"])],
+                ),
+            ]
+        )
+        return "read", lambda: client.get(url)
+
+    def run(self):
+        try:
+            client = Client(REMOTE_ADDR=CLIENT_ADDR)
+            client.force_login(self.rng.choice(self.samples["users"]))
+            while time.perf_counter() < self.deadline:
+                kind, send = self.request(client)
+                started = time.perf_counter()
+                try:
+                    send()
+                except OperationalError:
+                    # "database is locked": писатель не дождался блокировки.
+                    self.errors += 1
+                else:
+                    self.timings[kind].append(time.perf_counter() - started)
+                # Как сервер после ответа: закрывает соединение, если
+                # CONN_MAX_AGE истёк (при 0 — всегда).
+                close_old_connections()
+        finally:
+            connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагружает копию базы потоками со смесью чтений и записей "
+        "(add_comment, post_create) и сравнивает профиль SQLite из "
+        "настроек (WAL, mmap, busy_timeout, постоянные соединения) с "
+        "умолчаниями: пропускная способность, p50/p95 и ошибки блокировок."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument(
+            "--duration", type=float, default=10, help="Секунд на профиль."
+        )
+        parser.add_argument(
+            "--write-share",
+            type=float,
+            default=0.2,
+            help="Доля запросов-записей.",
+        )
+        parser.add_argument(
+            "--profile",
+            choices=[*PROFILES, "both"],
+            default="both",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="Куда сохранить JSON.")
+
+    def handle(self, *args, **options):
+        database = connections.databases["default"]
+        if database["ENGINE"] != "django.db.backends.sqlite3":
+            raise CommandError("Замер имеет смысл только для SQLite")
+        if options["threads"] < 1 or options["duration"] <= 0:
+            raise CommandError("--threads и --duration должны быть больше 0")
+        if not 0 <= options["write_share"] <= 1:
+            raise CommandError("--write-share должен быть от 0 до 1")
+        samples = self.samples()
+        names = (
+            list(PROFILES)
+            if options["profile"] == "both"
+            else [options["profile"]]
+        )
+        results = {}
+        for name in names:
+            results[name] = self.run_profile(name, samples, options)
+        self.print_report(results)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as file:
+                json.dump(
+                    {"meta": self.meta(options), "results": results},
+                    file,
+                    ensure_ascii=False,
+                    indent=2,
+                )
+
+    def samples(self):
+        post_ids = list(
+            Post.objects.order_by("-pk").values_list("pk", flat=True)[:200]
+        )
+        slugs = list(Group.objects.values_list("slug", flat=True)[:50])
+        users = list(User.objects.order_by("pk")[:100])
+        if not post_ids or not slugs:
+            raise CommandError(
+                "В базе нет постов или групп — сначала запустите seed_dataset"
+            )
+        return {
+            "post_ids": post_ids,
+            "slugs": slugs,
+            "users": users,
+            "usernames": [user.username for user in users],
+        }
+
+    def meta(self, options):
+        return {
+            "threads": options["threads"],
+            "duration": options["duration"],
+            "write_share": options["write_share"],
+            "sqlite": sqlite3.sqlite_version,
+            "posts": Post.objects.count(),
+        }
+
+    def copy_database(self, source, journal_mode):
+        """Снимок базы через backup API: исходный файл не меняется."""
+        fd, path = tempfile.mkstemp(suffix=".sqlite3")
+        os.close(fd)
+        with closing(sqlite3.connect(source)) as src:
+            with closing(sqlite3.connect(path)) as dst:
+                src.backup(dst)
+                # Режим журнала хранится в самом файле — выставляем явно.
+                dst.execute(f"PRAGMA journal_mode = {journal_mode}")
+        return path
+
+    def run_profile(self, name, samples, options):
+        pragmas, conn_max_age = profile_settings(name)
+        database = connections.databases["default"]
+        original = {key: database.get(key) for key in ("NAME", "CONN_MAX_AGE")}
+        connections.close_all()
+        path = self.copy_database(
+            original["NAME"], pragmas.get("journal_mode", "delete")
+        )
+        # Потоки создают свои соединения из этого же словаря настроек.
+        database.update(NAME=path, CONN_MAX_AGE=conn_max_age)
+        # Свой пустой кэш на каждый профиль: общий кэш запущенного сайта не
+        # трогаем, а профили не греют кэш друг другу.
+        cache_dir = tempfile.mkdtemp(prefix="yatube-bench-cache-")
+        try:
+            # Ограничитель выключен: замеряем базу, а не 429.
+            with override_settings(
+                SQLITE_PRAGMAS=pragmas,
+                RATE_LIMITS={},
+                CACHES=isolated_caches(cache_dir),
+            ):
+                started = time.perf_counter()
+                deadline = started + options["duration"]
+                workers = [
+                    Worker(number, samples, options, deadline)
+                    for number in range(options["threads"])
+                ]
+                for worker in workers:
+                    worker.start()
+                for worker in workers:
+                    worker.join()
+                elapsed = time.perf_counter() - started
+        finally:
+            connections.close_all()
+            database.update(original)
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            for suffix in ("", "-wal", "-shm", "-journal"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+        return self.summary(workers, elapsed)
+
+    def summary(self, workers, elapsed):
+        result = {"errors": sum(worker.errors for worker in workers)}
+        total = 0
+        for kind in ("read", "write"):
+            timings = [t for worker in workers for t in worker.timings[kind]]
+            total += len(timings)
+            result[kind] = {
+                "count": len(timings),
+                "p50_ms": (
+                    round(statistics.median(timings) * 1000, 2)
+                    if timings
+                    else None
+                ),
+                "p95_ms": (
+                    round(percentile(timings, 0.95) * 1000, 2)
+                    if timings
+                    else None
+                ),
+            }
+        result["rps"] = round(total / elapsed, 1)
+        return result
+
+    def print_report(self, results):
+        def timings(result):
+            return "{}/{}".format(result["p50_ms"], result["p95_ms"])
+
+        self.stdout.write(
+            f"{'профиль':<10} {'RPS':>7} {'чтение p50/p95, мс':>20} "
+            f"{'запись p50/p95, мс':>20} {'ошибок':>7}"
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<10} {result['rps']:>7} "
+                f"{timings(result['read']):>20} "
+                f"{timings(result['write']):>20} {result['errors']:>7}"
+            )
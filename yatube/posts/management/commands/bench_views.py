@@ -0,0 +1,209 @@
+import json
+import platform
+import statistics
+import time
+
+from posts.models import Follow, Group, Post, User
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.db.models.signals import post_init
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import URLPattern, get_resolver, reverse
+
+# Вьюхи, которые пишут в базу: замеряем POST, а изменения откатываем.
+WRITE_REQUESTS = {
+    "post_create": {"text": "Замер скорости создания поста"},
+    "post_edit": {"text": "Замер скорости правки поста"},
+    "add_comment": {"text": "Замер скорости комментария"},
+}
+# Адрес не из INTERNAL_IPS: иначе при DEBUG замер съест debug_toolbar.
+CLIENT_ADDR = "192.0.2.1"
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(share * (len(ordered) - 1)))
+    return ordered[index]
+
+
+class RowCounter:
+    """Считает модели, собранные из строк выборки, через post_init."""
+
+    def __init__(self):
+        self.rows = 0
+
+    def __call__(self, **kwargs):
+        self.rows += 1
+
+    def __enter__(self):
+        post_init.connect(self, weak=False)
+        return self
+
+    def __exit__(self, *exc_info):
+        post_init.disconnect(self)
+
+
+class Command(BaseCommand):
+    help = (
+        "Прогоняет все URL приложения posts через тестовый клиент и "
+        "печатает p50/p95 задержки, число запросов и строк на вью. "
+        "Результат можно сохранить в JSON и сравнить с прошлым прогоном."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument(
+            "--cold",
+            action="store_true",
+            help="Очищать кэш перед каждым запросом.",
+        )
+        parser.add_argument("--output", help="Куда сохранить JSON.")
+        parser.add_argument(
+            "--compare", help="JSON прошлого прогона для сравнения."
+        )
+
+    def handle(self, *args, **options):
+        if options["repeat"] < 1:
+            raise CommandError("--repeat должен быть положительным")
+        samples = self.samples()
+        client = Client(REMOTE_ADDR=CLIENT_ADDR)
+        client.force_login(samples["user"])
+        results = {}
+        # Замеряем вью, а не ограничитель: повторные POST упёрлись бы в 429.
+        with override_settings(RATE_LIMITS={}):
+            for name, url in self.urls(samples):
+                data = WRITE_REQUESTS.get(name)
+                results[name] = self.measure(client, url, data, options)
+        report = {
+            "meta": {
+                "repeat": options["repeat"],
+                "cold": options["cold"],
+                "python": platform.python_version(),
+                "database": connection.vendor,
+                "posts": Post.objects.count(),
+            },
+            "results": results,
+        }
+        baseline = None
+        if options["compare"]:
+            with open(options["compare"], encoding="utf-8") as file:
+                baseline = json.load(file)["results"]
+        self.print_report(results, baseline)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+
+    def samples(self):
+        """Самые «тяжёлые» объекты набора — на них вьюхи работают дольше."""
+        post = (
+            Post.objects.annotate(total=Count("comments"))
+            .order_by("-total", "-pk")
+            .first()
+        )
+        author = (
+            User.objects.annotate(total=Count("posts"))
+            .order_by("-total", "-pk")
+            .first()
+        )
+        follower = (
+            Follow.objects.values("user")
+            .annotate(total=Count("pk"))
+            .order_by("-total")
+            .first()
+        )
+        group = (
+            Group.objects.annotate(total=Count("posts"))
+            .order_by("-total", "-pk")
+            .first()
+        )
+        if post is None or group is None:
+            raise CommandError(
+                "В базе нет постов или групп — сначала запустите seed_dataset"
+            )
+        user = (
+            User.objects.get(pk=follower["user"]) if follower else post.author
+        )
+        return {
+            "user": user,
+            "post_id": post.pk,
+            "username": author.username,
+            "slug": group.slug,
+        }
+
+    def urls(self, samples):
+        """Все именованные маршруты из пространства имён posts."""
+        resolver = get_resolver().namespace_dict["posts"][1]
+        for pattern in resolver.url_patterns:
+            if not isinstance(pattern, URLPattern) or not pattern.name:
+                continue
+            kwargs = {
+                name: samples[name] for name in pattern.pattern.converters
+            }
+            if pattern.name == "post_edit":
+                kwargs["post_id"] = (
+                    Post.objects.filter(author=samples["user"])
+                    .values_list("pk", flat=True)
+                    .first()
+                    or samples["post_id"]
+                )
+            url = reverse(f"posts:{pattern.name}", kwargs=kwargs)
+            query = {
+                "post_search": "?q=пост",
+                "api_posts_batch": "?ids="
+                + ",".join(map(str, range(samples["post_id"], 0, -1)[:50])),
+            }
+            yield pattern.name, url + query.get(pattern.name, "")
+
+    def measure(self, client, url, data, options):
+        timings, queries, rows = [], [], []
+        status = None
+        for _ in range(options["repeat"]):
+            if options["cold"]:
+                cache.clear()
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as captured:
+                    with RowCounter() as counter:
+                        started = time.perf_counter()
+                        if data is None:
+                            response = client.get(url)
+                        else:
+                            response = client.post(url, data)
+                        if response.streaming:
+                            # Потоковый ответ сериализуется при чтении.
+                            b"".join(response.streaming_content)
+                        timings.append(time.perf_counter() - started)
+                transaction.set_rollback(True)
+            status = response.status_code
+            queries.append(len(captured))
+            rows.append(counter.rows)
+        return {
+            "url": url,
+            "method": "GET" if data is None else "POST",
+            "status": status,
+            "p50_ms": round(statistics.median(timings) * 1000, 2),
+            "p95_ms": round(percentile(timings, 0.95) * 1000, 2),
+            "queries": statistics.median_low(queries),
+            "rows": statistics.median_low(rows),
+        }
+
+    def print_report(self, results, baseline):
+        header = f"{'вью':<18} {'p50, мс':>9} {'p95, мс':>9} {'SQL':>5} "
+        header += f"{'строк':>6}"
+        if baseline:
+            header += f" {'Δp50':>8} {'ΔSQL':>6}"
+        self.stdout.write(header)
+        for name, result in results.items():
+            line = (
+                f"{name:<18} {result['p50_ms']:>9} {result['p95_ms']:>9} "
+                f"{result['queries']:>5} {result['rows']:>6}"
+            )
+            previous = (baseline or {}).get(name)
+            if previous:
+                change = result["p50_ms"] - previous["p50_ms"]
+                queries = result["queries"] - previous["queries"]
+                line += f" {change:>+8.2f} {queries:>+6}"
+            self.stdout.write(line)
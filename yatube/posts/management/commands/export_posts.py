@@ -0,0 +1,36 @@
+from posts.transfer import dump, export_records
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Выгружает пользователей, группы, посты с комментариями (и из "
+        "архива) и подписки в JSONL. Пароли и файлы картинок не "
+        "переносятся."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path", nargs="?", default="-", help="Файл или - для stdout."
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Сколько строк читать из базы за раз.",
+        )
+
+    def handle(self, *args, **options):
+        records = export_records(options["chunk_size"])
+        if options["path"] == "-":
+            dump(records, self.stdout)
+            return
+        with open(options["path"], "w", encoding="utf-8") as file:
+            dump(self.counted(records), file)
+
+    def counted(self, records):
+        for count, record in enumerate(records, 1):
+            if count % 10000 == 0:
+                self.stderr.write(f"Выгружено записей: {count}")
+            yield record
@@ -0,0 +1,113 @@
+import sys
+
+from posts import caching, counters, follow_graph, timeline, trending
+from posts.models import User
+from posts.transfer import Importer, load
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+PROGRESS_EVERY = 10000
+
+
+class Command(BaseCommand):
+    help = (
+        "Загружает JSONL из export_posts пачками bulk_create, каждая — "
+        "своей транзакцией. Ссылки ищутся по нику и слагу группы, уже "
+        "существующие записи пропускаются. Новым пользователям пароль не "
+        "задаётся."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path", nargs="?", default="-", help="Файл или - для stdin."
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=400,
+            help="Сколько записей вставлять за раз.",
+        )
+
+    def handle(self, *args, **options):
+        importer = Importer(options["batch_size"])
+        try:
+            if options["path"] == "-":
+                self.run(importer, sys.stdin)
+            else:
+                with open(options["path"], encoding="utf-8") as file:
+                    self.run(importer, file)
+        except (OSError, ValueError, KeyError) as error:
+            raise CommandError(f"Импорт прерван: {error!r}")
+        created = ", ".join(
+            f"{kind}: {count}" for kind, count in importer.created.items()
+        )
+        self.stdout.write(self.style.SUCCESS(f"Создано — {created}"))
+        if importer.skipped:
+            self.stdout.write(
+                f"Пропущено записей с неизвестными ссылками: "
+                f"{importer.skipped}"
+            )
+
+    def run(self, importer, file):
+        importer.run(load(file), progress=self.progress, apply=self.apply)
+        self.stderr.write("Пересчёт популярного...")
+        trending.refresh()
+
+    def apply(self, changes):
+        """Производные данные пачки: bulk_create не шлёт сигналы.
+
+        Счётчики и ленты правятся только у затронутых пачкой авторов,
+        читателей и постов; поколения кэша сдвигаются после коммита.
+        """
+        follow_users = {
+            user_id for pair in changes.follows for user_id in pair
+        }
+        users = changes.authors | follow_users
+        counters.reconcile(users=users, posts=set(changes.posts))
+        timeline.fan_out_many(
+            (pk, author_id, pub_date)
+            for pk, (author_id, pub_date) in changes.posts.items()
+        )
+        timeline.backfill_many(changes.follows)
+        usernames = list(
+            User.objects.filter(pk__in=users).values_list(
+                "username", flat=True
+            )
+        )
+        transaction.on_commit(lambda: self.invalidate(changes, usernames))
+
+    def invalidate(self, changes, usernames):
+        slugs = changes.groups | changes.post_groups
+        generations = [
+            *(f"profile:{username}" for username in usernames),
+            *(f"group:{slug}" for slug in slugs),
+            *(f"timeline:{user_id}" for user_id, _ in changes.follows),
+        ]
+        paths = [
+            *(caching.page_path("posts:profile", name) for name in usernames),
+            *(caching.page_path("posts:group_list", slug) for slug in slugs),
+        ]
+        if changes.authors or changes.groups:
+            generations.append("index")
+            paths += [
+                caching.page_path("posts:index"),
+                caching.page_path("posts:popular"),
+            ]
+        if changes.groups:
+            generations.append("groups")
+        if generations:
+            caching.bump(*generations)
+        caching.purge(*paths)
+        for user_id, author_id in changes.follows:
+            follow_graph.add(user_id, author_id)
+
+    def progress(self, importer):
+        if importer.processed % PROGRESS_EVERY >= importer.batch_size:
+            return
+        self.stderr.write(
+            f"Прочитано записей {importer.processed}; создано: "
+            + ", ".join(
+                f"{kind} {count}" for kind, count in importer.created.items()
+            )
+        )
@@ -0,0 +1,46 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from posts.models import Post
+from posts.thumbnails import init_worker, render_thumbnails
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Параллельно создаёт миниатюры для картинок существующих постов."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=settings.THUMBNAIL_WORKERS,
+            help="Число процессов пула.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=20,
+            help="Сколько файлов отдавать процессу за раз.",
+        )
+
+    def handle(self, *args, **options):
+        names = (
+            Post.objects.exclude(image="")
+            .values_list("image", flat=True)
+            .iterator()
+        )
+        done = 0
+        with ProcessPoolExecutor(
+            max_workers=options["workers"],
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+        ) as pool:
+            for _ in pool.map(
+                render_thumbnails, names, chunksize=options["chunk_size"]
+            ):
+                done += 1
+                if done % 100 == 0:
+                    self.stdout.write(f"Готово: {done}")
+        self.stdout.write(self.style.SUCCESS(f"Миниатюр создано для {done}"))
@@ -0,0 +1,15 @@
+from posts import search
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+
+class Command(BaseCommand):
+    help = "Пересобирает полнотекстовый индекс постов и его триггеры."
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            raise CommandError("Полнотекстовый поиск есть только в SQLite")
+        with transaction.atomic(), connection.cursor() as cursor:
+            search.rebuild(cursor)
+        self.stdout.write(self.style.SUCCESS("Индекс поиска пересобран"))
@@ -0,0 +1,11 @@
+from posts.counters import reconcile
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает денормализованные счётчики постов и подписок."
+
+    def handle(self, *args, **options):
+        for field, fixed in reconcile().items():
+            self.stdout.write(f"{field}: исправлено строк {fixed}")
@@ -0,0 +1,14 @@
+from posts import trending
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает рейтинг популярных постов по комментариям за "
+        "TRENDING_WINDOW_DAYS. Запускайте по расписанию."
+    )
+
+    def handle(self, *args, **options):
+        count = trending.refresh()
+        self.stdout.write(f"Постов в рейтинге: {count}")
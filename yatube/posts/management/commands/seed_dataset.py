@@ -0,0 +1,191 @@
+import datetime
+import itertools
+import random
+
+from faker import Faker
+
+from posts import counters, timeline, trending
+from posts.models import Comment, Follow, Group, Post, User
+from posts.utils import keep_auto_now_add
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+BATCH_SIZE = 500
+
+
+def zipf_weights(count, exponent):
+    """Веса «длинного хвоста»: k-й по популярности получает 1 / k^s."""
+    return list(
+        itertools.accumulate(
+            1 / rank**exponent for rank in range(1, count + 1)
+        )
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Заполняет базу воспроизводимым набором данных для нагрузочных "
+        "замеров: пользователи, группы, посты, комментарии и подписки "
+        "с перекосом популярности, как в живых данных."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--groups", type=int, default=20)
+        parser.add_argument("--posts", type=int, default=20000)
+        parser.add_argument("--comments", type=int, default=50000)
+        parser.add_argument("--follows", type=int, default=20000)
+        parser.add_argument(
+            "--skew",
+            type=float,
+            default=1.1,
+            help="Показатель закона Ципфа для популярности авторов.",
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=365,
+            help="За сколько дней разбросать даты публикаций.",
+        )
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options["seed"])
+        self.fake = Faker("ru_RU")
+        self.fake.seed_instance(options["seed"])
+        self.now = timezone.now()
+        self.span = datetime.timedelta(days=options["days"])
+        dated = keep_auto_now_add(
+            Post._meta.get_field("pub_date"),
+            Comment._meta.get_field("created"),
+        )
+        with transaction.atomic(), dated:
+            users = self.create_users(options["users"])
+            groups = self.create_groups(options["groups"])
+            authors = users[:]
+            self.random.shuffle(authors)
+            author_weights = zipf_weights(len(authors), options["skew"])
+            posts = self.create_posts(
+                options["posts"], authors, author_weights, groups
+            )
+            self.create_comments(options["comments"], users, posts)
+            self.create_follows(
+                options["follows"], users, authors, author_weights
+            )
+            self.stdout.write("Пересчёт счётчиков и лент подписок...")
+            counters.reconcile()
+            timeline.rebuild()
+            trending.refresh()
+        # bulk_create не шлёт сигналов — кэш страниц и подписок устарел.
+        cache.clear()
+        self.stdout.write(self.style.SUCCESS("Набор данных создан"))
+
+    def random_date(self):
+        # Свежих постов больше, чем старых, как в живой ленте.
+        return self.now - self.span * self.random.random() ** 2
+
+    def create_users(self, count):
+        password = make_password(None)
+        start = User.objects.count()
+        User.objects.bulk_create(
+            (
+                User(
+                    username=f"{self.fake.user_name()}_{start + i}",
+                    first_name=self.fake.first_name(),
+                    last_name=self.fake.last_name(),
+                    password=password,
+                )
+                for i in range(count)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        self.stdout.write(f"Пользователей: {count}")
+        return list(
+            User.objects.order_by("-pk").values_list("pk", flat=True)[:count]
+        )
+
+    def create_groups(self, count):
+        start = Group.objects.count()
+        Group.objects.bulk_create(
+            Group(
+                title=self.fake.sentence(nb_words=3).rstrip("."),
+                slug=f"group-{start + i}",
+                description=self.fake.paragraph(),
+            )
+            for i in range(count)
+        )
+        self.stdout.write(f"Групп: {count}")
+        return list(
+            Group.objects.order_by("-pk").values_list("pk", flat=True)[:count]
+        )
+
+    def create_posts(self, count, authors, weights, groups):
+        start = (
+            Post.objects.order_by("-pk").values_list("pk", flat=True).first()
+            or 0
+        )
+        authors_of = self.random.choices(authors, cum_weights=weights, k=count)
+        Post.objects.bulk_create(
+            (
+                Post(
+                    text=self.fake.text(max_nb_chars=240),
+                    author_id=author_id,
+                    pub_date=self.random_date(),
+                    group_id=(
+                        self.random.choice(groups)
+                        if groups and self.random.random() < 0.6
+                        else None
+                    ),
+                )
+                for author_id in authors_of
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        ids = list(
+            Post.objects.filter(pk__gt=start).values_list("pk", flat=True)
+        )
+        self.stdout.write(f"Постов: {count}")
+        return ids
+
+    def create_comments(self, count, users, posts):
+        if not posts:
+            return
+        # Обсуждают в основном немногие «горячие» посты.
+        hot = posts[:]
+        self.random.shuffle(hot)
+        targets = self.random.choices(
+            hot, cum_weights=zipf_weights(len(hot), 1.0), k=count
+        )
+        Comment.objects.bulk_create(
+            (
+                Comment(
+                    post_id=post_id,
+                    author_id=self.random.choice(users),
+                    text=self.fake.sentence(),
+                    created=self.random_date(),
+                )
+                for post_id in targets
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        self.stdout.write(f"Комментариев: {count}")
+
+    def create_follows(self, count, users, authors, weights):
+        pairs = set()
+        attempts = 0
+        while len(pairs) < count and attempts < count * 10:
+            attempts += 1
+            user_id = self.random.choice(users)
+            author_id = self.random.choices(authors, cum_weights=weights)[0]
+            if user_id != author_id:
+                pairs.add((user_id, author_id))
+        Follow.objects.bulk_create(
+            (Follow(user_id=user, author_id=author) for user, author in pairs),
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+        self.stdout.write(f"Подписок: {len(pairs)}")
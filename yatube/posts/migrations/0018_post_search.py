@@ -0,0 +1,29 @@
+from django.db import migrations
+
+from posts import search
+
+
+def create_search_index(apps, schema_editor):
+    if search.is_supported(schema_editor.connection):
+        search.rebuild(schema_editor.connection.cursor())
+
+
+def drop_search_index(apps, schema_editor):
+    if search.is_supported(schema_editor.connection):
+        cursor = schema_editor.connection.cursor()
+        for suffix in ('ai', 'ad', 'au'):
+            cursor.execute(
+                f'DROP TRIGGER IF EXISTS {search.FTS_TABLE}_{suffix}'
+            )
+        cursor.execute(f'DROP TABLE IF EXISTS {search.FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
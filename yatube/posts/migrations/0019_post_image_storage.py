@@ -0,0 +1,28 @@
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Хранилище не влияет на схему, а AlterField в SQLite пересоздал бы
+    # таблицу и потерял триггеры полнотекстового индекса (0018).
+
+    dependencies = [
+        ('posts', '0018_post_search'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='post',
+                    name='image',
+                    field=models.ImageField(
+                        blank=True,
+                        storage=core.storage.ContentHashedStorage(),
+                        upload_to='posts/',
+                        verbose_name='Картинка',
+                    ),
+                ),
+            ],
+        ),
+    ]
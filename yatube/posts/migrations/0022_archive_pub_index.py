@@ -0,0 +1,17 @@
+# Generated by Django 2.2.16 on 2026-10-18 22:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_popularpost'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='archivedpost',
+            index=models.Index(fields=['-pub_date', '-id'], name='posts_archive_pub_idx'),
+        ),
+    ]
@@ -1,3 +1,5 @@
+from core.storage import ContentHashedStorage
+
 from django.contrib.auth import get_user_model
 from django.core.validators import MaxLengthValidator
 from django.db import models
@@ -34,6 +36,7 @@ class Post(models.Model):
         on_delete=models.CASCADE,
         related_name="posts",
         verbose_name="Автор",
+        db_index=False,
     )
     group = models.ForeignKey(
         Group,
@@ -43,11 +46,30 @@ class Post(models.Model):
         related_name="posts",
         help_text="Выберите группу поста",
         verbose_name="Группа",
+        db_index=False,
+    )
+    image = models.ImageField(
+        "Картинка",
+        upload_to="posts/",
+        storage=ContentHashedStorage(),
+        blank=True,
     )
-    image = models.ImageField("Картинка", upload_to="posts/", blank=True)
 
     class Meta:
         ordering = ("-pub_date",)
+        indexes = [
+            models.Index(
+                fields=["-pub_date", "-id"], name="posts_post_feed_idx"
+            ),
+            models.Index(
+                fields=["author", "-pub_date", "-id"],
+                name="posts_post_author_feed_idx",
+            ),
+            models.Index(
+                fields=["group", "-pub_date", "-id"],
+                name="posts_post_group_feed_idx",
+            ),
+        ]
         verbose_name = "Пост"
         verbose_name_plural = "Посты"
 
@@ -62,6 +84,7 @@ class Comment(models.Model):
         null=True,
         on_delete=models.CASCADE,
         related_name="comments",
+        db_index=False,
     )
     author = models.ForeignKey(
         User,
@@ -79,6 +102,14 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ("-created",)
+        indexes = [
+            models.Index(
+                fields=["post", "-created", "-id"],
+                name="posts_comment_post_idx",
+            ),
+            # Окно свежих комментариев для пересчёта рейтинга (trending).
+            models.Index(fields=["created"], name="posts_comment_created_idx"),
+        ]
         verbose_name = "Пост"
         verbose_name_plural = "Комментарии"
 
@@ -98,8 +129,184 @@ class Follow(models.Model):
         on_delete=models.CASCADE,
         help_text="Автор",
         related_name="following",
+        db_index=False,
     )
 
     class Meta:
         unique_together = ("user", "author")
+        indexes = [
+            models.Index(
+                fields=["author", "user"], name="posts_follow_author_idx"
+            ),
+        ]
         verbose_name_plural = "Подписки"
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="timeline",
+        help_text="Подписчик",
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name="timeline_entries",
+    )
+    pub_date = models.DateTimeField("Дата публикации")
+
+    class Meta:
+        unique_together = ("user", "post")
+        indexes = [
+            models.Index(
+                fields=["user", "-pub_date", "-post"],
+                name="posts_timeline_feed_idx",
+            ),
+        ]
+        verbose_name = "Запись ленты"
+        verbose_name_plural = "Лента подписок"
+
+
+class AuthorStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="stats",
+    )
+    posts_count = models.IntegerField("Постов", default=0)
+    followers_count = models.IntegerField("Подписчиков", default=0)
+    following_count = models.IntegerField("Подписок", default=0)
+
+    class Meta:
+        verbose_name = "Счётчики автора"
+        verbose_name_plural = "Счётчики авторов"
+
+
+class PostStats(models.Model):
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="stats",
+    )
+    comments_count = models.IntegerField("Комментариев", default=0)
+
+    class Meta:
+        verbose_name = "Счётчики поста"
+        verbose_name_plural = "Счётчики постов"
+
+
+class PopularPost(models.Model):
+    """Строка рейтинга обсуждаемых постов (posts.trending).
+
+    rank — логарифм затухающей суммы комментариев, приведённый к общей
+    шкале времени: он не меняется, пока нет новых комментариев, и
+    сравним между постами без пересчёта всей таблицы.
+    """
+
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="popularity",
+    )
+    rank = models.FloatField("Рейтинг")
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["-rank", "-post"], name="posts_popular_rank_idx"
+            ),
+        ]
+        verbose_name = "Популярный пост"
+        verbose_name_plural = "Популярные посты"
+
+
+class ArchivedPost(models.Model):
+    """Холодная копия поста старше ARCHIVE_AFTER_DAYS (posts.archive).
+
+    Первичный ключ сохраняется, поэтому адрес /posts/<id>/ не меняется.
+    Число комментариев застывает при переносе — в архив не пишут.
+    """
+
+    id = models.IntegerField(primary_key=True)
+    text = models.TextField("Текст поста")
+    pub_date = models.DateTimeField("Дата публикации")
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="archived_posts",
+        verbose_name="Автор",
+        db_index=False,
+    )
+    group = models.ForeignKey(
+        Group,
+        blank=True,
+        null=True,
+        on_delete=models.SET_NULL,
+        related_name="archived_posts",
+        verbose_name="Группа",
+        db_index=False,
+    )
+    image = models.ImageField(
+        "Картинка",
+        upload_to="posts/",
+        storage=ContentHashedStorage(),
+        blank=True,
+    )
+    comments_count = models.IntegerField("Комментариев", default=0)
+
+    class Meta:
+        ordering = ("-pub_date",)
+        indexes = [
+            # Главная и API дочитывают архив за хвостом горячего набора.
+            models.Index(
+                fields=["-pub_date", "-id"], name="posts_archive_pub_idx"
+            ),
+            models.Index(
+                fields=["author", "-pub_date", "-id"],
+                name="posts_archive_author_idx",
+            ),
+            models.Index(
+                fields=["group", "-pub_date", "-id"],
+                name="posts_archive_group_idx",
+            ),
+        ]
+        verbose_name = "Пост в архиве"
+        verbose_name_plural = "Архив постов"
+
+    def __str__(self):
+        return self.text[:TEXT_LENGTH]
+
+
+class ArchivedComment(models.Model):
+    id = models.IntegerField(primary_key=True)
+    post = models.ForeignKey(
+        ArchivedPost,
+        on_delete=models.CASCADE,
+        related_name="comments",
+        db_index=False,
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="archived_comments",
+    )
+    text = models.TextField("Текст")
+    created = models.DateTimeField("Дата комментария")
+
+    class Meta:
+        ordering = ("-created",)
+        indexes = [
+            models.Index(
+                fields=["post", "-created", "-id"],
+                name="posts_archive_comment_idx",
+            ),
+        ]
+        verbose_name = "Комментарий в архиве"
+        verbose_name_plural = "Архив комментариев"
+
+    def __str__(self):
+        return self.text[:TEXT_LENGTH]
@@ -0,0 +1,194 @@
+import base64
+import binascii
+import datetime
+import json
+from collections.abc import Sequence
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+def _encode_value(value):
+    # DjangoJSONEncoder обрезает микросекунды, а ключу нужна точность.
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} нельзя положить в курсор")
+
+
+def encode_cursor(position, reverse=False):
+    """Упаковывает позицию ключа в непрозрачный токен для ?cursor=."""
+    payload = json.dumps([int(reverse), *position], default=_encode_value)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Возвращает (позиция, reverse) или (None, False) для мусора."""
+    if not cursor:
+        return None, False
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        reverse, *position = json.loads(base64.urlsafe_b64decode(padded))
+    except (binascii.Error, ValueError, TypeError):
+        return None, False
+    return position, bool(reverse)
+
+
+class CursorPage(Sequence):
+    def __init__(self, object_list, paginator, next_position, prev_position):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_position = next_position
+        self.prev_position = prev_position
+
+    def __repr__(self):
+        return f"<CursorPage of {len(self.object_list)} objects>"
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_position is not None
+
+    def has_previous(self):
+        return self.prev_position is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def next_cursor(self):
+        if self.next_position is None:
+            return None
+        return encode_cursor(self.next_position)
+
+    @property
+    def previous_cursor(self):
+        if self.prev_position is None:
+            return None
+        return encode_cursor(self.prev_position, reverse=True)
+
+
+class CursorPaginator:
+    """Keyset-пагинация по убыванию ключа (по умолчанию pub_date, pk).
+
+    В отличие от Paginator не делает COUNT(*) и OFFSET: каждая страница —
+    это диапазонное чтение по индексу от позиции, зашитой в курсор.
+    """
+
+    def __init__(self, object_list, per_page, keys=("pub_date", "pk")):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.keys = tuple(keys)
+
+    def key_of(self, obj):
+        return tuple(getattr(obj, key) for key in self.keys)
+
+    def filter_queryset(self, queryset, position, reverse, keys=None):
+        """Отсекает строки до позиции и упорядочивает по ключу."""
+        keys = keys or self.keys
+        lookup = "gt" if reverse else "lt"
+        if position is not None:
+            condition = Q()
+            for i, key in enumerate(keys):
+                step = Q(**{f"{key}__{lookup}": position[i]})
+                for prev_key, value in zip(keys[:i], position):
+                    step &= Q(**{prev_key: value})
+                condition |= step
+            queryset = queryset.filter(condition)
+        prefix = "" if reverse else "-"
+        return queryset.order_by(*(f"{prefix}{key}" for key in keys))
+
+    def fetch(self, position, reverse, limit):
+        queryset = self.filter_queryset(self.object_list, position, reverse)
+        return list(queryset[:limit])
+
+    def get_page(self, cursor=None):
+        position, reverse = decode_cursor(cursor)
+        if position is not None and len(position) != len(self.keys):
+            position, reverse = None, False
+        try:
+            items = self.fetch(position, reverse, self.per_page + 1)
+        except (ValidationError, ValueError, TypeError):
+            # Подделанный курсор: отдаём первую страницу, как get_page().
+            position, reverse = None, False
+            items = self.fetch(position, reverse, self.per_page + 1)
+        has_more = len(items) > self.per_page
+        items = items[: self.per_page]
+        if reverse:
+            items.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, position is not None
+        next_position = prev_position = None
+        if items and has_next:
+            next_position = self.key_of(items[-1])
+        if items and has_previous:
+            prev_position = self.key_of(items[0])
+        return CursorPage(items, self, next_position, prev_position)
+
+
+class ArchiveCursorPaginator(CursorPaginator):
+    """Курсорная пагинация горячей выборки с продолжением в архиве.
+
+    Архив старше всего горячего набора, поэтому вперёд страница добирается
+    из архива, только когда горячие строки после позиции кончились, — то
+    есть лишь на страницах за хвостом горячего набора.
+    """
+
+    def __init__(
+        self, object_list, archive, per_page, keys=("pub_date", "pk")
+    ):
+        super().__init__(object_list, per_page, keys)
+        self.archive = archive
+
+    def fetch(self, position, reverse, limit):
+        # По возрастанию ключа архивные строки идут раньше горячих.
+        sources = [self.archive, self.object_list]
+        if not reverse:
+            sources.reverse()
+        items = []
+        for queryset in sources:
+            queryset = self.filter_queryset(queryset, position, reverse)
+            items.extend(queryset[: limit - len(items)])
+            if len(items) >= limit:
+                break
+        return items
+
+
+class ArchiveSequence:
+    """Горячая выборка, а за ней архив — для Paginator по ?page=N.
+
+    Архив старше всего горячего набора, поэтому страница по смещению
+    берётся из горячих строк, из архива или стыкуется из обоих.
+    """
+
+    def __init__(self, object_list, archive):
+        self.object_list = object_list
+        self.archive = archive
+        self._hot_count = None
+
+    def hot_count(self):
+        if self._hot_count is None:
+            self._hot_count = self.object_list.count()
+        return self._hot_count
+
+    def count(self):
+        return self.hot_count() + self.archive.count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[slice(index, index + 1)][0]
+        start, stop = index.start or 0, index.stop
+        hot = self.hot_count()
+        items = []
+        if start < hot:
+            items.extend(self.object_list[slice(start, min(stop, hot))])
+        if stop > hot:
+            items.extend(self.archive[slice(max(start - hot, 0), stop - hot)])
+        return items
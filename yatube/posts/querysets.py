@@ -0,0 +1,36 @@
+from posts.models import ArchivedComment, ArchivedPost, Comment, Post
+
+
+def feed():
+    """Посты с автором и группой — одна выборка на страницу ленты."""
+    return Post.objects.select_related("author", "group")
+
+
+def group_feed(group):
+    return feed().filter(group=group)
+
+
+def author_feed(author):
+    return feed().filter(author=author)
+
+
+def comments_of(post_id):
+    return Comment.objects.filter(post_id=post_id).select_related("author")
+
+
+def archive_feed():
+    return ArchivedPost.objects.select_related("author", "group")
+
+
+def archived_group_feed(group):
+    return archive_feed().filter(group=group)
+
+
+def archived_author_feed(author):
+    return archive_feed().filter(author=author)
+
+
+def archived_comments_of(post_id):
+    return ArchivedComment.objects.filter(post_id=post_id).select_related(
+        "author"
+    )
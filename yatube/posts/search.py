@@ -0,0 +1,110 @@
+import re
+
+from posts.models import Post
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = "posts_post_fts"
+
+SCHEMA = (
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        text,
+        content='posts_post',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai
+    AFTER INSERT ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad
+    AFTER DELETE ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+    AFTER UPDATE OF text ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END""",
+)
+
+
+def is_supported(using=connection):
+    return using.vendor == "sqlite"
+
+
+def install(cursor):
+    """Создаёт FTS5-индекс и триггеры синхронизации с posts_post.
+
+    Перестройка таблицы posts_post миграцией сносит триггеры, поэтому
+    команда rebuild_search_index ставит их заново.
+    """
+    for statement in SCHEMA:
+        cursor.execute(statement)
+
+
+def rebuild(cursor):
+    install(cursor)
+    cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def match_expression(query):
+    """Превращает ввод пользователя в безопасный запрос FTS5.
+
+    Каждое слово берётся в кавычки как префикс, слова объединяются по И,
+    так что операторы и кавычки из ввода не ломают синтаксис MATCH.
+    """
+    words = re.findall(r"\w+", query or "")
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def matching_ids(query):
+    """Подзапрос с id подходящих постов — для фильтра без ранжирования."""
+    return RawSQL(
+        f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+        (match_expression(query),),
+    )
+
+
+class SearchResults:
+    """Посты по запросу в порядке релевантности (bm25).
+
+    Ведёт себя как последовательность для Paginator: count() и срезы
+    выполняются прямо в индексе FTS, а посты догружаются по id.
+    """
+
+    def __init__(self, query):
+        self.expression = match_expression(query)
+
+    def count(self):
+        if not self.expression:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT count(*) FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH %s",
+                (self.expression,),
+            )
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[slice(index, index + 1)][0]
+        if not self.expression:
+            return []
+        start = index.start or 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH %s ORDER BY rank LIMIT %s OFFSET %s",
+                (self.expression, index.stop - start, start),
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        posts = Post.objects.select_related("author", "group").in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
@@ -0,0 +1,195 @@
+from posts import caching, follow_graph, tasks, timeline, trending
+from posts.counters import bump
+from posts.models import (
+    ArchivedPost,
+    AuthorStats,
+    Comment,
+    Follow,
+    Group,
+    Post,
+    PostStats,
+    User,
+)
+
+from django.db.models.signals import (
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+
+def remember_old(instance, field):
+    """Запоминает прежнее значение поля, чтобы сбросить и старые страницы."""
+    if instance.pk is None:
+        return
+    old = (
+        type(instance)
+        .objects.filter(pk=instance.pk)
+        .values_list(field, flat=True)
+        .first()
+    )
+    instance._old_values = getattr(instance, "_old_values", {})
+    instance._old_values[field] = old
+
+
+def old_value(instance, field):
+    return getattr(instance, "_old_values", {}).get(field)
+
+
+def invalidate_post_pages(post):
+    group_ids = {post.group_id, old_value(post, "group_id")} - {None}
+    slugs = Group.objects.filter(pk__in=group_ids).values_list(
+        "slug", flat=True
+    )
+    caching.bump(
+        "index",
+        f"post:{post.pk}",
+        f"profile:{post.author.username}",
+        *(f"group:{slug}" for slug in slugs),
+    )
+    caching.purge(
+        caching.page_path("posts:index"),
+        caching.page_path("posts:popular"),
+        caching.page_path("posts:post_detail", post.pk),
+        caching.page_path("posts:profile", post.author.username),
+        *(caching.page_path("posts:group_list", slug) for slug in slugs),
+    )
+
+
+def group_post_paths(group_id):
+    """Адреса, где стоит ссылка со слагом группы: ленты и её посты."""
+    paths = {
+        caching.page_path("posts:index"),
+        caching.page_path("posts:popular"),
+    }
+    for model in (Post, ArchivedPost):
+        posts = model.objects.filter(group_id=group_id).values_list(
+            "pk", "author__username"
+        )
+        for pk, username in posts.iterator():
+            paths.add(caching.page_path("posts:post_detail", pk))
+            paths.add(caching.page_path("posts:profile", username))
+    return paths
+
+
+@receiver(pre_save, sender=User)
+def user_changing(sender, instance, **kwargs):
+    remember_old(instance, "username")
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        AuthorStats.objects.get_or_create(user=instance)
+        return
+    if update_fields and set(update_fields) == {"last_login"}:
+        return
+    usernames = {instance.username, old_value(instance, "username")}
+    caching.bump(
+        "authors", *(f"profile:{name}" for name in usernames - {None})
+    )
+
+
+@receiver(pre_save, sender=Group)
+def group_changing(sender, instance, **kwargs):
+    remember_old(instance, "slug")
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleting(sender, instance, **kwargs):
+    # После удаления у постов уже group=NULL — адреса собираем заранее.
+    instance._post_paths = group_post_paths(instance.pk)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    old_slug = old_value(instance, "slug")
+    slugs = {instance.slug, old_slug} - {None}
+    caching.bump("index", "groups", *(f"group:{slug}" for slug in slugs))
+    paths = getattr(instance, "_post_paths", set())
+    if old_slug and old_slug != instance.slug:
+        paths = group_post_paths(instance.pk)
+    caching.purge(
+        *paths,
+        *(caching.page_path("posts:group_list", slug) for slug in slugs),
+    )
+
+
+@receiver(pre_save, sender=Post)
+def post_changing(sender, instance, **kwargs):
+    remember_old(instance, "group_id")
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        PostStats.objects.get_or_create(post=instance)
+        bump(AuthorStats, instance.author_id, posts_count=1)
+        timeline.fan_out(instance)
+    invalidate_post_pages(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    bump(AuthorStats, instance.author_id, posts_count=-1)
+    invalidate_post_pages(instance)
+
+
+def purge_comment_pages(post_id):
+    caching.purge(
+        caching.page_path("posts:post_detail", post_id),
+        caching.page_path("posts:post_comments", post_id),
+    )
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created and instance.post_id:
+        bump(PostStats, instance.post_id, comments_count=1)
+        trending.record(instance.post_id, instance.created)
+    if instance.post_id:
+        caching.bump(f"post:{instance.post_id}")
+        purge_comment_pages(instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    if instance.post_id:
+        bump(PostStats, instance.post_id, comments_count=-1)
+        caching.bump(f"post:{instance.post_id}")
+        purge_comment_pages(instance.post_id)
+
+
+def invalidate_follow_pages(follow):
+    """Профили обоих: у автора меняются подписчики, у читателя подписки."""
+    usernames = (follow.author.username, follow.user.username)
+    caching.bump(
+        *(f"profile:{username}" for username in usernames),
+        f"timeline:{follow.user_id}",
+    )
+    caching.purge(
+        *(caching.page_path("posts:profile", name) for name in usernames)
+    )
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        bump(AuthorStats, instance.author_id, followers_count=1)
+        bump(AuthorStats, instance.user_id, following_count=1)
+        timeline.backfill(instance.user_id, instance.author_id)
+        follow_graph.add(instance.user_id, instance.author_id)
+        invalidate_follow_pages(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    if timeline.remove_follower(instance.author_id):
+        tasks.fan_out_author.enqueue(instance.author_id)
+    bump(AuthorStats, instance.user_id, following_count=-1)
+    timeline.prune(instance.user_id, instance.author_id)
+    follow_graph.remove(instance.user_id, instance.author_id)
+    invalidate_follow_pages(instance)
@@ -0,0 +1,10 @@
+from core.jobs import task
+from posts import caching, timeline
+
+
+@task
+def fan_out_author(author_id):
+    """Дописывает посты бывшей «звезды» в ленты её подписчиков."""
+    followers = timeline.fan_out_author(author_id)
+    if followers:
+        caching.bump(*(f"timeline:{user_id}" for user_id in followers))
@@ -0,0 +1,96 @@
+from collections import namedtuple
+
+from posts import images, thumbnails
+
+from django import template
+
+register = template.Library()
+
+# Исходная картинка вместо миниатюры, которую создать не удалось.
+Original = namedtuple("Original", "url width height")
+
+
+def _lookups(context, image, base_geometry, options):
+    """Все миниатюры картинки для base_geometry — одним запросом к kvstore.
+
+    Шаблон картинки спрашивает основной размер и два srcset (JPEG и WebP);
+    найденное хранится в render_context до конца рендера этого шаблона.
+    """
+    options = {key: value for key, value in options.items() if key != "format"}
+    memo_key = (
+        "ready_thumbnails",
+        image.name,
+        base_geometry,
+        tuple(sorted(options.items())),
+    )
+    found = context.render_context.get(memo_key)
+    if found is None:
+        formats = [None, "WEBP"] if images.webp_supported() else [None]
+        geometries = [base_geometry] + [
+            thumbnails.scaled(base_geometry, width)
+            for width in thumbnails.SRCSET_WIDTHS
+        ]
+        sizes = [
+            (geometry, fmt)
+            for fmt in formats
+            for geometry in dict.fromkeys(geometries)
+        ]
+        ready = thumbnails.backend.lookup_many(
+            image,
+            [
+                (geometry, dict(options, format=fmt) if fmt else options)
+                for geometry, fmt in sizes
+            ],
+        )
+        found = context.render_context[memo_key] = dict(zip(sizes, ready))
+    return found
+
+
+def _ready(context, image, base_geometry, geometry, options):
+    if not image:
+        return None
+    if options.get("format") == "WEBP" and not images.webp_supported():
+        return None
+    lookups = _lookups(context, image, base_geometry, options)
+    thumbnail = lookups[geometry, options.get("format")]
+    if thumbnail is None and not thumbnails.failed(image.name):
+        thumbnails.enqueue(image)
+        request = context.get("request")
+        if request is not None:
+            # Страницу с заглушкой не кладём в кэш страниц.
+            request.thumbnails_pending = True
+    return thumbnail
+
+
+@register.simple_tag(takes_context=True)
+def ready_thumbnail(context, image, geometry, **options):
+    """Миниатюра, если она уже готова; иначе ставит её в очередь.
+
+    Если миниатюры этого файла создать не удалось, возвращает исходную
+    картинку без размеров: ждать больше нечего, и страница кэшируется.
+    """
+    thumbnail = _ready(context, image, geometry, geometry, options)
+    if thumbnail is None and image and thumbnails.failed(image.name):
+        return Original(image.url, None, None)
+    return thumbnail
+
+
+@register.simple_tag(takes_context=True)
+def thumbnail_srcset(context, image, geometry, **options):
+    """srcset из готовых миниатюр всех ширин SRCSET_WIDTHS.
+
+    Ширины берутся в пропорции geometry; недостающие ставятся в очередь
+    так же, как в ready_thumbnail, и в srcset пока не попадают.
+    """
+    candidates = []
+    for width in thumbnails.SRCSET_WIDTHS:
+        thumbnail = _ready(
+            context,
+            image,
+            geometry,
+            thumbnails.scaled(geometry, width),
+            options,
+        )
+        if thumbnail is not None:
+            candidates.append(f"{thumbnail.url} {width}w")
+    return ", ".join(candidates)
@@ -0,0 +1,143 @@
+import json
+
+from posts.models import Comment, Group, Post
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+User = get_user_model()
+AMOUNT_OF_POSTS = 13
+POSTS_ON_PAGE = 10
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(
+            username="Автор поста", first_name="Лев", last_name="Толстой"
+        )
+        cls.group = Group.objects.create(
+            title="Тестовый заголовок",
+            description="Тестовое описание",
+            slug="test_slug",
+        )
+        cls.posts = [
+            Post.objects.create(
+                text=f"Тестовый текст {i}", author=cls.author, group=cls.group
+            )
+            for i in range(AMOUNT_OF_POSTS)
+        ]
+        Comment.objects.create(
+            post=cls.posts[-1], author=cls.author, text="Комментарий"
+        )
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def get_json(self, url, params=None, status=200):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status)
+        if response.streaming:
+            content = b"".join(response.streaming_content)
+        else:
+            content = response.content
+        return json.loads(content)
+
+    def test_feed_is_cursor_paginated(self):
+        """Лента API обходится курсором без пропусков и повторов."""
+        url = reverse("posts:api_posts")
+        first = self.get_json(url)
+        self.assertEqual(len(first["results"]), POSTS_ON_PAGE)
+        self.assertIsNone(first["previous"])
+        second = self.get_json(url, {"cursor": first["next"]})
+        self.assertIsNone(second["next"])
+        ids = [post["id"] for post in first["results"] + second["results"]]
+        self.assertEqual(ids, [post.pk for post in reversed(self.posts)])
+        self.assertEqual(
+            first["results"][0],
+            {
+                "id": self.posts[-1].pk,
+                "text": self.posts[-1].text,
+                "pub_date": self.posts[-1].pub_date.isoformat(),
+                "author": self.author.username,
+                "group": self.group.slug,
+                "image": None,
+            },
+        )
+        self.get_json(url, {"fields": "comments_count"}, status=400)
+        detail = self.get_json(
+            reverse("posts:api_post", args=[self.posts[-1].pk])
+        )
+        self.assertEqual(detail["comments_count"], 1)
+
+    def test_sparse_fields(self):
+        url = reverse("posts:api_posts")
+        page = self.get_json(url, {"fields": "id,author", "limit": 2})
+        self.assertEqual(
+            page["results"][0],
+            {"id": self.posts[-1].pk, "author": self.author.username},
+        )
+        error = self.get_json(url, {"fields": "id,password"}, status=400)
+        self.assertIn("password", error["error"])
+
+    def test_batch_fetches_many_posts_in_one_request(self):
+        """Пакет постов по id — фиксированное число запросов."""
+        ids = [post.pk for post in self.posts[:5]]
+        url = reverse("posts:api_posts_batch")
+        with CaptureQueriesContext(connection) as queries:
+            page = self.get_json(
+                url, {"ids": ",".join(map(str, ids)), "fields": "id"}
+            )
+        self.assertEqual([post["id"] for post in page["results"]], ids)
+        self.assertEqual(len(queries), 1)
+        # Ненайденные id ищутся в архиве — ещё одним запросом на всех.
+        with CaptureQueriesContext(connection) as queries:
+            page = self.get_json(
+                url, {"ids": ",".join(map(str, ids + [0, -1])), "fields": "id"}
+            )
+        self.assertEqual([post["id"] for post in page["results"]], ids)
+        self.assertEqual(len(queries), 2)
+        self.get_json(url, {"ids": "1,x"}, status=400)
+
+    def test_feed_queries_do_not_grow_with_page(self):
+        url = reverse("posts:api_posts")
+        with CaptureQueriesContext(connection) as small:
+            self.get_json(url, {"limit": 1})
+        cache.clear()
+        with CaptureQueriesContext(connection) as large:
+            self.get_json(url, {"limit": POSTS_ON_PAGE})
+        self.assertEqual(len(small), len(large))
+
+    def test_group_profile_and_comments(self):
+        group = self.get_json(
+            reverse("posts:api_group", args=[self.group.slug])
+        )
+        self.assertEqual(group["title"], self.group.title)
+        group_posts = self.get_json(
+            reverse("posts:api_group_posts", args=[self.group.slug])
+        )
+        self.assertEqual(len(group_posts["results"]), POSTS_ON_PAGE)
+        profile = self.get_json(
+            reverse("posts:api_profile", args=[self.author.username])
+        )
+        self.assertEqual(profile["full_name"], "Лев Толстой")
+        self.assertEqual(profile["posts_count"], AMOUNT_OF_POSTS)
+        comments = self.get_json(
+            reverse("posts:api_comments", args=[self.posts[-1].pk])
+        )
+        self.assertEqual(
+            [comment["text"] for comment in comments["results"]],
+            ["Комментарий"],
+        )
+
+    def test_errors_are_json(self):
+        error = self.get_json(reverse("posts:api_post", args=[0]), status=404)
+        self.assertEqual(error, {"error": "not found"})
+        response = self.client.post(reverse("posts:api_posts"))
+        self.assertEqual(response.status_code, 405)
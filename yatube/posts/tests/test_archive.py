@@ -0,0 +1,205 @@
+import datetime
+import json
+from io import StringIO
+
+from posts import search
+from posts.counters import reconcile
+from posts.models import (
+    ArchivedComment,
+    ArchivedPost,
+    Comment,
+    Follow,
+    Group,
+    Post,
+    TimelineEntry,
+    User,
+)
+from posts.views import POST_IN_PAGE
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+OLD_POSTS = 12
+NEW_POSTS = 3
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username="veteran")
+        self.reader = User.objects.create_user(username="reader")
+        self.group = Group.objects.create(
+            title="Группа", slug="archive-group", description="Описание"
+        )
+        now = timezone.now()
+        for day in range(OLD_POSTS + NEW_POSTS):
+            post = Post.objects.create(
+                author=self.author,
+                group=self.group,
+                text=f"Запись номер {day}",
+            )
+            age = 400 + day if day < OLD_POSTS else day
+            Post.objects.filter(pk=post.pk).update(
+                pub_date=now - datetime.timedelta(days=age)
+            )
+        self.old_post = Post.objects.order_by("pub_date").first()
+        Comment.objects.create(
+            post=self.old_post, author=self.reader, text="Старый отзыв"
+        )
+        TimelineEntry.objects.create(
+            user=self.reader,
+            post=self.old_post,
+            pub_date=self.old_post.pub_date,
+        )
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def archive(self):
+        call_command(
+            "archive_posts", days=365, batch_size=5, pause=0, stdout=StringIO()
+        )
+
+    def get_json(self, url, params=None):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        if response.streaming:
+            return json.loads(b"".join(response.streaming_content))
+        return json.loads(response.content)
+
+    def test_old_posts_move_with_comments(self):
+        """Старые посты и комментарии уходят в архив, счётчики не меняются."""
+        self.archive()
+        self.assertEqual(Post.objects.count(), NEW_POSTS)
+        self.assertEqual(ArchivedPost.objects.count(), OLD_POSTS)
+        archived = ArchivedPost.objects.get(pk=self.old_post.pk)
+        self.assertEqual(archived.comments_count, 1)
+        self.assertEqual(
+            ArchivedComment.objects.get().post_id, self.old_post.pk
+        )
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.author.stats.refresh_from_db()
+        self.assertEqual(self.author.stats.posts_count, OLD_POSTS + NEW_POSTS)
+        self.assertFalse(any(reconcile().values()))
+        if search.is_supported():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT rowid FROM {search.FTS_TABLE} "
+                    f"WHERE {search.FTS_TABLE} MATCH %s",
+                    [search.match_expression("Запись")],
+                )
+                indexed = {row[0] for row in cursor.fetchall()}
+            self.assertEqual(
+                indexed, set(Post.objects.values_list("pk", flat=True))
+            )
+
+    def test_profile_falls_through_to_archive(self):
+        """Лента профиля дочитывает архив за хвостом горячего набора."""
+        self.archive()
+        url = reverse("posts:profile", args=[self.author.username])
+        first = self.client.get(url).context["page_obj"]
+        self.assertEqual(len(first), POST_IN_PAGE)
+        self.assertIsInstance(first[0], Post)
+        self.assertIsInstance(first[-1], ArchivedPost)
+        second = self.client.get(f"{url}?cursor={first.next_cursor}")
+        second = second.context["page_obj"]
+        self.assertEqual(len(first) + len(second), OLD_POSTS + NEW_POSTS)
+        self.assertFalse(second.has_next())
+        back = self.client.get(f"{url}?cursor={second.previous_cursor}")
+        self.assertEqual(
+            [post.pk for post in back.context["page_obj"]],
+            [post.pk for post in first],
+        )
+
+    def test_group_hot_pages_skip_archive(self):
+        """Пока горячих постов хватает на страницу, архив не читается."""
+        for number in range(POST_IN_PAGE):
+            Post.objects.create(
+                author=self.author, group=self.group, text=f"Свежий {number}"
+            )
+        self.archive()
+        url = reverse("posts:group_list", args=[self.group.slug])
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url)
+        self.assertFalse(
+            any(
+                ArchivedPost._meta.db_table in query["sql"]
+                for query in context.captured_queries
+            )
+        )
+
+    def test_follow_feed_continues_into_archive(self):
+        """Лента подписок после горячих постов дочитывает архив автора."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.archive()
+        url = reverse("posts:follow_index")
+        first = self.client.get(url).context["page_obj"]
+        self.assertIsInstance(first[-1], ArchivedPost)
+        second = self.client.get(f"{url}?cursor={first.next_cursor}")
+        second = second.context["page_obj"]
+        self.assertEqual(len(first) + len(second), OLD_POSTS + NEW_POSTS)
+        self.assertFalse(second.has_next())
+        back = self.client.get(f"{url}?cursor={second.previous_cursor}")
+        self.assertEqual(
+            [post.pk for post in back.context["page_obj"]],
+            [post.pk for post in first],
+        )
+
+    def test_legacy_page_links_reach_archive(self):
+        """Старые ?page=N листают горячие посты и следом архив."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.archive()
+        for name, args in (
+            ("posts:index", []),
+            ("posts:profile", [self.author.username]),
+            ("posts:group_list", [self.group.slug]),
+            ("posts:follow_index", []),
+        ):
+            with self.subTest(name=name):
+                url = reverse(name, args=args)
+                page = self.client.get(f"{url}?page=2").context["page_obj"]
+                self.assertEqual(page.paginator.count, OLD_POSTS + NEW_POSTS)
+                self.assertEqual(
+                    len(page), OLD_POSTS + NEW_POSTS - POST_IN_PAGE
+                )
+                self.assertEqual(page[-1].pk, self.old_post.pk)
+
+    def test_api_reads_archive(self):
+        """API отдаёт архивный пост, его комментарии и ленты с архивом."""
+        self.archive()
+        post = self.get_json(
+            reverse("posts:api_post", args=[self.old_post.pk])
+        )
+        self.assertEqual(post["comments_count"], 1)
+        comments = self.get_json(
+            reverse("posts:api_comments", args=[self.old_post.pk])
+        )
+        self.assertEqual(comments["results"][0]["text"], "Старый отзыв")
+        url = reverse("posts:api_profile_posts", args=[self.author.username])
+        first = self.get_json(url, {"limit": 10})
+        second = self.get_json(url, {"cursor": first["next"]})
+        self.assertEqual(
+            len(first["results"]) + len(second["results"]),
+            OLD_POSTS + NEW_POSTS,
+        )
+
+    def test_archived_post_detail_is_read_only(self):
+        self.archive()
+        response = self.client.get(
+            reverse("posts:post_detail", args=[self.old_post.pk])
+        )
+        self.assertTrue(response.context["archived"])
+        self.assertEqual(response.context["comments_count"], 1)
+        self.assertEqual(len(response.context["comments"]), 1)
+        self.assertNotContains(
+            response, reverse("posts:add_comment", args=[self.old_post.pk])
+        )
+        response = self.client.get(
+            reverse("posts:post_comments", args=[self.old_post.pk])
+        )
+        self.assertContains(response, "Старый отзыв")
@@ -0,0 +1,81 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from posts.counters import reconcile
+from posts.models import Comment, Follow, Group, Post, TimelineEntry, User
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+
+TEMP_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+class SeedAndBenchTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def seed(self, seed):
+        call_command(
+            "seed_dataset",
+            users=15,
+            groups=3,
+            posts=60,
+            comments=80,
+            follows=30,
+            seed=seed,
+            stdout=StringIO(),
+        )
+
+    def test_seed_dataset_is_reproducible(self):
+        self.seed(7)
+        first = list(
+            Post.objects.order_by("pk").values_list("text", flat=True)
+        )
+        Post.objects.all().delete()
+        self.seed(7)
+        second = list(
+            Post.objects.order_by("pk").values_list("text", flat=True)
+        )
+        self.assertEqual(first[-60:], second[-60:])
+
+    def test_seed_dataset_keeps_derived_data_consistent(self):
+        self.seed(1)
+        self.assertEqual(User.objects.count(), 15)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 60)
+        self.assertEqual(Comment.objects.count(), 80)
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(TimelineEntry.objects.exists())
+        self.assertFalse(any(reconcile().values()))
+
+    def test_bench_views_reports_every_posts_url(self):
+        self.seed(1)
+        output = os.path.join(TEMP_DIR, "bench.json")
+        # На тёплом кэше страницы лент обходятся вовсе без запросов.
+        call_command(
+            "bench_views",
+            repeat=2,
+            cold=True,
+            output=output,
+            stdout=StringIO(),
+        )
+        with open(output, encoding="utf-8") as file:
+            results = json.load(file)["results"]
+        self.assertIn("index", results)
+        self.assertIn("add_comment", results)
+        for name, result in results.items():
+            with self.subTest(view=name):
+                self.assertLess(result["status"], 400)
+                self.assertGreater(result["queries"], 0)
+                self.assertLessEqual(result["p50_ms"], result["p95_ms"])
+        self.assertEqual(Comment.objects.count(), 80)
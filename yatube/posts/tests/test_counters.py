@@ -0,0 +1,76 @@
+from posts.counters import reconcile
+from posts.models import AuthorStats, Comment, Follow, Post, PostStats
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username="Автор поста")
+        cls.user = User.objects.create_user(username="HasNoName")
+        cls.post = Post.objects.create(
+            text="Тестовый текст", author=cls.author
+        )
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        cache.clear()
+
+    def stats(self, user):
+        return AuthorStats.objects.get(user=user)
+
+    def comments_count(self):
+        return PostStats.objects.get(post=self.post).comments_count
+
+    def test_counters_follow_write_paths(self):
+        """Счётчики меняются при создании и удалении объектов."""
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        comment = Comment.objects.create(
+            post=self.post, author=self.user, text="Комментарий"
+        )
+        self.assertEqual(self.comments_count(), 1)
+        follow = Follow.objects.create(user=self.user, author=self.author)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.user).following_count, 1)
+        comment.delete()
+        follow.delete()
+        self.assertEqual(self.comments_count(), 0)
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.user).following_count, 0)
+
+    def test_pages_do_not_count(self):
+        """Профиль и страница поста не выполняют COUNT-запросов."""
+        urls = [
+            reverse("posts:profile", args=[self.author.username]),
+            reverse("posts:post_detail", args=[self.post.pk]),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.authorized_client.get(url)
+                self.assertEqual(response.context["count"], 1)
+                self.assertFalse(
+                    any(
+                        "COUNT(" in query["sql"]
+                        for query in queries.captured_queries
+                    )
+                )
+
+    def test_reconcile_fixes_drift(self):
+        """reconcile_counters исправляет разошедшиеся счётчики."""
+        AuthorStats.objects.filter(user=self.author).update(posts_count=7)
+        PostStats.objects.all().delete()
+        fixed = reconcile()
+        self.assertEqual(fixed["posts_count"], 1)
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertTrue(PostStats.objects.filter(post=self.post).exists())
@@ -0,0 +1,68 @@
+from posts import follow_graph
+from posts.models import Follow, User
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+
+class FollowGraphTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username="reader")
+        self.authors = [
+            User.objects.create_user(username=f"author{number}")
+            for number in range(3)
+        ]
+        for author in self.authors[1:]:
+            Follow.objects.create(user=self.reader, author=author)
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_membership_is_answered_from_cache(self):
+        """После первой загрузки набор подписок не трогает базу."""
+        follow_graph.followees(self.reader.pk)
+        with self.assertNumQueries(0):
+            ids = follow_graph.followees(self.reader.pk)
+            self.assertTrue(follow_graph.follows(self.reader.pk, ids[0]))
+            self.assertFalse(
+                follow_graph.follows(self.reader.pk, self.authors[0].pk)
+            )
+        self.assertEqual(list(ids), sorted(ids))
+        self.assertEqual(
+            list(ids), sorted(author.pk for author in self.authors[1:])
+        )
+
+    def test_follow_and_unfollow_update_set_in_place(self):
+        """Подписка и отписка правят закэшированный набор без перечитывания."""
+        follow_graph.followees(self.reader.pk)
+        self.client.get(
+            reverse("posts:profile_follow", args=[self.authors[0].username])
+        )
+        self.client.get(
+            reverse("posts:profile_unfollow", args=[self.authors[1].username])
+        )
+        with self.assertNumQueries(0):
+            ids = follow_graph.followees(self.reader.pk)
+        self.assertEqual(
+            list(ids), sorted([self.authors[0].pk, self.authors[2].pk])
+        )
+
+    def test_set_is_reloaded_when_evicted(self):
+        """Без набора в кэше подписка его не создаёт — читаем из базы."""
+        follow_graph.followees(self.reader.pk)
+        cache.clear()
+        Follow.objects.create(user=self.reader, author=self.authors[0])
+        self.assertTrue(
+            follow_graph.follows(self.reader.pk, self.authors[0].pk)
+        )
+
+    def test_profile_shows_follow_state(self):
+        response = self.client.get(
+            reverse("posts:profile", args=[self.authors[1].username])
+        )
+        self.assertTrue(response.context["following"])
+        response = self.client.get(
+            reverse("posts:profile", args=[self.authors[0].username])
+        )
+        self.assertFalse(response.context["following"])
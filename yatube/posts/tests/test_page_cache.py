@@ -0,0 +1,120 @@
+from core import routers
+from posts import caching
+from posts.models import Comment, Follow, Group, Post, User
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase
+from django.urls import reverse
+
+
+class AnonymousPageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username="author")
+        self.groups = [
+            Group.objects.create(
+                title=f"Группа {number}",
+                slug=f"group-{number}",
+                description="Описание",
+            )
+            for number in range(2)
+        ]
+        self.post = Post.objects.create(
+            author=self.author, group=self.groups[0], text="Первый пост"
+        )
+        self.detail = reverse("posts:post_detail", args=[self.post.pk])
+        self.guest = Client()
+
+    def url_generation(self, path):
+        return caching.generations(caching.url_generation(path))
+
+    def test_repeated_anonymous_get_skips_view(self):
+        """Повторный запрос отдаётся целиком из кэша, без запросов к базе."""
+        first = self.guest.get(self.detail)
+        with self.assertNumQueries(0):
+            second = self.guest.get(self.detail)
+        self.assertIsNone(second.context)
+        self.assertEqual(second.content, first.content)
+        response = self.guest.get(
+            self.detail, HTTP_IF_NONE_MATCH=first["ETag"]
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_private_requests_bypass_cache(self):
+        """Сессия, CSRF-кука и лишние параметры проходят мимо кэша."""
+        self.guest.get(self.detail)
+        logged_in = Client()
+        logged_in.force_login(self.author)
+        with_csrf = Client()
+        with_csrf.cookies[settings.CSRF_COOKIE_NAME] = "token"
+        requests = {
+            "сессия": lambda: logged_in.get(self.detail),
+            "csrf": lambda: with_csrf.get(self.detail),
+            "параметры": lambda: self.guest.get(self.detail, {"utm": "x"}),
+        }
+        for name, send in requests.items():
+            with self.subTest(name):
+                self.assertIsNotNone(send().context)
+
+    def test_writes_purge_only_affected_urls(self):
+        own = reverse("posts:group_list", args=[self.groups[0].slug])
+        other = reverse("posts:group_list", args=[self.groups[1].slug])
+        self.guest.get(own)
+        before = self.url_generation(other)
+        Post.objects.create(
+            author=self.author, group=self.groups[0], text="Свежий пост"
+        )
+        self.assertContains(self.guest.get(own), "Свежий пост")
+        self.assertEqual(self.url_generation(other), before)
+
+        Comment.objects.create(
+            post=self.post, author=self.author, text="Новый отзыв"
+        )
+        self.assertContains(self.guest.get(self.detail), "Новый отзыв")
+
+    def test_group_slug_change_purges_its_posts(self):
+        """Новый слаг меняет ссылку на группу на страницах её постов."""
+        self.guest.get(self.detail)
+        self.groups[0].slug = "renamed"
+        self.groups[0].save()
+        self.assertContains(
+            self.guest.get(self.detail),
+            reverse("posts:group_list", args=["renamed"]),
+        )
+
+    def test_follow_refreshes_follower_profile(self):
+        """Подписка меняет счётчик подписок на профиле читателя."""
+        reader = User.objects.create_user(username="reader")
+        url = reverse("posts:profile", args=[reader.username])
+        self.guest.get(url)
+        other = Client()
+        other.force_login(self.author)
+        etag = other.get(url)["ETag"]
+        Follow.objects.create(user=reader, author=self.author)
+        response = self.guest.get(url)
+        self.assertEqual(response.context["stats"].following_count, 1)
+        response = other.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class GenerationEtagTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(routers.state.end)
+
+    def render(self, replica_reads):
+        @caching.etag_by_generation("index")
+        def view(request):
+            routers.state.replica_reads = replica_reads
+            return HttpResponse("страница")
+
+        request = RequestFactory().get("/")
+        request.user = User()
+        return view(request)
+
+    def test_page_read_from_replica_has_no_etag(self):
+        """Страница с реплики могла отстать — валидатор ей не выдаётся."""
+        self.assertTrue(self.render(replica_reads=False).has_header("ETag"))
+        self.assertFalse(self.render(replica_reads=True).has_header("ETag"))
@@ -0,0 +1,85 @@
+import re
+
+from posts.models import Comment, Follow, Group, Post
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+User = get_user_model()
+AMOUNT_OF_POSTS = 13
+
+# «SCAN t» без индекса — полный проход таблицы; «TEMP B-TREE» — сортировка
+# во временном дереве. «SCAN t USING INDEX» допустим: это чтение индекса
+# в нужном порядке, которое обрывается на LIMIT.
+FULL_SCAN = re.compile(r"\bSCAN (TABLE )?\w+\b(?! USING (COVERING )?INDEX)")
+TEMP_SORT = "USE TEMP B-TREE"
+
+
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username="Автор поста")
+        cls.user = User.objects.create_user(username="HasNoName")
+        cls.group = Group.objects.create(
+            title="Тестовый заголовок",
+            description="Тестовое описание",
+            slug="test_slug",
+        )
+        for i in range(AMOUNT_OF_POSTS):
+            post = Post.objects.create(
+                text=f"Тестовый текст {i}", author=cls.author, group=cls.group
+            )
+            Comment.objects.create(
+                post=post, author=cls.user, text="Комментарий"
+            )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        cls.post = post
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        cache.clear()
+
+    def assert_plans_use_indexes(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        for query in queries.captured_queries:
+            sql = query["sql"]
+            if not sql.startswith("SELECT"):
+                continue
+            for step in self.explain(sql):
+                with self.subTest(url=url, sql=sql, step=step):
+                    self.assertNotRegex(step, FULL_SCAN)
+                    self.assertNotIn(TEMP_SORT, step)
+        return response
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            return [row[-1] for row in cursor.fetchall()]
+
+    def test_views_use_indexes(self):
+        """Запросы лент и страниц не сканируют таблицы и не сортируют."""
+        urls = [
+            reverse("posts:index"),
+            reverse("posts:group_list", args=[self.group.slug]),
+            reverse("posts:profile", args=[self.author.username]),
+            reverse("posts:post_detail", args=[self.post.pk]),
+            reverse("posts:post_comments", args=[self.post.pk]),
+            reverse("posts:follow_index"),
+            reverse("posts:popular"),
+        ]
+        for url in urls:
+            response = self.assert_plans_use_indexes(url)
+            page = response.context.get("page_obj")
+            if page is not None and page.has_next():
+                cache.clear()
+                self.assert_plans_use_indexes(
+                    url, {"cursor": page.next_cursor}
+                )
@@ -0,0 +1,64 @@
+from posts.models import Post
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username="Автор поста")
+        cls.rare = Post.objects.create(
+            text="Сегодня пекли пироги и пили чай", author=cls.author
+        )
+        cls.often = Post.objects.create(
+            text="Пироги с капустой, пироги с мясом, пироги с яблоком",
+            author=cls.author,
+        )
+        Post.objects.create(text="Про котов", author=cls.author)
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def search(self, query):
+        response = self.guest_client.get(
+            reverse("posts:post_search"), {"q": query}
+        )
+        return list(response.context["page_obj"])
+
+    def test_search_ranks_by_relevance(self):
+        """Поиск находит посты и ставит релевантные выше."""
+        self.assertEqual(self.search("пироги"), [self.often, self.rare])
+        self.assertEqual(self.search("пирог"), [self.often, self.rare])
+        self.assertEqual(self.search("пироги чай"), [self.rare])
+
+    def test_index_follows_post_changes(self):
+        """Индекс обновляется при изменении и удалении поста."""
+        rare = Post.objects.get(pk=self.rare.pk)
+        rare.text = "Про собак"
+        rare.save()
+        self.assertEqual(self.search("пироги"), [self.often])
+        self.assertEqual(self.search("собак"), [rare])
+        Post.objects.filter(pk=self.often.pk).delete()
+        self.assertEqual(self.search("пироги"), [])
+
+    def test_search_survives_fts_syntax(self):
+        """Операторы FTS5 во вводе не ломают запрос."""
+        for query in ('"', "NOT", "пироги OR*", "(", ""):
+            with self.subTest(query=query):
+                self.search(query)
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идёт через тот же индекс."""
+        admin = User.objects.create_superuser("admin", "a@a.ru", "pass")
+        self.guest_client.force_login(admin)
+        response = self.guest_client.get(
+            reverse("admin:posts_post_changelist"), {"q": "капустой"}
+        )
+        self.assertEqual(
+            list(response.context["cl"].result_list), [self.often]
+        )
@@ -0,0 +1,214 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from PIL import Image
+
+from core.cache import SQLiteCache
+from core.views import IMMUTABLE, media
+from posts import images, thumbnails
+from posts.models import Post
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import transaction
+from django.test import (
+    Client,
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        image = BytesIO()
+        Image.new("RGB", (1200, 600), "red").save(image, "JPEG")
+        cls.author = User.objects.create(username="Автор поста")
+        cls.post = Post.objects.create(
+            text="Тестовый текст",
+            author=cls.author,
+            image=SimpleUploadedFile("big.jpg", image.getvalue()),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.guest_client = Client()
+        cache.clear()
+
+    def lookup(self):
+        geometry, options = thumbnails.THUMBNAIL_SIZES[0]
+        return thumbnails.backend.lookup(self.post.image, geometry, **options)
+
+    def test_placeholder_until_thumbnail_is_ready(self):
+        """Пока миниатюры нет, страница показывает заглушку."""
+        url = reverse("posts:profile", args=[self.author.username])
+        response = self.guest_client.get(url)
+        self.assertContains(response, "img/placeholder.svg")
+        self.assertIsNone(self.lookup())
+
+        thumbnails.render_thumbnails(self.post.image.name)
+        self.assertIsNotNone(self.lookup())
+        response = self.guest_client.get(url)
+        self.assertNotContains(response, "img/placeholder.svg")
+        self.assertContains(response, self.lookup().url)
+
+    def test_placeholder_page_has_no_etag(self):
+        """Страницу с заглушкой браузер не переиспользует по ETag."""
+        url = reverse("posts:post_detail", args=[self.post.pk])
+        response = self.guest_client.get(url)
+        self.assertContains(response, "img/placeholder.svg")
+        self.assertFalse(response.has_header("ETag"))
+
+        thumbnails.render_thumbnails(self.post.image.name)
+        self.assertTrue(self.guest_client.get(url).has_header("ETag"))
+
+    def test_missing_file_falls_back_to_original(self):
+        """Без файла рендер помечается неудачным, и его не повторяют."""
+        post = Post.objects.create(
+            text="Импортированный пост",
+            author=self.author,
+            image="posts/missing.jpg",
+        )
+        url = reverse("posts:post_detail", args=[post.pk])
+        self.assertContains(self.guest_client.get(url), "placeholder.svg")
+        with self.assertRaises(FileNotFoundError):
+            thumbnails.render_thumbnails(post.image.name)
+        with mock.patch.object(thumbnails, "enqueue") as enqueue:
+            response = self.guest_client.get(url)
+        enqueue.assert_not_called()
+        self.assertNotContains(response, "placeholder.svg")
+        self.assertContains(response, f'src="{post.image.url}"')
+        self.assertTrue(response.has_header("ETag"))
+
+    @override_settings(IMAGE_MAX_SIZE=500)
+    def test_pending_keys_of_both_names_are_cleared(self):
+        """После пережатия снимается отметка и со старого имени файла."""
+        original = BytesIO()
+        Image.new("RGB", (1200, 600), "green").save(original, "JPEG")
+        name = default_storage.save(
+            "posts/upload.jpg", ContentFile(original.getvalue())
+        )
+        cache.set(thumbnails.PENDING_KEY.format(name), True)
+        new_name = thumbnails.render_thumbnails(name, normalize=True)
+        self.assertNotEqual(new_name, name)
+        for key in (name, new_name):
+            with self.subTest(name=key):
+                self.assertIsNone(
+                    cache.get(thumbnails.PENDING_KEY.format(key))
+                )
+
+    def test_ready_thumbnails_are_read_in_one_batch(self):
+        """Готовые миниатюры всех размеров читаются одним get_many."""
+        thumbnails.render_thumbnails(self.post.image.name)
+        sizes = list(thumbnails.variants())
+        with mock.patch.object(SQLiteCache, "get") as get:
+            found = thumbnails.backend.lookup_many(self.post.image, sizes)
+        get.assert_not_called()
+        self.assertEqual(len(found), len(sizes))
+        self.assertNotIn(None, found)
+
+    @override_settings(IMAGE_MAX_SIZE=500, IMAGE_QUALITY=80)
+    def test_upload_is_normalized(self):
+        """Загрузка повёрнута по EXIF, уменьшена и лишена метаданных."""
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Orientation: повернуть на 90° по часовой.
+        exif[0x010F] = "Камера"  # Make
+        original = BytesIO()
+        Image.new("RGB", (1500, 1000), "blue").save(
+            original, "JPEG", quality=100, exif=exif.tobytes()
+        )
+        name = default_storage.save(
+            "posts/camera.jpg", ContentFile(original.getvalue())
+        )
+
+        new_name = images.normalize(name, default_storage)
+        self.assertNotEqual(new_name, name)
+        self.assertTrue(default_storage.exists(name))
+        with default_storage.open(new_name) as file:
+            normalized = Image.open(file)
+            normalized.load()
+        self.assertEqual(normalized.size, (333, 500))
+        self.assertFalse(normalized.getexif())
+        self.assertLess(
+            default_storage.size(new_name), len(original.getvalue())
+        )
+
+    def test_gif_is_left_as_is(self):
+        original = BytesIO()
+        Image.new("P", (10, 10)).save(original, "GIF")
+        name = default_storage.save(
+            "posts/small.gif", ContentFile(original.getvalue())
+        )
+        self.assertIsNone(images.normalize(name, default_storage))
+
+    def test_srcset_lists_every_width(self):
+        """После рендеринга в srcset есть все ширины, в src — основная."""
+        thumbnails.render_thumbnails(self.post.image.name)
+        response = self.guest_client.get(
+            reverse("posts:post_detail", args=[self.post.pk])
+        )
+        for width in thumbnails.SRCSET_WIDTHS:
+            with self.subTest(width=width):
+                self.assertContains(response, f" {width}w")
+        self.assertContains(response, f'src="{self.lookup().url}"')
+
+    def test_only_hashed_media_is_immutable(self):
+        """Вечный кэш — только файлам, названным по хэшу содержимого."""
+        thumbnails.render_thumbnails(self.post.image.name)
+        plain = default_storage.save("posts/plain.jpg", ContentFile(b"x"))
+        self.assertRegex(self.post.image.name, r"^posts/[0-9a-f]{20}\.jpg$")
+        cases = (
+            (self.post.image.name, IMMUTABLE),
+            (self.lookup().name, IMMUTABLE),
+            (plain, None),
+        )
+        for name, cache_control in cases:
+            with self.subTest(name=name):
+                response = media(RequestFactory().get("/"), name)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.get("Cache-Control"), cache_control)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class RenameImageTests(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_original_is_deleted_after_commit(self):
+        """Исходник удаляется, только когда пост уже ссылается на новый."""
+        image = BytesIO()
+        Image.new("RGB", (1200, 600), "red").save(image, "JPEG")
+        post = Post.objects.create(
+            text="Тестовый текст",
+            author=User.objects.create(username="Автор поста"),
+            image=SimpleUploadedFile("big.jpg", image.getvalue()),
+        )
+        old_name = post.image.name
+        with transaction.atomic():
+            new_name = thumbnails.rename_image(
+                old_name, images.normalize(old_name, default_storage)
+            )
+            self.assertTrue(default_storage.exists(old_name))
+        self.assertFalse(default_storage.exists(old_name))
+        post.refresh_from_db()
+        self.assertEqual(post.image.name, new_name)
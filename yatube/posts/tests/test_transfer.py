@@ -0,0 +1,178 @@
+import datetime
+import io
+import os
+import shutil
+import tempfile
+
+from posts.models import (
+    ArchivedComment,
+    ArchivedPost,
+    AuthorStats,
+    Comment,
+    Follow,
+    Group,
+    Post,
+    TimelineEntry,
+)
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.utils import timezone
+
+User = get_user_model()
+TEMP_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+class TransferTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username="Автор поста")
+        cls.user = User.objects.create_user(username="HasNoName")
+        cls.group = Group.objects.create(
+            title="Тестовый заголовок",
+            description="Тестовое описание",
+            slug="test_slug",
+        )
+        for i in range(5):
+            post = Post.objects.create(
+                text=f"Тестовый текст {i}", author=cls.author, group=cls.group
+            )
+            Comment.objects.create(
+                post=post, author=cls.user, text=f"Комментарий {i}"
+            )
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def snapshot(self):
+        return (
+            list(
+                Post.objects.order_by("pub_date").values_list(
+                    "text", "pub_date", "author__username", "group__slug"
+                )
+            ),
+            list(
+                Comment.objects.order_by("created").values_list(
+                    "text", "created", "post__text", "author__username"
+                )
+            ),
+            list(
+                Follow.objects.values_list(
+                    "user__username", "author__username"
+                )
+            ),
+        )
+
+    def export(self):
+        path = os.path.join(TEMP_DIR, "export.jsonl")
+        call_command("export_posts", path, chunk_size=2, stderr=io.StringIO())
+        return path
+
+    def load(self, path):
+        call_command(
+            "import_posts",
+            path,
+            batch_size=3,
+            stdout=io.StringIO(),
+            stderr=io.StringIO(),
+        )
+
+    def test_round_trip_keeps_data_and_dates(self):
+        """Выгрузка и загрузка в пустую базу восстанавливают данные."""
+        expected = self.snapshot()
+        path = self.export()
+        Post.objects.all().delete()
+        Follow.objects.all().delete()
+        Group.objects.all().delete()
+        self.load(path)
+        self.assertEqual(self.snapshot(), expected)
+        stats = AuthorStats.objects.get(user=self.author)
+        self.assertEqual((stats.posts_count, stats.followers_count), (5, 1))
+
+    def test_repeated_import_does_not_duplicate(self):
+        expected = self.snapshot()
+        self.load(self.export())
+        self.assertEqual(self.snapshot(), expected)
+
+    def test_unknown_users_are_created(self):
+        path = self.export()
+        Post.objects.all().delete()
+        User.objects.filter(pk=self.author.pk).delete()
+        self.load(path)
+        self.assertTrue(
+            User.objects.filter(username=self.author.username).exists()
+        )
+        self.assertEqual(Post.objects.count(), 5)
+
+    def test_archived_posts_survive_round_trip(self):
+        """Выгрузка после архивации возвращает посты в архив."""
+        now = timezone.now()
+        for days, text in enumerate(["Тестовый текст 0", "Тестовый текст 1"]):
+            Post.objects.filter(text=text).update(
+                pub_date=now - datetime.timedelta(days=400 + days)
+            )
+        call_command("archive_posts", days=365, pause=0, stdout=io.StringIO())
+        archived = list(
+            ArchivedPost.objects.order_by("text").values_list(
+                "text", "pub_date", "author__username", "comments_count"
+            )
+        )
+        self.assertEqual(len(archived), 2)
+        path = self.export()
+        Post.objects.all().delete()
+        ArchivedPost.objects.all().delete()
+        Group.objects.all().delete()
+        self.load(path)
+        self.assertEqual(Post.objects.count(), 3)
+        self.assertEqual(
+            list(
+                ArchivedPost.objects.order_by("text").values_list(
+                    "text", "pub_date", "author__username", "comments_count"
+                )
+            ),
+            archived,
+        )
+        self.assertEqual(ArchivedComment.objects.count(), 2)
+        self.assertFalse(
+            Post.objects.filter(
+                pk__in=ArchivedPost.objects.values("pk")
+            ).exists()
+        )
+        stats = AuthorStats.objects.get(user=self.author)
+        self.assertEqual(stats.posts_count, 5)
+        self.load(path)
+        self.assertEqual(ArchivedPost.objects.count(), 2)
+        self.assertEqual(Post.objects.count(), 3)
+
+    def test_import_updates_only_imported_data(self):
+        """Ленты и счётчики правятся точечно, чужой кэш не трогается."""
+        path = self.export()
+        Post.objects.all().delete()
+        cache.set("unrelated", "kept")
+        self.load(path)
+        self.assertEqual(cache.get("unrelated"), "kept")
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.user).count(), 5
+        )
+        stats = AuthorStats.objects.get(user=self.author)
+        self.assertEqual(stats.posts_count, 5)
+
+    def test_each_batch_is_committed(self):
+        """Ошибка в середине файла не откатывает загруженные пачки."""
+        path = self.export()
+        Post.objects.all().delete()
+        with open(path, "a", encoding="utf-8") as file:
+            file.write("не json\n")
+        with self.assertRaises(CommandError):
+            self.load(path)
+        self.assertEqual(Post.objects.count(), 5)
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.author).posts_count, 5
+        )
@@ -0,0 +1,97 @@
+import datetime
+from io import StringIO
+
+from posts import trending
+from posts.models import Comment, PopularPost, Post, User
+from posts.trending import TrendingPaginator
+from posts.views import POST_IN_PAGE
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+
+@override_settings(TRENDING_HALF_LIFE_HOURS=12, TRENDING_WINDOW_DAYS=3)
+class TrendingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username="author")
+        self.reader = User.objects.create_user(username="reader")
+        self.posts = [
+            Post.objects.create(author=self.author, text=f"Пост {number}")
+            for number in range(3)
+        ]
+
+    def comment(self, post, count=1, age=None):
+        for _ in range(count):
+            comment = Comment.objects.create(
+                post=post, author=self.reader, text="Отзыв"
+            )
+        if age is not None:
+            Comment.objects.filter(post=post).update(
+                created=timezone.now() - age
+            )
+        return comment
+
+    def ranked(self):
+        return list(
+            PopularPost.objects.order_by("-rank").values_list(
+                "post_id", flat=True
+            )
+        )
+
+    def test_new_comments_update_ranking(self):
+        """Каждый комментарий сразу поднимает пост, без пересчёта."""
+        self.comment(self.posts[0])
+        self.comment(self.posts[1], count=3)
+        self.assertEqual(self.ranked(), [self.posts[1].pk, self.posts[0].pk])
+        self.comment(self.posts[0], count=3)
+        self.assertEqual(self.ranked(), [self.posts[0].pk, self.posts[1].pk])
+
+    def test_refresh_decays_and_drops_stale_posts(self):
+        """Два дня — четыре полупериода: 3 старых отзыва легче 1 свежего."""
+        self.comment(self.posts[0], count=3, age=datetime.timedelta(days=2))
+        self.comment(self.posts[1])
+        self.comment(self.posts[2], age=datetime.timedelta(days=5))
+        out = StringIO()
+        call_command("refresh_trending", stdout=out)
+        self.assertIn("Постов в рейтинге: 2", out.getvalue())
+        self.assertEqual(self.ranked(), [self.posts[1].pk, self.posts[0].pk])
+
+    def test_refresh_agrees_with_incremental_ranks(self):
+        self.comment(self.posts[0], count=2)
+        self.comment(self.posts[1])
+        incremental = dict(PopularPost.objects.values_list("post_id", "rank"))
+        trending.refresh()
+        refreshed = dict(PopularPost.objects.values_list("post_id", "rank"))
+        self.assertEqual(incremental.keys(), refreshed.keys())
+        for post_id, rank in incremental.items():
+            self.assertAlmostEqual(rank, refreshed[post_id], places=6)
+
+    def test_pages_read_one_query_each(self):
+        posts = [
+            Post.objects.create(author=self.author, text=f"Ещё {number}")
+            for number in range(POST_IN_PAGE + 2)
+        ]
+        for post in posts:
+            self.comment(post)
+        paginator = TrendingPaginator(POST_IN_PAGE)
+        with self.assertNumQueries(1):
+            first = paginator.get_page()
+            authors = {post.author.username for post in first}
+        self.assertEqual(authors, {"author"})
+        second = paginator.get_page(first.next_cursor)
+        self.assertEqual(len(first) + len(second), len(posts))
+        self.assertFalse(second.has_next())
+        self.assertFalse(
+            {post.pk for post in first} & {post.pk for post in second}
+        )
+        # Свежие комментарии весят больше — позже прокомментированные выше.
+        self.assertEqual(first[0].pk, posts[-1].pk)
+        response = Client().get(reverse("posts:popular"))
+        self.assertEqual(
+            [post.pk for post in response.context["page_obj"]],
+            [post.pk for post in first],
+        )
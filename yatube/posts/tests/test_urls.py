@@ -57,6 +57,7 @@ class TaskURLTests(TestCase):
                 "posts/post_detail.html",
                 HTTPStatus.OK.value,
             ],
+            "/popular/": ["posts/popular.html", HTTPStatus.OK.value],
         }
         first_element_in_dict = 0
         for (
@@ -1,18 +1,29 @@
+import shutil
+import tempfile
+
 from django import forms
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from posts.models import Follow, Group, Post
+from core import jobs
+from posts import thumbnails
+from posts.models import Comment, Follow, Group, Post, TimelineEntry
 
 User = get_user_model()
 first_post_on_page = 0
 AMOUNT_OF_POSTS = 13
 POSTS_ON_PAGE = 10
+COMMENTS_ON_PAGE = 20
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class PostPagesTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -42,6 +53,11 @@ class PostPagesTests(TestCase):
         )
         cls.user = User.objects.create_user(username="HasNoName")
 
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
     def setUp(self):
         self.guest_client = Client()
         self.authorized_client = Client()
@@ -175,24 +191,43 @@ class PostPagesTests(TestCase):
         self.assertEqual(post_image_0, self.post.image)
 
     def test_cache_index(self):
-        """Проверка хранения и очищения кэша для index."""
+        """Проверка хранения кэша index и его сброса при записи поста."""
+        thumbnails.render_thumbnails(self.post.image.name)
         response = self.authorized_client_author.get(reverse("posts:index"))
         posts = response.content
-        Post.objects.create(
-            text="Тестовый текст",
-            author=self.author,
-        )
+        Post.objects.filter(pk=self.post.pk).update(text="Без сигналов")
         response_old = self.authorized_client_author.get(
             reverse("posts:index")
         )
         old_posts = response_old.content
         self.assertEqual(old_posts, posts)
-        cache.clear()
+        Post.objects.create(
+            text="Тестовый текст",
+            author=self.author,
+        )
         response_new = self.authorized_client_author.get(
             reverse("posts:index")
         )
         new_posts = response_new.content
         self.assertNotEqual(old_posts, new_posts)
+        self.assertContains(response_new, "Без сигналов")
+
+    def test_cache_group_follows_post_moves(self):
+        """Перенос поста в другую группу сбрасывает кэш обеих групп."""
+        other = Group.objects.create(
+            title="Другая группа", description="Описание", slug="other"
+        )
+        old_url = reverse("posts:group_list", kwargs={"slug": "test_slug"})
+        new_url = reverse("posts:group_list", kwargs={"slug": "other"})
+
+        def count(url):
+            return len(self.guest_client.get(url).context["page_obj"])
+
+        self.assertEqual((count(old_url), count(new_url)), (1, 0))
+        post = Post.objects.get(pk=self.post.pk)
+        post.group = other
+        post.save()
+        self.assertEqual((count(old_url), count(new_url)), (0, 1))
 
     def test_follow_page(self):
         """Проверка на подписку и отписку авторизованным пользователем./
@@ -230,6 +265,7 @@ class PaginatorViewsTest(TestCase):
         self.guest_client = Client()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
+        cache.clear()
 
         list_of_posts = [
             (
@@ -286,3 +322,253 @@ class PaginatorViewsTest(TestCase):
                     ),
                     (AMOUNT_OF_POSTS - POSTS_ON_PAGE),
                 )
+
+    def test_cursor_pagination(self):
+        """Проверка: курсоры next/previous обходят ленту без пропусков."""
+        url_pages = [
+            reverse("posts:index"),
+            reverse("posts:group_list", kwargs={"slug": self.group.slug}),
+            reverse("posts:profile", kwargs={"username": self.user.username}),
+        ]
+        expected = list(
+            Post.objects.order_by("-pub_date", "-pk").values_list(
+                "pk", flat=True
+            )
+        )
+        for url in url_pages:
+            with self.subTest(url=url):
+                cache.clear()
+                first_page = self.authorized_client.get(url).context[
+                    "page_obj"
+                ]
+                self.assertFalse(first_page.has_previous())
+                cache.clear()
+                second_page = self.authorized_client.get(
+                    url, {"cursor": first_page.next_cursor}
+                ).context["page_obj"]
+                self.assertFalse(second_page.has_next())
+                self.assertEqual(
+                    [post.pk for post in first_page]
+                    + [post.pk for post in second_page],
+                    expected,
+                )
+                cache.clear()
+                back_page = self.authorized_client.get(
+                    url, {"cursor": second_page.previous_cursor}
+                ).context["page_obj"]
+                self.assertEqual(list(back_page), list(first_page))
+                self.assertFalse(back_page.has_previous())
+
+    def test_cursor_pagination_without_count(self):
+        """Проверка: курсорная страница не выполняет COUNT(*)."""
+        url = reverse("posts:group_list", kwargs={"slug": self.group.slug})
+        with CaptureQueriesContext(connection) as queries:
+            self.guest_client.get(url, {"cursor": "мусор"})
+        self.assertFalse(
+            any("COUNT(" in query["sql"] for query in queries.captured_queries)
+        )
+
+    def test_comments_are_paginated(self):
+        """Проверка: на посте первая страница комментариев, дальше — курсор."""
+        post = Post.objects.first()
+        Comment.objects.bulk_create(
+            Comment(post=post, author=self.user, text=f"Комментарий {i}")
+            for i in range(COMMENTS_ON_PAGE + 5)
+        )
+        expected = list(
+            post.comments.order_by("-created", "-pk").values_list(
+                "pk", flat=True
+            )
+        )
+        response = self.guest_client.get(
+            reverse("posts:post_detail", kwargs={"post_id": post.pk})
+        )
+        first_page = response.context["comments"]
+        self.assertEqual(len(first_page), COMMENTS_ON_PAGE)
+        self.assertContains(
+            response, reverse("posts:post_comments", args=[post.pk])
+        )
+        fragment = self.guest_client.get(
+            reverse("posts:post_comments", args=[post.pk]),
+            {"cursor": first_page.next_cursor},
+        )
+        self.assertTemplateUsed(fragment, "posts/includes/comment_list.html")
+        second_page = fragment.context["comments"]
+        self.assertFalse(second_page.has_next())
+        self.assertEqual(
+            [comment.pk for comment in first_page]
+            + [comment.pk for comment in second_page],
+            expected,
+        )
+
+    def test_comments_fragment_of_missing_post(self):
+        response = self.guest_client.get(
+            reverse("posts:post_comments", args=[0])
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class FollowTimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username="Автор поста")
+        cls.user = User.objects.create_user(username="HasNoName")
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def feed(self):
+        response = self.authorized_client.get(reverse("posts:follow_index"))
+        return list(response.context["page_obj"])
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост автора попадает в ленту подписчика."""
+        self.authorized_client.get(
+            reverse("posts:profile_follow", args=[self.author.username])
+        )
+        post = Post.objects.create(text="Тестовый текст", author=self.author)
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.user, post=post).exists()
+        )
+        self.assertEqual(self.feed(), [post])
+
+    def test_unfollow_prunes_timeline(self):
+        """Отписка удаляет посты автора из ленты."""
+        Post.objects.create(text="Тестовый текст", author=self.author)
+        Follow.objects.create(user=self.user, author=self.author)
+        self.assertEqual(len(self.feed()), 1)
+        self.authorized_client.get(
+            reverse("posts:profile_unfollow", args=[self.author.username])
+        )
+        self.assertFalse(TimelineEntry.objects.filter(user=self.user).exists())
+        self.assertEqual(self.feed(), [])
+
+    def test_legacy_page_links_still_work(self):
+        """Старые ссылки ?page=N на ленту подписок открывают свою страницу."""
+        Follow.objects.create(user=self.user, author=self.author)
+        posts = [
+            Post.objects.create(text=f"Пост {number}", author=self.author)
+            for number in range(POSTS_ON_PAGE + 1)
+        ]
+        response = self.authorized_client.get(
+            reverse("posts:follow_index"), {"page": 2}
+        )
+        self.assertEqual(response.context["page_obj"].number, 2)
+        self.assertEqual(list(response.context["page_obj"]), posts[:1])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_celebrity_posts_are_pulled_on_read(self):
+        """Посты «звёзд» не раздаются, а подмешиваются при чтении."""
+        Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(text="Тестовый текст", author=self.author)
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.feed(), [post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=2)
+    def test_posts_survive_dropping_below_fanout_limit(self):
+        """Посты времён «звезды» остаются в ленте, когда она теряет статус."""
+        other = User.objects.create_user(username="other")
+        Follow.objects.create(user=self.user, author=self.author)
+        Follow.objects.create(user=other, author=self.author)
+        post = Post.objects.create(text="Тестовый текст", author=self.author)
+        self.assertFalse(TimelineEntry.objects.exists())
+        Follow.objects.get(user=other).delete()
+        self.assertEqual(jobs.run_pending(), 1)
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.user, post=post).exists()
+        )
+        self.assertEqual(self.feed(), [post])
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username="Автор поста")
+        cls.user = User.objects.create_user(username="HasNoName")
+        cls.group = Group.objects.create(
+            title="Тестовый заголовок",
+            description="Тестовое описание",
+            slug="test_slug",
+        )
+        cls.post = Post.objects.create(
+            text="Тестовый текст", author=cls.author, group=cls.group
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        cache.clear()
+
+    def revalidate(self, client, url):
+        etag = client.get(url)["ETag"]
+        return client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_pages_return_304(self):
+        """Неизменившаяся страница отвечает 304 без выборки постов."""
+        urls = [
+            reverse("posts:index"),
+            reverse("posts:group_list", args=[self.group.slug]),
+            reverse("posts:profile", args=[self.author.username]),
+            reverse("posts:post_detail", args=[self.post.pk]),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                etag = self.guest_client.get(url)["ETag"]
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.guest_client.get(
+                        url, HTTP_IF_NONE_MATCH=etag
+                    )
+                self.assertEqual(response.status_code, 304)
+                self.assertLessEqual(len(queries), 1)
+
+    def test_writes_change_validators(self):
+        """Новый комментарий, пост или подписка меняют ETag страниц."""
+        detail = reverse("posts:post_detail", args=[self.post.pk])
+        etag = self.guest_client.get(detail)["ETag"]
+        Comment.objects.create(
+            post=self.post, author=self.user, text="Комментарий"
+        )
+        response = self.guest_client.get(detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = self.guest_client.get(detail)["ETag"]
+        Post.objects.create(text="Ещё один пост", author=self.author)
+        response = self.guest_client.get(detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        feed = reverse("posts:follow_index")
+        self.assertEqual(
+            self.revalidate(self.authorized_client, feed).status_code, 304
+        )
+        etag = self.authorized_client.get(feed)["ETag"]
+        Follow.objects.create(user=self.user, author=self.author)
+        response = self.authorized_client.get(feed, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_validators_differ_per_user(self):
+        url = reverse("posts:index")
+        etag = self.guest_client.get(url)["ETag"]
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_relogin_changes_validator(self):
+        """После повторного входа страница с формой приходит заново."""
+        User.objects.create_user(username="returning", password="secret")
+        credentials = {"username": "returning", "password": "secret"}
+        client = Client()
+        client.post(reverse("users:login"), credentials)
+        detail = reverse("posts:post_detail", args=[self.post.pk])
+        # Первый показ формы выдаёт CSRF-куку, второй уже с ней.
+        client.get(detail)
+        etag = client.get(detail)["ETag"]
+        self.assertEqual(
+            client.get(detail, HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+        client.logout()
+        client.post(reverse("users:login"), credentials)
+        response = client.get(detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,220 @@
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as thumbnail_defaults
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+
+from posts import images
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# Размеры, в которых шаблоны показывают post.image, и ширины для srcset.
+BASE_SIZES = (("960x425", {"crop": "center", "upscale": True}),)
+SRCSET_WIDTHS = (480, 960, 1440)
+PENDING_KEY = "thumbnail-pending:{}"
+PENDING_TIMEOUT = 60
+# Файл, миниатюры которого создать не удалось: повторять рендер не будем.
+FAILED_KEY = "thumbnail-failed:{}"
+
+_executor = None
+
+
+class LookupBackend(ThumbnailBackend):
+    def lookup(self, file_, geometry_string, **options):
+        """Готовая миниатюра из kvstore или None — без декодирования."""
+        return self._lookup(self._thumbnail(file_, geometry_string, options))
+
+    def lookup_many(self, file_, sizes):
+        """lookup для нескольких пар (geometry, options) одного файла.
+
+        Ключи читаются из кэша kvstore одним get_many; по отдельности
+        проверяются только те, которых в кэше нет.
+        """
+        thumbnails = [
+            self._thumbnail(file_, geometry, dict(options))
+            for geometry, options in sizes
+        ]
+        kvstore_cache = getattr(default.kvstore, "cache", None)
+        cached = {}
+        if kvstore_cache is not None:
+            cached = kvstore_cache.get_many(
+                [add_prefix(thumbnail.key) for thumbnail in thumbnails]
+            )
+        found = []
+        for thumbnail in thumbnails:
+            value = cached.get(add_prefix(thumbnail.key))
+            if isinstance(value, str):
+                found.append(deserialize_image_file(value))
+            else:
+                found.append(self._lookup(thumbnail))
+        return found
+
+    def _thumbnail(self, file_, geometry_string, options):
+        """Миниатюра, которую создал бы get_thumbnail, — пока только имя.
+
+        Опции дополняются так же, как в ThumbnailBackend.get_thumbnail,
+        чтобы имя файла совпало с тем, что создаст пул.
+        """
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault("format", self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(thumbnail_defaults, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def _lookup(self, thumbnail):
+        found = default.kvstore.get(thumbnail)
+        if found is None and hasattr(default.kvstore, "cache"):
+            # sorl кэширует промахи надолго, а миниатюру создаёт другой
+            # процесс: без этого страница не увидела бы готовый файл.
+            default.kvstore.cache.delete(add_prefix(thumbnail.key))
+        return found
+
+
+backend = LookupBackend()
+
+
+def init_worker():
+    django.setup()
+
+
+def scaled(geometry, width):
+    """Та же пропорция, что у geometry, но заданной ширины."""
+    base_width, base_height = map(int, geometry.split("x"))
+    return f"{width}x{round(base_height * width / base_width)}"
+
+
+# Основной размер идёт первым, за ним — остальные ширины для srcset.
+THUMBNAIL_SIZES = tuple(
+    (geometry, options) for geometry, options in BASE_SIZES
+) + tuple(
+    (scaled(geometry, width), options)
+    for geometry, options in BASE_SIZES
+    for width in SRCSET_WIDTHS
+    if scaled(geometry, width) != geometry
+)
+
+
+def variants():
+    """Все миниатюры файла: каждый размер в JPEG и, если можно, в WebP."""
+    for geometry, options in THUMBNAIL_SIZES:
+        yield geometry, options
+        if images.webp_supported():
+            yield geometry, {**options, "format": "WEBP"}
+
+
+def render_thumbnails(name, normalize=False):
+    """Рендерит все размеры для файла; выполняется в процессе пула.
+
+    С normalize=True сначала пережимает сам загруженный файл — так
+    миниатюры строятся уже из уменьшенной картинки. Если файла нет или
+    он не читается, отмечает это в FAILED_KEY: шаблоны покажут исходную
+    картинку и больше не поставят рендер в очередь. Удачный повторный
+    вызов снимает отметку.
+    """
+    names = {name}
+    try:
+        if normalize:
+            name = (
+                rename_image(name, images.normalize(name, storage())) or name
+            )
+            names.add(name)
+        # sorl учитывает хранилище в ключе миниатюры: читаем через то же
+        # хранилище поля, что и шаблоны, иначе имена миниатюр не совпадут.
+        source = ImageFile(name, storage())
+        if not source.exists():
+            raise FileNotFoundError(f"Нет файла картинки {name}")
+        for geometry, options in variants():
+            # Нечитаемый исходник sorl только логирует и файла не создаёт.
+            if not get_thumbnail(source, geometry, **options).exists():
+                raise ValueError(f"Не удалось создать миниатюру {name}")
+    except Exception:
+        cache.set_many({FAILED_KEY.format(key): True for key in names}, None)
+        raise
+    finally:
+        cache.delete_many([PENDING_KEY.format(key) for key in names])
+    cache.delete_many([FAILED_KEY.format(key) for key in names])
+    return name
+
+
+def failed(name):
+    """Создать миниатюры файла уже пытались, и это не удалось."""
+    return cache.get(FAILED_KEY.format(name)) is not None
+
+
+def storage():
+    # Модели импортируются лениво: процесс пула подгружает этот модуль,
+    # чтобы распаковать задачу, ещё до django.setup() в init_worker.
+    from posts.models import Post
+
+    return Post._meta.get_field("image").storage
+
+
+def rename_image(old_name, new_name):
+    """Переводит посты на пережатый файл; save() сбросит кэш страниц.
+
+    Исходный файл удаляется только после коммита: до него посты в базе
+    ещё ссылаются на старое имя, и страницы отдавали бы битую картинку.
+    """
+    from posts.models import Post
+
+    if new_name is None:
+        return None
+    with transaction.atomic():
+        for post in Post.objects.filter(image=old_name):
+            post.image.name = new_name
+            post.save(update_fields=["image"])
+        transaction.on_commit(lambda: storage().delete(old_name))
+    return new_name
+
+
+def executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+        )
+    return _executor
+
+
+def _report(future):
+    if future.exception() is not None:
+        logger.error(
+            "Не удалось создать миниатюры", exc_info=future.exception()
+        )
+
+
+def enqueue(image, normalize=False):
+    """Ставит генерацию миниатюр в пул после коммита транзакции.
+
+    normalize=True передают только для свежей загрузки: повторное
+    пережатие JPEG каждый раз теряло бы качество.
+    """
+    if not image:
+        return
+    name = image.name
+
+    def submit():
+        if cache.add(PENDING_KEY.format(name), True, PENDING_TIMEOUT):
+            executor().submit(
+                render_thumbnails, name, normalize
+            ).add_done_callback(_report)
+
+    transaction.on_commit(submit)
@@ -0,0 +1,249 @@
+from posts import follow_graph
+from posts.counters import bump
+from posts.models import (
+    ArchivedPost,
+    AuthorStats,
+    Follow,
+    Post,
+    TimelineEntry,
+)
+from posts.pagination import CursorPaginator
+
+from django.conf import settings
+
+FANOUT_BATCH_SIZE = 500
+
+
+def is_celebrity(author_id):
+    """Авторы с огромным числом подписчиков не раздаются по лентам."""
+    return AuthorStats.objects.filter(
+        pk=author_id, followers_count__gte=settings.TIMELINE_FANOUT_LIMIT
+    ).exists()
+
+
+def celebrity_followees(user):
+    """«Звёзды» среди подписок: список подписок берётся из follow_graph."""
+    followees = follow_graph.followees(user.pk)
+    if not followees:
+        return []
+    return list(
+        AuthorStats.objects.filter(
+            pk__in=list(followees),
+            followers_count__gte=settings.TIMELINE_FANOUT_LIMIT,
+        ).values_list("pk", flat=True)
+    )
+
+
+def _insert(entries):
+    TimelineEntry.objects.bulk_create(
+        entries, batch_size=FANOUT_BATCH_SIZE, ignore_conflicts=True
+    )
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if is_celebrity(post.author_id):
+        return
+    followers = Follow.objects.filter(author_id=post.author_id).values_list(
+        "user_id", flat=True
+    )
+    _insert(
+        TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+        for user_id in followers.iterator()
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту подписчика уже опубликованные посты автора."""
+    if is_celebrity(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        "pk", "pub_date"
+    )
+    _insert(
+        TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for post_id, pub_date in posts.iterator()
+    )
+
+
+def _celebrities(author_ids):
+    return set(
+        AuthorStats.objects.filter(
+            pk__in=author_ids,
+            followers_count__gte=settings.TIMELINE_FANOUT_LIMIT,
+        ).values_list("pk", flat=True)
+    )
+
+
+def fan_out_many(posts):
+    """fan_out для пачки (id поста, id автора, дата) без сигналов.
+
+    Подписчики всех авторов пачки читаются одним запросом.
+    """
+    by_author = {}
+    for post_id, author_id, pub_date in posts:
+        by_author.setdefault(author_id, []).append((post_id, pub_date))
+    authors = set(by_author) - _celebrities(by_author)
+    if not authors:
+        return
+    follows = Follow.objects.filter(author_id__in=authors).values_list(
+        "author_id", "user_id"
+    )
+    _insert(
+        TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for author_id, user_id in follows.iterator()
+        for post_id, pub_date in by_author[author_id]
+    )
+
+
+def backfill_many(follows):
+    """backfill для пачки пар (подписчик, автор): посты автора — один раз."""
+    followers = {}
+    for user_id, author_id in follows:
+        followers.setdefault(author_id, []).append(user_id)
+    for author_id in set(followers) - _celebrities(followers):
+        posts = Post.objects.filter(author_id=author_id).values_list(
+            "pk", "pub_date"
+        )
+        _insert(
+            TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for post_id, pub_date in posts.iterator()
+            for user_id in followers[author_id]
+        )
+
+
+def remove_follower(author_id):
+    """Вычитает подписчика; True, если автор перестал быть «звездой».
+
+    Переход через порог ловится условным UPDATE, поэтому из нескольких
+    одновременных отписок его увидит ровно одна.
+    """
+    limit = settings.TIMELINE_FANOUT_LIMIT
+    if AuthorStats.objects.filter(pk=author_id, followers_count=limit).update(
+        followers_count=limit - 1
+    ):
+        return True
+    bump(AuthorStats, author_id, followers_count=-1)
+    return False
+
+
+def fan_out_author(author_id):
+    """Раскладывает по лентам подписчиков все посты автора.
+
+    Пока автор был «звездой», его посты подмешивались при чтении и в
+    ленты не попадали; опустившись ниже порога, он перестаёт
+    подмешиваться, и эти посты нужно дописать. Возвращает подписчиков,
+    чьи ленты изменились.
+    """
+    if is_celebrity(author_id):
+        return []
+    followers = list(
+        Follow.objects.filter(author_id=author_id).values_list(
+            "user_id", flat=True
+        )
+    )
+    if not followers:
+        return []
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        "pk", "pub_date"
+    )
+    for post_id, pub_date in posts.iterator():
+        _insert(
+            TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for user_id in followers
+        )
+    return followers
+
+
+def prune(user_id, author_id):
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+class TimelinePaginator(CursorPaginator):
+    """Лента подписок: материализованные записи плюс посты «звёзд».
+
+    Посты обычных авторов читаются диапазоном из TimelineEntry, посты
+    авторов-«звёзд» подтягиваются на чтении и сливаются по ключу. За
+    хвостом горячих постов лента продолжается архивом подписок: при
+    переносе записи TimelineEntry удаляются, а архив старше всех них.
+    """
+
+    def __init__(self, user, per_page):
+        super().__init__(
+            TimelineEntry.objects.filter(user=user).select_related(
+                "post__author", "post__group"
+            ),
+            per_page,
+            keys=("pub_date", "post_id"),
+        )
+        self.user = user
+        self.pulled_authors = celebrity_followees(user)
+
+    def key_of(self, post):
+        return post.pub_date, post.pk
+
+    def fetch(self, position, reverse, limit):
+        # По возрастанию ключа архивные посты идут раньше горячих.
+        sources = [self.fetch_archived, self.fetch_hot]
+        if not reverse:
+            sources.reverse()
+        items = []
+        for source in sources:
+            items.extend(source(position, reverse, limit - len(items)))
+            if len(items) >= limit:
+                break
+        return items
+
+    def fetch_archived(self, position, reverse, limit):
+        followees = list(follow_graph.followees(self.user.pk))
+        if not followees:
+            return []
+        archived = self.filter_queryset(
+            ArchivedPost.objects.filter(
+                author_id__in=followees
+            ).select_related("author", "group"),
+            position,
+            reverse,
+            keys=("pub_date", "pk"),
+        )
+        return list(archived[:limit])
+
+    def fetch_hot(self, position, reverse, limit):
+        entries = self.filter_queryset(self.object_list, position, reverse)
+        posts = {entry.post_id: entry.post for entry in entries[:limit]}
+        if self.pulled_authors:
+            pulled = self.filter_queryset(
+                Post.objects.filter(
+                    author_id__in=self.pulled_authors
+                ).select_related("author", "group"),
+                position,
+                reverse,
+                keys=("pub_date", "pk"),
+            )
+            posts.update((post.pk, post) for post in pulled[:limit])
+        merged = sorted(posts.values(), key=self.key_of, reverse=not reverse)
+        return merged[:limit]
+
+
+def rebuild():
+    """Пересобирает все ленты по подпискам — после массовой загрузки."""
+    TimelineEntry.objects.all().delete()
+    followers = {}
+    follows = Follow.objects.values_list("author_id", "user_id")
+    for author_id, user_id in follows.iterator():
+        followers.setdefault(author_id, []).append(user_id)
+    for author_id, user_ids in followers.items():
+        if is_celebrity(author_id):
+            continue
+        posts = list(
+            Post.objects.filter(author_id=author_id).values_list(
+                "pk", "pub_date"
+            )
+        )
+        _insert(
+            TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for user_id in user_ids
+            for post_id, pub_date in posts
+        )
@@ -0,0 +1,306 @@
+"""Перенос постов между инсталляциями потоком JSONL.
+
+Каждая строка — одна запись с полем "type": user, group, post (вместе со
+своими комментариями), archived_post (пост из архива, в том же виде) или
+follow. Внешние ключи записаны естественными ключами: ником пользователя
+и слагом группы; пост узнаётся по автору и дате публикации. И экспорт,
+и импорт держат в памяти не больше одной пачки записей, так что объём
+данных на память не влияет.
+"""
+
+import json
+from itertools import groupby
+
+from posts import archive
+from posts.models import (
+    ArchivedComment,
+    ArchivedPost,
+    Comment,
+    Follow,
+    Group,
+    Post,
+    User,
+)
+from posts.utils import batched, keep_auto_now_add
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+
+RECORD_TYPES = ("user", "group", "post", "archived_post", "follow")
+
+
+def export_records(chunk_size):
+    """Записи всех типов по порядку: сначала то, на что ссылаются."""
+    users = User.objects.order_by("pk").values(
+        "username", "first_name", "last_name"
+    )
+    for user in users.iterator(chunk_size=chunk_size):
+        yield {"type": "user", **user}
+    groups = Group.objects.order_by("pk").values(
+        "slug", "title", "description"
+    )
+    for group in groups.iterator(chunk_size=chunk_size):
+        yield {"type": "group", **group}
+    yield from post_records("post", Post, Comment, chunk_size)
+    yield from post_records(
+        "archived_post", ArchivedPost, ArchivedComment, chunk_size
+    )
+    follows = Follow.objects.order_by("pk").values_list(
+        "user__username", "author__username"
+    )
+    for user, author in follows.iterator(chunk_size=chunk_size):
+        yield {"type": "follow", "user": user, "author": author}
+
+
+def post_records(kind, post_model, comment_model, chunk_size):
+    posts = post_model.objects.order_by("pk").values_list(
+        "pk", "author__username", "group__slug", "text", "pub_date", "image"
+    )
+    for chunk in batched(posts.iterator(chunk_size=chunk_size), chunk_size):
+        # Комментарии пачки постов — одним запросом, а не по посту.
+        comments = (
+            comment_model.objects.filter(post_id__in=[row[0] for row in chunk])
+            .order_by("post_id", "pk")
+            .values_list("post_id", "author__username", "text", "created")
+        )
+        by_post = {
+            post_id: [
+                {
+                    "author": author,
+                    "text": text,
+                    "created": created.isoformat(),
+                }
+                for _, author, text, created in rows
+            ]
+            for post_id, rows in groupby(comments, key=lambda row: row[0])
+        }
+        for pk, author, group, text, pub_date, image in chunk:
+            yield {
+                "type": kind,
+                "author": author,
+                "group": group,
+                "text": text,
+                "pub_date": pub_date.isoformat(),
+                "image": image,
+                "comments": by_post.get(pk, []),
+            }
+
+
+def dump(records, file):
+    for record in records:
+        file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def load(file):
+    for number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            raise ValueError(f"строка {number}: {error}")
+        if record.get("type") not in RECORD_TYPES:
+            raise ValueError(f"строка {number}: неизвестный тип записи")
+        yield record
+
+
+class Changes:
+    """Что создала одна пачка импорта — для точечного пересчёта."""
+
+    def __init__(self):
+        self.groups = set()
+        # Горячие посты: pk -> (id автора, дата публикации).
+        self.posts = {}
+        # Авторы новых постов, в том числе архивных.
+        self.authors = set()
+        self.post_groups = set()
+        self.follows = []
+
+
+class Importer:
+    """Пишет записи пачками bulk_create, пропуская уже существующие.
+
+    Повторный импорт того же файла ничего не дублирует. Каждая пачка —
+    своя транзакция, так что прерванный импорт оставляет целые пачки, а
+    повторный его дописывает. Сигналы при bulk_create не срабатывают:
+    счётчики, ленты и кэш пересчитывает apply(changes) вызывающего кода —
+    в той же транзакции, что и пачка, и только для созданного ею.
+    """
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.created = dict.fromkeys(
+            ("user", "group", "post", "archived_post", "comment", "follow"),
+            0,
+        )
+        self.skipped = 0
+        self.processed = 0
+
+    def run(self, records, progress=None, apply=None):
+        with keep_auto_now_add(
+            Post._meta.get_field("pub_date"),
+            Comment._meta.get_field("created"),
+        ):
+            for batch in batched(records, self.batch_size):
+                self.changes = Changes()
+                with transaction.atomic():
+                    for kind, rows in groupby(batch, key=lambda r: r["type"]):
+                        getattr(self, f"import_{kind}s")(list(rows))
+                    if apply:
+                        apply(self.changes)
+                self.processed += len(batch)
+                if progress:
+                    progress(self)
+        return self.created
+
+    def user_ids(self, usernames):
+        return dict(
+            User.objects.filter(username__in=set(usernames)).values_list(
+                "username", "pk"
+            )
+        )
+
+    def import_users(self, rows):
+        existing = self.user_ids(row["username"] for row in rows)
+        password = make_password(None)
+        new = [
+            User(
+                username=row["username"],
+                first_name=row.get("first_name", ""),
+                last_name=row.get("last_name", ""),
+                password=password,
+            )
+            for row in {row["username"]: row for row in rows}.values()
+            if row["username"] not in existing
+        ]
+        User.objects.bulk_create(new)
+        self.created["user"] += len(new)
+
+    def import_groups(self, rows):
+        existing = set(
+            Group.objects.filter(
+                slug__in=[row["slug"] for row in rows]
+            ).values_list("slug", flat=True)
+        )
+        new = [
+            Group(
+                slug=row["slug"],
+                title=row["title"],
+                description=row["description"],
+            )
+            for row in {row["slug"]: row for row in rows}.values()
+            if row["slug"] not in existing
+        ]
+        Group.objects.bulk_create(new)
+        self.created["group"] += len(new)
+        self.changes.groups.update(group.slug for group in new)
+
+    def post_ids(self, keys, model=Post):
+        """pk постов по парам (id автора, дата публикации)."""
+        keys = set(keys)
+        if not keys:
+            return {}
+        candidates = model.objects.filter(
+            author_id__in={author_id for author_id, _ in keys},
+            pub_date__in={pub_date for _, pub_date in keys},
+        ).values_list("pk", "author_id", "pub_date")
+        return {
+            (author_id, pub_date): pk
+            for pk, author_id, pub_date in candidates
+            if (author_id, pub_date) in keys
+        }
+
+    def import_posts(self, rows, archived=False):
+        authors = self.user_ids(
+            [row["author"] for row in rows]
+            + [c["author"] for row in rows for c in row["comments"]]
+        )
+        groups = dict(
+            Group.objects.filter(
+                slug__in={row["group"] for row in rows if row["group"]}
+            ).values_list("slug", "pk")
+        )
+        keyed = {}
+        for row in rows:
+            if row["author"] not in authors:
+                self.skipped += 1
+                continue
+            key = (authors[row["author"]], parse_datetime(row["pub_date"]))
+            keyed[key] = row
+        # Пост мог уйти в архив после выгрузки — он тоже уже есть.
+        existing = self.post_ids(keyed)
+        existing.update(self.post_ids(keyed, ArchivedPost))
+        new = [
+            Post(
+                author_id=key[0],
+                pub_date=key[1],
+                group_id=groups.get(row["group"]),
+                text=row["text"],
+                image=row.get("image") or "",
+            )
+            for key, row in keyed.items()
+            if key not in existing
+        ]
+        Post.objects.bulk_create(new)
+        self.created["archived_post" if archived else "post"] += len(new)
+        created = self.post_ids(key for key in keyed if key not in existing)
+        self.changes.authors.update(author_id for author_id, _ in created)
+        self.changes.post_groups.update(
+            keyed[key]["group"] for key in created if keyed[key]["group"]
+        )
+        if not archived:
+            self.changes.posts.update((pk, key) for key, pk in created.items())
+        comments = []
+        for key, post_id in created.items():
+            for comment in keyed[key]["comments"]:
+                if comment["author"] not in authors:
+                    self.skipped += 1
+                    continue
+                comments.append(
+                    Comment(
+                        post_id=post_id,
+                        author_id=authors[comment["author"]],
+                        text=comment["text"],
+                        created=parse_datetime(comment["created"]),
+                    )
+                )
+        Comment.objects.bulk_create(comments, batch_size=self.batch_size)
+        self.created["comment"] += len(comments)
+        if archived and created:
+            with connection.cursor() as cursor:
+                archive.move(cursor, list(created.values()))
+
+    def import_archived_posts(self, rows):
+        """Архивные посты вставляются как обычные и сразу переносятся.
+
+        Так они получают id из общей последовательности постов и не
+        сталкиваются адресом /posts/<id>/ с горячими.
+        """
+        self.import_posts(rows, archived=True)
+
+    def import_follows(self, rows):
+        ids = self.user_ids(
+            [row["user"] for row in rows] + [row["author"] for row in rows]
+        )
+        pairs = {}
+        for row in rows:
+            if row["user"] not in ids or row["author"] not in ids:
+                self.skipped += 1
+                continue
+            pairs[ids[row["user"]], ids[row["author"]]] = True
+        existing = set(
+            Follow.objects.filter(
+                user_id__in={user_id for user_id, _ in pairs}
+            ).values_list("user_id", "author_id")
+        )
+        new = [
+            Follow(user_id=user_id, author_id=author_id)
+            for user_id, author_id in pairs
+            if (user_id, author_id) not in existing
+        ]
+        Follow.objects.bulk_create(new, ignore_conflicts=True)
+        self.created["follow"] += len(new)
+        self.changes.follows.extend(
+            (follow.user_id, follow.author_id) for follow in new
+        )
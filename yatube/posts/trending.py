@@ -0,0 +1,114 @@
+import datetime
+import math
+from collections import defaultdict
+
+from posts import caching
+from posts.models import Comment, PopularPost
+from posts.pagination import CursorPaginator
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+CAS_ATTEMPTS = 3
+REFRESH_BATCH_SIZE = 500
+
+
+def _halvings(moment):
+    """Момент времени в полупериодах затухания от начала эпохи Unix."""
+    return moment.timestamp() / (settings.TRENDING_HALF_LIFE_HOURS * 3600)
+
+
+def _log_add(a, b):
+    """log2(2**a + 2**b) без переполнения."""
+    high, low = max(a, b), min(a, b)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+def record(post_id, created):
+    """Добавляет в рейтинг поста комментарий, оставленный в момент created.
+
+    Комментарий весит 1 и вдвое легчает за TRENDING_HALF_LIFE_HOURS.
+    Ранг хранится как log2 суммы весов, умноженных на 2 ** (время в
+    полупериодах), — так ранги постов сравнимы в любой момент и не требуют
+    пересчёта по мере старения. Обновление — compare-and-set по старому
+    рангу; проигравший гонку несколько раз подряд комментарий учтёт
+    ближайший refresh().
+    """
+    weight = _halvings(created)
+    rows = PopularPost.objects.filter(post_id=post_id)
+    for _ in range(CAS_ATTEMPTS):
+        rank = rows.values_list("rank", flat=True).first()
+        if rank is None:
+            _, created_row = PopularPost.objects.get_or_create(
+                post_id=post_id, defaults={"rank": weight}
+            )
+            if created_row:
+                return
+            continue
+        if rows.filter(rank=rank).update(rank=_log_add(rank, weight)):
+            return
+
+
+def refresh(now=None):
+    """Пересчитывает рейтинг с нуля по комментариям за TRENDING_WINDOW_DAYS.
+
+    Посты без свежих комментариев выпадают, в таблице остаются
+    TRENDING_SIZE лучших; заодно исправляются обновления, потерянные в
+    гонках record(). Возвращает число постов в рейтинге.
+    """
+    now = now or timezone.now()
+    since = now - datetime.timedelta(days=settings.TRENDING_WINDOW_DAYS)
+    # Веса считаются относительно now, чтобы степени двойки были малы.
+    origin = _halvings(now)
+    weights = defaultdict(float)
+    comments = Comment.objects.filter(
+        created__gte=since, post__isnull=False
+    ).values_list("post_id", "created")
+    for post_id, created in comments.iterator():
+        weights[post_id] += 2 ** (_halvings(created) - origin)
+    ranks = sorted(
+        (
+            (origin + math.log2(total), post_id)
+            for post_id, total in weights.items()
+        ),
+        reverse=True,
+    )[: settings.TRENDING_SIZE]
+    with transaction.atomic():
+        PopularPost.objects.all().delete()
+        PopularPost.objects.bulk_create(
+            (
+                PopularPost(post_id=post_id, rank=rank)
+                for rank, post_id in ranks
+            ),
+            batch_size=REFRESH_BATCH_SIZE,
+        )
+    caching.bump("trending")
+    caching.purge(caching.page_path("posts:popular"))
+    return len(ranks)
+
+
+class TrendingPaginator(CursorPaginator):
+    """Популярные посты по убыванию ранга: одна выборка на страницу.
+
+    Курсор хранит (rank, post_id); посты приходят с автором и группой
+    через select_related от строки рейтинга.
+    """
+
+    def __init__(self, per_page):
+        super().__init__(
+            PopularPost.objects.select_related("post__author", "post__group"),
+            per_page,
+            keys=("rank", "post_id"),
+        )
+
+    def key_of(self, post):
+        return post.trending_rank, post.pk
+
+    def fetch(self, position, reverse, limit):
+        entries = self.filter_queryset(self.object_list, position, reverse)
+        posts = []
+        for entry in entries[:limit]:
+            entry.post.trending_rank = entry.rank
+            posts.append(entry.post)
+        return posts
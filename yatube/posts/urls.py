@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 app_name = "posts"
 
@@ -9,6 +9,12 @@ urlpatterns = [
     path("group/<slug:slug>/", views.group_posts, name="group_list"),
     path("profile/<str:username>/", views.profile, name="profile"),
     path("posts/<int:post_id>/", views.post_detail, name="post_detail"),
+    path(
+        "posts/<int:post_id>/comments/",
+        views.post_comments,
+        name="post_comments",
+    ),
+    path("search/", views.post_search, name="post_search"),
     path("create/", views.post_create, name="post_create"),
     path("posts/<int:post_id>/edit/", views.post_edit, name="post_edit"),
     path(
@@ -17,6 +23,7 @@ urlpatterns = [
         name="add_comment",
     ),
     path("follow/", views.follow_index, name="follow_index"),
+    path("popular/", views.popular, name="popular"),
     path(
         "profile/<str:username>/follow/",
         views.profile_follow,
@@ -27,4 +34,24 @@ urlpatterns = [
         views.profile_unfollow,
         name="profile_unfollow",
     ),
+    path("api/posts/", api.posts, name="api_posts"),
+    path("api/posts/batch/", api.posts_batch, name="api_posts_batch"),
+    path("api/posts/<int:post_id>/", api.post, name="api_post"),
+    path(
+        "api/posts/<int:post_id>/comments/",
+        api.comments,
+        name="api_comments",
+    ),
+    path("api/groups/<slug:slug>/", api.group, name="api_group"),
+    path(
+        "api/groups/<slug:slug>/posts/",
+        api.group_posts,
+        name="api_group_posts",
+    ),
+    path("api/profiles/<str:username>/", api.profile, name="api_profile"),
+    path(
+        "api/profiles/<str:username>/posts/",
+        api.profile_posts,
+        name="api_profile_posts",
+    ),
 ]
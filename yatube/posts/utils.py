@@ -0,0 +1,24 @@
+import itertools
+from contextlib import contextmanager
+
+
+def batched(iterable, size):
+    """Режет поток на списки по size элементов, не читая его целиком."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+@contextmanager
+def keep_auto_now_add(*fields):
+    """Даёт bulk_create записать свои даты в поля с auto_now_add."""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
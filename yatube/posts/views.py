@@ -1,83 +1,191 @@
+from posts import follow_graph, querysets, search, thumbnails
+from posts.caching import (
+    cache_page_by_generation,
+    etag_by_generation,
+    page_path,
+)
+from posts.counters import author_stats, post_stats
 from posts.forms import CommentForm, PostForm
-from posts.models import Follow, Group, Post, User
+from posts.models import ArchivedPost, Follow, Group, Post, User
+from posts.pagination import (
+    ArchiveCursorPaginator,
+    ArchiveSequence,
+    CursorPaginator,
+)
+from posts.timeline import TimelinePaginator
+from posts.trending import TrendingPaginator
 
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
 
 POST_IN_PAGE = 10
+COMMENTS_IN_PAGE = 20
 
 
-def paginate_posts(queryset, page_number):
-    paginator = Paginator(queryset, POST_IN_PAGE)
-    page_obj = paginator.get_page(page_number)
-    return page_obj
+def paginate_posts(queryset, request, archive=None):
+    page_number = request.GET.get("page")
+    if page_number is not None:
+        # Старые ссылки вида ?page=N продолжают работать через OFFSET.
+        if archive is not None:
+            queryset = ArchiveSequence(queryset, archive)
+        return Paginator(queryset, POST_IN_PAGE).get_page(page_number)
+    if archive is None:
+        paginator = CursorPaginator(queryset, POST_IN_PAGE)
+    else:
+        paginator = ArchiveCursorPaginator(queryset, archive, POST_IN_PAGE)
+    return paginator.get_page(request.GET.get("cursor"))
+
+
+def paginate_comments(post_id, request, archived=False):
+    comments = (
+        querysets.archived_comments_of(post_id)
+        if archived
+        else querysets.comments_of(post_id)
+    )
+    paginator = CursorPaginator(
+        comments, COMMENTS_IN_PAGE, keys=("created", "pk")
+    )
+    return paginator.get_page(request.GET.get("cursor"))
+
+
+def post_author_profile(request, post_id):
+    """Поколение профиля автора: от него зависит счётчик его постов."""
+    for model in (Post, ArchivedPost):
+        username = (
+            model.objects.filter(pk=post_id)
+            .values_list("author__username", flat=True)
+            .first()
+        )
+        if username:
+            break
+    return [f"profile:{username}"] if username else []
+
 
+def user_timeline(request):
+    return [f"timeline:{request.user.pk}"]
 
-@cache_page(20, key_prefix="index_page")
+
+@etag_by_generation("index", "authors")
+@cache_page_by_generation("index", "authors")
 def index(request):
     template = "posts/index.html"
-    page_number = request.GET.get("page")
     context = {
         "page_obj": paginate_posts(
-            Post.objects.select_related("author", "group").all(), page_number
+            querysets.feed(), request, querysets.archive_feed()
         )
     }
     return render(request, template, context)
 
 
+@etag_by_generation("group:{slug}", "authors")
+@cache_page_by_generation("group:{slug}", "authors")
 def group_posts(request, slug):
     template = "posts/group_list.html"
-    page_number = request.GET.get("page")
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.select_related("author").all()
+    posts = querysets.group_feed(group)
     context = {
         "group": group,
         "posts": posts,
-        "page_obj": paginate_posts(posts, page_number),
+        "page_obj": paginate_posts(
+            posts, request, querysets.archived_group_feed(group)
+        ),
     }
     return render(request, template, context)
 
 
+@etag_by_generation("profile:{username}", "authors")
+@cache_page_by_generation("profile:{username}", "authors")
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    page_number = request.GET.get("page")
+    author = get_object_or_404(
+        User.objects.select_related("stats"), username=username
+    )
     template = "posts/profile.html"
-    post_list = author.posts.select_related("author").all()
-    count = post_list.count()
-    following = (
-        request.user.is_authenticated
-        and Follow.objects.filter(user=request.user, author=author).exists()
+    post_list = querysets.author_feed(author)
+    stats = author_stats(author)
+    following = request.user.is_authenticated and follow_graph.follows(
+        request.user.pk, author.pk
     )
     context = {
         "author": author,
         "post_list": post_list,
-        "count": count,
+        "count": stats.posts_count,
+        "stats": stats,
         "following": following,
-        "page_obj": paginate_posts(post_list, page_number),
+        "page_obj": paginate_posts(
+            post_list, request, querysets.archived_author_feed(author)
+        ),
     }
     return render(request, template, context)
 
 
+@etag_by_generation("post:{post_id}", post_author_profile, "authors", "groups")
 def post_detail(request, post_id):
     template = "posts/post_detail.html"
-    post = get_object_or_404(Post, pk=post_id)
-    is_edit = post.author == request.user
-    post_list = post.author.posts.all()
-    count = post_list.count()
-    form = CommentForm(request.POST or None)
-    comments = post.comments.select_related("author").all()
+    try:
+        post = Post.objects.select_related(
+            "author__stats", "group", "stats"
+        ).get(pk=post_id)
+    except Post.DoesNotExist:
+        # Старый пост ищем в архиве: он только для чтения.
+        post = get_object_or_404(
+            ArchivedPost.objects.select_related("author__stats", "group"),
+            pk=post_id,
+        )
+    archived = isinstance(post, ArchivedPost)
+    # Счётчик постов автора меняется вместе с его профилем.
+    request.page_depends_on = [
+        page_path("posts:profile", post.author.username)
+    ]
     context = {
         "post": post,
-        "count": count,
-        "is_edit": is_edit,
-        "form": form,
-        "comments": comments,
+        "archived": archived,
+        "count": author_stats(post.author).posts_count,
+        "comments_count": (
+            post.comments_count
+            if archived
+            else post_stats(post).comments_count
+        ),
+        "is_edit": not archived and post.author == request.user,
+        "form": CommentForm(request.POST or None),
+        "comments": paginate_comments(post.pk, request, archived),
+    }
+    return render(request, template, context)
+
+
+def post_comments(request, post_id):
+    """Следующая страница комментариев фрагментом HTML для подгрузки."""
+    template = "posts/includes/comment_list.html"
+    archived = not Post.objects.filter(pk=post_id).exists()
+    if archived and not ArchivedPost.objects.filter(pk=post_id).exists():
+        raise Http404
+    context = {
+        "post_id": post_id,
+        "comments": paginate_comments(post_id, request, archived),
     }
     return render(request, template, context)
 
 
+def post_search(request):
+    # Архив в поиск не попадает: его строки убирает из FTS-индекса триггер
+    # при переносе (posts.archive), а LIKE по холодной таблице — полный
+    # просмотр. Старые посты находятся через профиль и группу.
+    query = request.GET.get("q", "").strip()
+    if search.is_supported():
+        results = search.SearchResults(query)
+    else:
+        results = querysets.feed().filter(text__icontains=query)
+    context = {
+        "query": query,
+        "page_obj": Paginator(results, POST_IN_PAGE).get_page(
+            request.GET.get("page")
+        ),
+    }
+    return render(request, "posts/search.html", context)
+
+
 @login_required
 def post_create(request):
     if not request.method == "POST":
@@ -92,6 +200,7 @@ def post_create(request):
     post = form.save(commit=False)
     post.author = request.user
     post.save()
+    thumbnails.enqueue(post.image, normalize=True)
     return redirect("posts:profile", username=request.user.username)
 
 
@@ -109,6 +218,8 @@ def post_edit(request, post_id):
         return redirect("posts:post_detail", post.id)
     if form.is_valid():
         form.save()
+        if "image" in form.changed_data:
+            thumbnails.enqueue(post.image, normalize=True)
         return redirect("posts:post_detail", post.id)
     context = {
         "form": form,
@@ -132,18 +243,34 @@ def add_comment(request, post_id):
 
 
 @login_required
+@etag_by_generation("index", "authors", user_timeline)
 def follow_index(request):
-    follower = Follow.objects.filter(user=request.user).values_list(
-        "author_id",
-        flat=True,
-    )
-    post = Post.objects.filter(author_id__in=follower).select_related("group")
     page_number = request.GET.get("page")
+    if page_number is not None:
+        # Старые ссылки вида ?page=N читают посты подписок через OFFSET.
+        followees = list(follow_graph.followees(request.user.pk))
+        posts = ArchiveSequence(
+            querysets.feed().filter(author_id__in=followees),
+            querysets.archive_feed().filter(author_id__in=followees),
+        )
+        page_obj = Paginator(posts, POST_IN_PAGE).get_page(page_number)
+    else:
+        paginator = TimelinePaginator(request.user, POST_IN_PAGE)
+        page_obj = paginator.get_page(request.GET.get("cursor"))
+    return render(request, "posts/follow.html", {"page_obj": page_obj})
+
+
+# Рейтинг меняется с каждым комментарием, но поколение "trending" сдвигает
+# только refresh_trending: между пересчётами страница живёт недолго.
+@cache_page_by_generation(
+    "trending", "index", "authors", timeout=settings.TRENDING_PAGE_TIMEOUT
+)
+def popular(request):
+    paginator = TrendingPaginator(POST_IN_PAGE)
     context = {
-        "posts": post,
-        "page_obj": paginate_posts(post, page_number),
+        "page_obj": paginator.get_page(request.GET.get("cursor")),
     }
-    return render(request, "posts/follow.html", context)
+    return render(request, "posts/popular.html", context)
 
 
 @login_required
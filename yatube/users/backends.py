@@ -0,0 +1,35 @@
+from core import routers
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+USER_KEY = "auth-user:{}"
+
+
+def forget_user(user_id):
+    cache.delete(USER_KEY.format(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend, который берёт пользователя сессии из кэша.
+
+    AuthenticationMiddleware вызывает get_user() на каждом запросе с
+    сессией; закэшированный объект избавляет от SELECT по auth_user.
+    Запись живёт AUTH_USER_CACHE_TIMEOUT и удаляется при любом
+    сохранении пользователя — смене пароля, правке профиля, входе.
+    """
+
+    def get_user(self, user_id):
+        key = USER_KEY.format(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is None:
+                return None
+            cache.set(
+                key,
+                user,
+                routers.lag_bounded_timeout(settings.AUTH_USER_CACHE_TIMEOUT),
+            )
+        return user if self.user_can_authenticate(user) else None
@@ -1,5 +1,7 @@
 from django.contrib.auth import get_user_model
-from django.contrib.auth.forms import UserCreationForm
+from django.contrib.auth.forms import PasswordResetForm, UserCreationForm
+
+from . import tasks
 
 User = get_user_model()
 
@@ -8,3 +10,36 @@ class CreationForm(UserCreationForm):
     class Meta(UserCreationForm.Meta):
         model = User
         fields = ("first_name", "last_name", "username", "email")
+
+
+class QueuedPasswordResetForm(PasswordResetForm):
+    """Письмо сброса пароля уходит из очереди, а не из запроса.
+
+    В задачу попадает только контекст без токена: ссылку собирает
+    воркер перед отправкой (users.tasks.send_password_reset), а
+    медленный SMTP не держит запрос.
+    """
+
+    def send_mail(
+        self,
+        subject_template_name,
+        email_template_name,
+        context,
+        from_email,
+        to_email,
+        html_email_template_name=None,
+    ):
+        public = {
+            key: value
+            for key, value in context.items()
+            if key not in ("user", "uid", "token")
+        }
+        public["email"] = to_email
+        tasks.send_password_reset.enqueue(
+            context["user"].pk,
+            public,
+            subject_template_name,
+            email_template_name,
+            from_email,
+            html_email_template_name,
+        )
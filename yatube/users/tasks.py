@@ -0,0 +1,47 @@
+from core.jobs import task
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.tokens import default_token_generator
+from django.core.mail import EmailMultiAlternatives
+from django.template import loader
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+User = get_user_model()
+
+
+@task
+def send_password_reset(
+    user_id,
+    context,
+    subject_template_name,
+    email_template_name,
+    from_email,
+    html_email_template_name=None,
+):
+    """Письмо сброса пароля; токен и ссылка собираются только здесь.
+
+    В очереди лежат id пользователя и адрес, но не рабочая ссылка:
+    упавшие задачи хранятся в core_job и видны в админке.
+    """
+    user = User.objects.filter(pk=user_id).first()
+    if user is None:
+        return
+    context = {
+        **context,
+        "user": user,
+        "uid": urlsafe_base64_encode(force_bytes(user.pk)),
+        "token": default_token_generator.make_token(user),
+    }
+    subject = loader.render_to_string(subject_template_name, context)
+    subject = "".join(subject.splitlines())
+    body = loader.render_to_string(email_template_name, context)
+    message = EmailMultiAlternatives(
+        subject, body, from_email, [context["email"]]
+    )
+    if html_email_template_name is not None:
+        message.attach_alternative(
+            loader.render_to_string(html_email_template_name, context),
+            "text/html",
+        )
+    message.send()
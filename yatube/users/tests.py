@@ -1,3 +1,94 @@
-# from django.test import TestCase
+import re
 
-# Create your tests here.
+from core import jobs
+from core.models import Job
+from users.backends import CachedModelBackend
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+User = get_user_model()
+
+
+class CachedAuthTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("reader", password="old-secret")
+        self.client = Client()
+        self.client.login(username="reader", password="old-secret")
+
+    def test_warm_request_skips_session_and_user_queries(self):
+        """На тёплом кэше сессия и пользователь не читаются из базы."""
+        url = reverse("posts:follow_index")
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        for query in context.captured_queries:
+            self.assertNotIn("django_session", query["sql"])
+            self.assertNotIn('FROM "auth_user" WHERE', query["sql"])
+
+    def test_cached_user_is_dropped_on_password_change(self):
+        backend = CachedModelBackend()
+        cached = backend.get_user(self.user.pk)
+        response = self.client.post(
+            reverse("users:password_change"),
+            {
+                "old_password": "old-secret",
+                "new_password1": "new-Secret-42",
+                "new_password2": "new-Secret-42",
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+        fresh = backend.get_user(self.user.pk)
+        self.assertNotEqual(fresh.password, cached.password)
+        # Сессия пережила смену пароля: хэш в ней обновлён.
+        response = self.client.get(reverse("posts:follow_index"))
+        self.assertEqual(response.status_code, 200)
+
+    def test_cached_user_is_dropped_on_profile_edit(self):
+        backend = CachedModelBackend()
+        backend.get_user(self.user.pk)
+        self.user.first_name = "Иван"
+        self.user.save()
+        self.assertEqual(backend.get_user(self.user.pk).first_name, "Иван")
+
+    def test_sessions_of_plain_model_backend_survive(self):
+        """Сессии, выданные до кэширующего бэкенда, остаются в силе."""
+        client = Client()
+        client.force_login(
+            self.user, backend="django.contrib.auth.backends.ModelBackend"
+        )
+        response = client.get(reverse("posts:follow_index"))
+        self.assertEqual(response.status_code, 200)
+
+    def test_inactive_user_is_not_authenticated(self):
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(CachedModelBackend().get_user(self.user.pk))
+
+
+class PasswordResetQueueTests(TestCase):
+    def test_reset_email_is_sent_by_worker(self):
+        """Запрос только ставит письмо в очередь, отправляет воркер."""
+        User.objects.create_user(
+            "forgetful", email="forgetful@example.com", password="secret"
+        )
+        response = Client().post(
+            reverse("users:password_reset_form"),
+            {"email": "forgetful@example.com"},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(mail.outbox, [])
+        # Рабочая ссылка в таблицу очереди не попадает.
+        self.assertNotIn("/auth/reset/", Job.objects.get().payload)
+        self.assertEqual(jobs.run_pending(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["forgetful@example.com"])
+        link = re.search(r"/auth/reset/\S+", mail.outbox[0].body).group()
+        self.assertEqual(Client().get(link).status_code, 302)
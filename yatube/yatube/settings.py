@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -33,11 +34,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.middleware.MetricsMiddleware",
+    "core.middleware.ReplicaPinMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "core.middleware.RateLimitMiddleware",
+    "posts.caching.AnonymousPageCacheMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "debug_toolbar.middleware.DebugToolbarMiddleware",
@@ -53,7 +58,7 @@ TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "BACKEND": "core.templates.InstrumentedDjangoTemplates",
         "DIRS": [TEMPLATES_DIR],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -74,9 +79,56 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": os.path.join(BASE_DIR, "db.sqlite3"),
-    }
+        # Воркер держит соединение между запросами: без этого каждый запрос
+        # заново открывает файл и выполняет прагмы из SQLITE_PRAGMAS.
+        "CONN_MAX_AGE": 60,
+    },
+    # Локальная реплика — копия файла основной базы, которую обновляет
+    # команда sync_replicas. В тестах она смотрит в тестовую default.
+    "replica": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.path.join(BASE_DIR, "db.replica.sqlite3"),
+        "CONN_MAX_AGE": 60,
+        "TEST": {"MIRROR": "default"},
+    },
 }
 
+DATABASE_ROUTERS = ["core.routers.ReplicaRouter"]
+# Алиасы, с которых HTTP-запросы читают (core.routers). Пусто — всё идёт
+# в default; для проверки локально: sync_replicas, затем ["replica"].
+DATABASE_REPLICAS = []
+# Сколько секунд после записи сессия читает с основной базы: должно
+# перекрывать отставание реплик.
+REPLICA_PIN_SECONDS = 15
+REPLICA_PIN_COOKIE = "primary_pin"
+
+# Применяются к каждому новому соединению с SQLite (core.db). WAL пускает
+# читателей параллельно с писателем, synchronous=NORMAL в режиме WAL
+# не теряет целостность при падении процесса, busy_timeout заставляет
+# писателя подождать блокировку, а не сразу падать с "database is locked".
+SQLITE_PRAGMAS = {
+    "journal_mode": "wal",
+    "synchronous": "normal",
+    "busy_timeout": 5000,
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64 * 1024,
+    "temp_store": "memory",
+}
+
+# Сессия читается из кэша, а пишется и в кэш, и в базу: после вытеснения
+# или перезапуска кэша пользователь не разлогинится.
+SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+
+# Пользователь сессии тоже берётся из кэша (users.backends); запись
+# сбрасывается при сохранении пользователя. ModelBackend остаётся в списке
+# для сессий, созданных до его замены: в них записан путь старого бэкенда,
+# и без него все пользователи оказались бы разлогинены.
+AUTHENTICATION_BACKENDS = [
+    "users.backends.CachedModelBackend",
+    "django.contrib.auth.backends.ModelBackend",
+]
+AUTH_USER_CACHE_TIMEOUT = 60 * 5
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -117,10 +169,116 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+# Общий кэш хранит pickle, поэтому живёт не в общем /tmp, а в закрытом
+# каталоге проекта (0700, проверка core.E001). Тесты получают свой
+# временный каталог (core.test_runner).
+CACHE_DIR = os.environ.get(
+    "YATUBE_CACHE_DIR", os.path.join(BASE_DIR, "cache")
+)
+TEST_RUNNER = "core.test_runner.TestRunner"
+
+# default — двухуровневый кэш (core.cache.TieredCache): L1 в памяти
+# процесса (LOCATION — имя его хранилища) перед общим для всех воркеров
+# хоста L2 ("shared"). L2 — файл SQLite с атомарными incr и add: на них
+# держатся поколения страниц и журнал сброса L1. Замена на Redis должна
+# сохранить эту атомарность, а ограничителю нужен compare_and_set.
 CACHES = {
     "default": {
-        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
-    }
+        "BACKEND": "core.cache.TieredCache",
+        "LOCATION": "default",
+        "OPTIONS": {
+            "L2": "shared",
+            "L1_MAX_ENTRIES": 1000,
+            "L1_TIMEOUT": 5,
+            "EPOCH_CHECK_INTERVAL": 1,
+            "INVALIDATION_LOG_SIZE": 1000,
+        },
+    },
+    "shared": {
+        "BACKEND": "core.cache.SQLiteCache",
+        "LOCATION": os.path.join(CACHE_DIR, "shared.sqlite3"),
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
 }
 
+# Страницы лент кэшируются надолго: записи в модели сдвигают поколения
+# ключей (posts.caching), и устаревшая страница просто перестаёт читаться.
+PAGE_CACHE_TIMEOUT = 60 * 60 * 6
+
+# Анонимам эти страницы целиком отдаются из кэша, до вызова вью
+# (posts.caching.AnonymousPageCacheMiddleware). Записи в модели сбрасывают
+# ровно затронутые адреса.
+ANONYMOUS_PAGE_CACHE_VIEWS = [
+    "posts:index",
+    "posts:group_list",
+    "posts:profile",
+    "posts:post_detail",
+    "posts:post_comments",
+    "posts:popular",
+    "about:author",
+    "about:tech",
+]
+ANONYMOUS_PAGE_CACHE_TIMEOUT = PAGE_CACHE_TIMEOUT
+
+# Авторы с таким числом подписчиков не раздаются по лентам при публикации:
+# их посты подмешиваются в ленту подписок при чтении.
+TIMELINE_FANOUT_LIMIT = 10000
+
+# Посты старше стольких дней команда archive_posts переносит в архивные
+# таблицы (posts.archive): ленты профиля и группы дочитывают их оттуда.
+ARCHIVE_AFTER_DAYS = 365
+
+# Рейтинг обсуждаемых постов (posts.trending): вес комментария вдвое
+# падает за TRENDING_HALF_LIFE_HOURS. Команда refresh_trending (по cron,
+# раз в несколько минут) пересчитывает его по комментариям за окно
+# TRENDING_WINDOW_DAYS и оставляет TRENDING_SIZE лучших постов.
+TRENDING_HALF_LIFE_HOURS = 12
+TRENDING_WINDOW_DAYS = 3
+TRENDING_SIZE = 1000
+TRENDING_PAGE_TIMEOUT = 60
+
+# Процессы пула, который заранее рендерит миниатюры (posts.thumbnails).
+THUMBNAIL_WORKERS = 2
+# kvstore sorl работает с общим кэшем напрямую, минуя L1: LookupBackend
+# удаляет ключ на каждом промахе, а миниатюру создаёт другой процесс.
+THUMBNAIL_CACHE = "shared"
+
+# Загруженные картинки уменьшаются до этой стороны и пережимаются
+# (posts.images); тем же качеством кодируются миниатюры sorl.
+IMAGE_MAX_SIZE = 2048
+IMAGE_QUALITY = 82
+THUMBNAIL_QUALITY = IMAGE_QUALITY
+
+# Очередь фоновых задач в таблице core_job (core.jobs), её разбирает
+# manage.py run_worker. Аренда должна превышать время самой долгой задачи:
+# по её истечении задачу заберёт другой воркер.
+JOBS_LEASE_SECONDS = 60
+JOBS_POLL_INTERVAL = 1
+JOBS_MAX_ATTEMPTS = 5
+JOBS_BACKOFF_BASE = 10
+JOBS_BACKOFF_MAX = 60 * 60
+
+# Токен-бакеты пишущих маршрутов (core.ratelimit): capacity запросов
+# подряд, дальше — capacity за period секунд. Ведро у каждого пользователя,
+# у анонимов — у каждого IP. По умолчанию ограничен только POST.
+# Состояние живёт в общем для воркеров L2, мимо L1 процесса.
+RATE_LIMIT_CACHE = "shared"
+RATE_LIMITS = {
+    "posts:add_comment": {"capacity": 10, "period": 60},
+    "posts:post_create": {"capacity": 5, "period": 60},
+    "posts:profile_follow": {"capacity": 30, "period": 60, "methods": ["GET"]},
+    "users:signup": {"capacity": 5, "period": 60 * 60},
+}
+
+# Снимки метрик воркеров (core.metrics): /metrics складывает все файлы
+# каталога, поэтому он должен быть общим для процессов одного хоста.
+METRICS_DIR = os.path.join(tempfile.gettempdir(), "yatube_metrics")
+METRICS_FLUSH_INTERVAL = 5
+# Снимок, не обновлявшийся дольше, /metrics переносит в агрегат: pid мог
+# достаться другому процессу. Простаивающий воркер потом запишет только
+# прирост.
+METRICS_SNAPSHOT_MAX_AGE = 60 * 60
+# Откуда можно читать /metrics — адрес сборщика Prometheus.
+METRICS_ALLOWED_IPS = ["127.0.0.1", "::1"]
+
 DEFAULT_AUTO_FIELD = "django.db.models.AutoField"
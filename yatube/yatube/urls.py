@@ -1,5 +1,7 @@
 import debug_toolbar
 
+from core.views import media, metrics_export
+
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
@@ -11,6 +13,7 @@ urlpatterns = [
     path("auth/", include("django.contrib.auth.urls")),
     path("admin/", admin.site.urls),
     path("about/", include("about.urls", namespace="about")),
+    path("metrics", metrics_export, name="metrics"),
 ]
 handler404 = "core.views.page_not_found"
 handler403 = "posts.views.page_not_found"
@@ -18,6 +21,4 @@ handler403 = "posts.views.page_not_found"
 
 if settings.DEBUG:
     urlpatterns += (path("__debug__/", include(debug_toolbar.urls)),)
-    urlpatterns += static(
-        settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
-    )
+    urlpatterns += static(settings.MEDIA_URL, view=media)